@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parseo de fechas y horas de las cabeceras del chat (chat_dates).
+
+Toma las cabeceras de una exportación sintética grande y compara el parseo anterior
+de WhatsAppProcessor (hasta cuatro formatos de fecha y dos de hora con strptime por
+mensaje, y la fecha actual si ninguno servía) con el actual: formato inferido una vez
+por chat y tablas de memoización para fechas y horas repetidas. Para cada plataforma
+e idioma reporta el tiempo, el formato detectado y el rango de fechas resultante,
+que el parseo anterior calculaba mal en chats mm/dd o de 12 h.
+
+Uso:
+    python benchmarks/bench_chat_dates.py [--messages 300000] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_export import LOCALES, PLATFORMS, ExportSpec, generate_chat
+
+from fastapi_docswhatsapp.services.chat_dates import DATE_SAMPLE_HEADERS, ChatDateParser, detect_date_format
+from fastapi_docswhatsapp.services.chat_tokenizer import CHAT_FORMATS, detect_chat_format
+
+
+def legacy_parse_datetime(date_str: str, time_str: str) -> datetime:
+    """Parseo anterior de WhatsAppProcessor._parse_datetime (sin segundos ni AM/PM)"""
+    date_str = date_str.replace(',', '').strip()
+    parsed_date = None
+    for date_fmt in ('%d/%m/%Y', '%d/%m/%y', '%m/%d/%Y', '%m/%d/%y'):
+        try:
+            parsed_date = datetime.strptime(date_str, date_fmt).date()
+            break
+        except ValueError:
+            continue
+    if not parsed_date:
+        parsed_date = datetime.now().date()
+    parsed_time = None
+    for time_fmt in ('%H:%M', '%I:%M'):
+        try:
+            parsed_time = datetime.strptime(time_str, time_fmt).time()
+            break
+        except ValueError:
+            continue
+    if not parsed_time:
+        parsed_time = datetime.now().time()
+    return datetime.combine(parsed_date, parsed_time)
+
+
+def legacy(headers):
+    return [legacy_parse_datetime(date_str, ':'.join(time_str.split(':')[:2])) for date_str, time_str, _ in headers]
+
+
+def current(headers):
+    date_format = detect_date_format((date_str, ampm) for date_str, _, ampm in islice(headers, DATE_SAMPLE_HEADERS))
+    parser = ChatDateParser(date_format)
+    return [parser.parse(*header) for header in headers]
+
+
+def best_time(func, headers, repeat: int):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(headers)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=300_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'chat':<12}{'anterior s':>12}{'actual s':>10}{'aceleración':>13}  {'formato':<29}rango (anterior → actual)")
+    for platform in PLATFORMS:
+        for locale in LOCALES:
+            text, _ = generate_chat(ExportSpec(messages=args.messages, platform=platform, locale=locale, images=0))
+            pattern = CHAT_FORMATS[detect_chat_format(text)]
+            headers = [m.group('date', 'time', 'ampm') for m in pattern.finditer(text) if m.group('sender')]
+
+            legacy_seconds, legacy_result = best_time(legacy, headers, args.repeat)
+            current_seconds, current_result = best_time(current, headers, args.repeat)
+            date_format = detect_date_format((d, a) for d, _, a in headers[:DATE_SAMPLE_HEADERS])
+            legacy_range = f"{min(legacy_result):%d/%m/%Y %H:%M}-{max(legacy_result):%d/%m/%Y %H:%M}"
+            current_range = f"{min(current_result):%d/%m/%Y %H:%M}-{max(current_result):%d/%m/%Y %H:%M}"
+            print(f"{platform + '/' + locale:<12}{legacy_seconds:>12.2f}{current_seconds:>10.3f}"
+                  f"{legacy_seconds / current_seconds:>12.0f}x  {str(date_format):<29}{legacy_range} → {current_range}")
+
+
+if __name__ == '__main__':
+    main()
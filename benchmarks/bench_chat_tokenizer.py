@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tokenizador de chats (chat_tokenizer) sobre un chat de ~1M de líneas.
+
+Compara, para exportaciones de iOS y Android, el parseo anterior del compactador
+(dividir en líneas, probar una regex por línea y unir las líneas de continuación)
+con el actual sobre el tokenizador, que recorre el texto en una sola pasada y toma
+el cuerpo de cada mensaje como un slice. Verifica que ambos produzcan los mismos
+mensajes y reporta líneas y MB por segundo. También mide el tokenizador solo.
+
+Uso:
+    python benchmarks/bench_chat_tokenizer.py [--lines 1000000] [--repeat 3]
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_export import PLATFORMS, ExportSpec, generate_chat
+
+from fastapi_docswhatsapp.services.chat_compactor import _parse_messages
+from fastapi_docswhatsapp.services.chat_tokenizer import detect_chat_format, tokenize_chat
+
+# Cabecera que usaba el compactador: un patrón para ambos formatos, aplicado línea a línea
+LEGACY_HEADER = re.compile(
+    r'^\[?(?P<date>\d{1,2}/\d{1,2}/\d{2,4}),?\s+(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::\d{2})?'
+    r'(?:\s*(?P<ampm>[ap])\.?\s?m\.?)?\]?(?:\s+-)?\s+(?P<rest>.*)$',
+    re.IGNORECASE
+)
+
+
+def legacy_parse(text: str) -> list:
+    """Parseo anterior del compactador, línea por línea"""
+    messages = []
+    for line in text.split('\n'):
+        marked = line[:1] in ('\u200e', '\u200f')
+        match = LEGACY_HEADER.match(line.lstrip('\u200e\u200f') if marked else line)
+        if not match:
+            if messages:
+                messages[-1][3].append(line)
+            continue
+
+        hour = int(match.group('hour'))
+        ampm = (match.group('ampm') or '').lower()
+        if ampm == 'p' and hour < 12:
+            hour += 12
+        elif ampm == 'a' and hour == 12:
+            hour = 0
+        time_str = f"{hour:02d}:{match.group('minute')}"
+
+        rest = match.group('rest')
+        sender, sep, body = rest.partition(': ')
+        if not sep:
+            messages.append((match.group('date'), time_str, None, [rest]))
+        else:
+            messages.append((match.group('date'), time_str, sender.strip(), [('\u200e' if marked else '') + body]))
+    return [(date, time_str, sender, '\n'.join(lines)) for date, time_str, sender, lines in messages]
+
+
+def best_time(func, text: str, repeat: int):
+    """Mejor tiempo de `repeat` ejecuciones y el resultado de la última"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'formato':<10}{'método':<13}{'mensajes':>10}{'segundos':>10}{'Mlíneas/s':>11}{'MB/s':>8}")
+    for platform in PLATFORMS:
+        # ~5% de los mensajes tienen varias líneas: se ajusta la cantidad para llegar a --lines
+        spec = ExportSpec(messages=int(args.lines / 1.13), platform=platform, images=0, attachment_density=0.02)
+        text, _ = generate_chat(spec)
+        lines = text.count('\n')
+        size_mb = len(text.encode('utf-8')) / 1024 / 1024
+        start = time.perf_counter()
+        detect_chat_format(text)
+        detection_ms = (time.perf_counter() - start) * 1000
+
+        results = {}
+        outputs = {}
+        for name, func in (("por_líneas", legacy_parse), ("tokenizer", _parse_messages),
+                           ("solo_tokens", tokenize_chat)):
+            seconds, output = best_time(func, text, args.repeat)
+            results[name] = seconds
+            outputs[name] = output
+            print(f"{platform:<10}{name:<13}{len(output):>10}{seconds:>10.2f}{lines / seconds / 1e6:>11.2f}"
+                  f"{size_mb / seconds:>8.1f}")
+        # El tokenizador no incluye el salto de línea final del archivo en el último mensaje
+        legacy, current = ([(*m[:3], m[3].rstrip('\n')) for m in outputs[name]] for name in ("por_líneas", "tokenizer"))
+        same = "mismos mensajes" if legacy == current else "¡RESULTADOS DISTINTOS!"
+        print(f"{'':<10}{lines} líneas, {size_mb:.0f} MB; detección de formato {detection_ms:.2f} ms; "
+              f"aceleración {results['por_líneas'] / results['tokenizer']:.1f}x; {same}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los motores de imágenes ('full' vs 'draft') sobre fotos de teléfono.
+
+Genera fotos JPEG sintéticas de 12 MP con orientación EXIF y mide, para cada
+motor, el tiempo por imagen y la memoria pico (RSS) del proceso. Cada motor se
+ejecuta en un subproceso propio para que la memoria pico no se contamine.
+
+Uso:
+    python benchmarks/bench_image_engine.py [--images 5] [--width 4032] [--height 3024]
+"""
+
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+
+from fastapi_docswhatsapp.services.image_optimizer import IMAGE_ENGINES, ImageOptimizer
+
+
+def make_phone_photo(width: int, height: int, seed: int) -> bytes:
+    """Crea un JPEG con ruido (difícil de comprimir) y orientación EXIF 6 como un teléfono"""
+    noise = Image.effect_noise((width // 4, height // 4), 40 + seed).convert('RGB')
+    img = noise.resize((width, height), Image.BILINEAR)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = "Synthetic Phone"
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=92, exif=exif)
+    return buf.getvalue()
+
+
+def peak_rss_mb() -> float:
+    """
+    Memoria pico del proceso actual. En Linux se usa VmHWM porque ru_maxrss
+    se hereda del proceso padre a través de exec.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(engine: str, photo_dir: Path) -> dict:
+    """Procesa todas las fotos con un motor y reporta tiempos y memoria pico"""
+    optimizer = ImageOptimizer(engine=engine)
+    timings = []
+    output_sizes = []
+    for photo in sorted(photo_dir.glob('*.jpg')):
+        data = photo.read_bytes()
+        start = time.perf_counter()
+        out = optimizer.optimize_bytes(data, photo.suffix)
+        timings.append(time.perf_counter() - start)
+        output_sizes.append(len(out))
+
+    return {
+        "engine": engine,
+        "images": len(timings),
+        "mean_ms": round(1000 * sum(timings) / len(timings), 1),
+        "min_ms": round(1000 * min(timings), 1),
+        "max_ms": round(1000 * max(timings), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "mean_output_kb": round(sum(output_sizes) / len(output_sizes) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--child', choices=IMAGE_ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument('--photo-dir', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.photo_dir)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photo_dir = Path(tmp)
+        print(f"Generando {args.images} fotos de {args.width}x{args.height}...")
+        for i in range(args.images):
+            (photo_dir / f"IMG_{i:04d}.jpg").write_bytes(make_phone_photo(args.width, args.height, i))
+
+        results = []
+        for engine in IMAGE_ENGINES:
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', engine, '--photo-dir', str(photo_dir)],
+                check=True, capture_output=True, text=True
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'motor':<8}{'media ms':>10}{'min ms':>10}{'max ms':>10}{'RSS pico MB':>14}{'salida KB':>12}")
+    for r in results:
+        print(f"{r['engine']:<8}{r['mean_ms']:>10}{r['min_ms']:>10}{r['max_ms']:>10}"
+              f"{r['peak_rss_mb']:>14}{r['mean_output_kb']:>12}")
+
+    full, draft = results
+    print(f"\nAceleración 'draft' vs 'full': {full['mean_ms'] / draft['mean_ms']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
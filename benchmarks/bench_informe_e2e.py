@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Benchmark de punta a punta de /crear-informe-final sobre exportaciones sintéticas.
+
+Genera un ZIP con synthetic_export.py y lo procesa con el mismo flujo del endpoint
+(guardar el upload, extraer, compactar, analizar, optimizar imágenes, armar
+evidencias y renderizar el PDF) dentro del lifespan de la app, midiendo cada etapa.
+El análisis usa por defecto el backend simulado (sin red, latencia configurable),
+de modo que los tiempos de CPU y disco son comparables entre corridas.
+
+Cada escenario se ejecuta en un subproceso propio para medir la memoria pico (RSS)
+sin contaminación. Los resultados se guardan como JSON en benchmarks/results/ y se
+pueden comparar con una corrida anterior con --compare.
+
+Uso:
+    python benchmarks/bench_informe_e2e.py [--runs 3] [--messages 2000] [--images 20]
+        [--platform ios] [--locale es] [--image-width 4032] [--image-height 3024]
+        [--attachment-density 0.05] [--fake-latency-ms 1500] [--backend fake]
+        [--output resultado.json] [--compare anterior.json]
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic_export import add_spec_arguments, build_export, spec_from_args
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Etapas en el orden del flujo; analisis corre en paralelo con las de imágenes
+STAGES = (
+    "arranque", "guardar_zip", "extraer_zip", "compactar_chat", "analisis",
+    "optimizar_imagenes", "imagenes_relevantes", "evidencias_html", "render_pdf", "total",
+)
+
+
+def peak_rss_mb() -> float:
+    """Memoria pico del proceso actual (VmHWM en Linux; ru_maxrss se hereda a través de exec)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageTimer:
+    """Acumula la duración de cada etapa de la corrida en curso"""
+
+    def __init__(self):
+        self.current: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.current[stage] = self.current.get(stage, 0.0) + seconds
+
+    def wrap(self, stage: str, func):
+        """Envuelve una función (síncrona o async) para medir su duración"""
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+
+async def run_scenario(zip_path: Path, runs: int) -> List[Dict[str, float]]:
+    """Procesa el ZIP `runs` veces con el flujo de /crear-informe-final"""
+    from starlette.datastructures import UploadFile
+
+    import main
+
+    timer = StageTimer()
+    main.save_upload_file = timer.wrap("guardar_zip", main.save_upload_file)
+    main.extract_zip = timer.wrap("extraer_zip", main.extract_zip)
+    main.compact_chat = timer.wrap("compactar_chat", main.compact_chat)
+    main.get_relevant_images = timer.wrap("imagenes_relevantes", main.get_relevant_images)
+
+    start = time.perf_counter()
+    async with main.lifespan(main.app):
+        startup = time.perf_counter() - start
+        state = main.app.state
+        state.analyzer.generate_project_report = timer.wrap("analisis", state.analyzer.generate_project_report)
+        pool = state.render_pool
+        pool.optimize_images = timer.wrap("optimizar_imagenes", pool.optimize_images)
+        pool.build_images_section = timer.wrap("evidencias_html", pool.build_images_section)
+        pool.render_informe_pdf = timer.wrap("render_pdf", pool.render_informe_pdf)
+
+        results = []
+        for _ in range(runs):
+            timer.current = {"arranque": startup} if not results else {}
+            start = time.perf_counter()
+            with tempfile.TemporaryDirectory() as tmp:
+                work_dir = Path(tmp)
+                with open(zip_path, 'rb') as f:
+                    upload = UploadFile(f, filename=zip_path.name)
+                    await main.save_upload_file(upload, work_dir / zip_path.name, main.settings.max_file_size)
+                await main.procesar_informe(work_dir / zip_path.name, work_dir, work_dir / "informe.pdf")
+            timer.add("total", time.perf_counter() - start)
+            results.append(timer.current)
+    return results
+
+
+def run_child(zip_path: Path, runs: int) -> dict:
+    # Los prints del flujo van a stderr para dejar stdout solo para el resultado
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        runs_data = asyncio.run(run_scenario(zip_path, runs))
+    finally:
+        sys.stdout = stdout
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        "runs": [{stage: round(seconds, 4) for stage, seconds in run.items()} for run in runs_data],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_workers_mb": round(children, 1),
+    }
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Media, mínimo y máximo por etapa (el arranque solo existe en la primera corrida)"""
+    summary = {}
+    for stage in STAGES:
+        values = [run[stage] for run in runs if stage in run]
+        if values:
+            summary[stage] = {
+                "mean_ms": round(1000 * sum(values) / len(values), 1),
+                "min_ms": round(1000 * min(values), 1),
+                "max_ms": round(1000 * max(values), 1),
+            }
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_summary(result: dict, baseline: dict = None):
+    header = f"{'etapa':<22}{'media ms':>10}{'min ms':>10}{'max ms':>10}"
+    print(header + (f"{'base ms':>10}{'cambio':>9}" if baseline else ""))
+    for stage, values in result["summary"].items():
+        line = f"{stage:<22}{values['mean_ms']:>10}{values['min_ms']:>10}{values['max_ms']:>10}"
+        base = (baseline or {}).get("summary", {}).get(stage)
+        if base:
+            change = (values['mean_ms'] - base['mean_ms']) / base['mean_ms'] if base['mean_ms'] else 0.0
+            line += f"{base['mean_ms']:>10}{change:>+9.0%}"
+        print(line)
+    print(f"\nRSS pico: {result['peak_rss_mb']} MB (app), {result['peak_rss_workers_mb']} MB (workers de render)"
+          + (f"; base {baseline['peak_rss_mb']} / {baseline['peak_rss_workers_mb']} MB" if baseline else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_spec_arguments(parser)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--backend', choices=('fake', 'gemini'), default='fake',
+                        help="'gemini' usa la API real (requiere GEMINI_API_KEY)")
+    parser.add_argument('--fake-latency-ms', type=float, default=1500.0)
+    parser.add_argument('--output', type=Path, help="Archivo JSON del resultado (por defecto en benchmarks/results/)")
+    parser.add_argument('--compare', type=Path, help="Resultado JSON anterior para comparar")
+    parser.add_argument('--child', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.runs)))
+        return
+
+    spec = spec_from_args(args)
+    # Configuración del subproceso: sin caches, para que cada corrida haga todo el trabajo
+    env = dict(os.environ)
+    env.update({
+        "ANALYZER_BACKEND": args.backend,
+        "FAKE_ANALYZER_LATENCY_MS": str(args.fake_latency_ms),
+        "FAKE_ANALYZER_SEED": str(spec.seed),
+        "GEMINI_CACHE_ENABLED": "false",
+        "INCREMENTAL_ANALYSIS_ENABLED": "false",
+        "IMAGE_CACHE_MAX_MB": "0",
+        "GEMINI_WARMUP": "false" if args.backend == 'fake' else env.get("GEMINI_WARMUP", "true"),
+    })
+    for name in ("GEMINI_API_KEY", "SUPABASE_URL", "SUPABASE_KEY"):
+        env.setdefault(name, "benchmark")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = Path(tmp) / "chat.zip"
+        print(f"Generando exportación sintética: {spec}")
+        zip_path.write_bytes(build_export(spec))
+        zip_mb = zip_path.stat().st_size / 1024 / 1024
+
+        out = subprocess.run(
+            [sys.executable, __file__, '--child', str(zip_path), '--runs', str(args.runs)],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        if out.returncode != 0:
+            sys.stderr.write(out.stderr)
+            sys.exit(out.returncode)
+        child = json.loads(out.stdout.strip().splitlines()[-1])
+
+    result = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "spec": asdict(spec),
+        "backend": args.backend,
+        "fake_latency_ms": args.fake_latency_ms if args.backend == 'fake' else None,
+        "zip_mb": round(zip_mb, 2),
+        **child,
+        "summary": summarize(child["runs"]),
+    }
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / (f"e2e_{datetime.now():%Y%m%d_%H%M%S}_{spec.platform}_{spec.locale}"
+                                f"_{spec.messages}m_{spec.images}i.json")
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print(f"ZIP de {result['zip_mb']} MB, {args.runs} corridas, backend {args.backend}\n")
+    print_summary(result, baseline)
+    print(f"\nResultado guardado en {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria y velocidad de MessageTable frente a la lista de WhatsAppMessage.
+
+Parsea con WhatsAppProcessor._parse_chat_file una exportación sintética grande
+(300k mensajes por defecto) de dos formas: con la tabla en columnas actual y con
+la lista de modelos Pydantic validados que se usaba antes. Para cada una reporta el
+tiempo de parseo, la memoria retenida (tracemalloc), el tiempo de recorrer todos los
+mensajes leyendo sus campos y el de calcular participantes y rango de fechas.
+También mide exportar filas de la tabla a WhatsAppMessage.
+
+Uso:
+    python benchmarks/bench_message_store.py [--messages 300000] [--platform android] [--repeat 3]
+"""
+
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_export import PLATFORMS, ExportSpec, generate_chat
+
+from fastapi_docswhatsapp.models import WhatsAppMessage
+from fastapi_docswhatsapp.services import whatsapp_processor
+from fastapi_docswhatsapp.services.whatsapp_processor import WhatsAppProcessor
+
+
+class ModelList(list):
+    """Lista de WhatsAppMessage con la interfaz de append de MessageTable (el parseo anterior)"""
+
+    def append(self, timestamp, sender, content, message_type='text', media_path=None):
+        super().append(WhatsAppMessage(timestamp=timestamp, sender=sender, content=content,
+                                       message_type=message_type, media_path=media_path))
+
+
+@contextmanager
+def storage(kind: str):
+    """Hace que el procesador guarde los mensajes en la tabla o en la lista de modelos"""
+    original = whatsapp_processor.MessageTable
+    if kind == 'lista':
+        whatsapp_processor.MessageTable = ModelList
+    try:
+        yield
+    finally:
+        whatsapp_processor.MessageTable = original
+
+
+def scan(messages) -> int:
+    """Recorre todos los mensajes leyendo sus campos, como lo hacen los reportes"""
+    total = 0
+    for message in messages:
+        total += len(message.content) + len(message.sender) + len(message.message_type)
+        message.timestamp
+    return total
+
+
+def summarize(messages):
+    """Participantes y rango de fechas como en process_zip (antes y ahora)"""
+    if isinstance(messages, ModelList):
+        return (list(set(m.sender for m in messages)),
+                min(m.timestamp for m in messages), max(m.timestamp for m in messages))
+    return list(messages.senders), messages.date_range()
+
+
+def best_time(func, repeat: int):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def retained_mb(func) -> float:
+    """Memoria que queda asignada por el resultado de func()"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return (after - before) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=300_000)
+    parser.add_argument('--platform', choices=PLATFORMS, default='android')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    text, _ = generate_chat(ExportSpec(messages=args.messages, platform=args.platform, images=0))
+    processor = WhatsAppProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_file = Path(tmp) / "_chat.txt"
+        chat_file.write_text(text, encoding='utf-8')
+        print(f"Chat {args.platform}: {args.messages} mensajes, {chat_file.stat().st_size / 1024 / 1024:.1f} MB\n")
+
+        print(f"{'almacenamiento':<16}{'parseo s':>10}{'memoria MB':>12}{'recorrido s':>13}{'resumen s':>11}")
+        results = {}
+        for kind in ('lista', 'tabla'):
+            with storage(kind):
+                parse_seconds, messages = best_time(lambda: processor._parse_chat_file(chat_file), args.repeat)
+                memory = retained_mb(lambda: processor._parse_chat_file(chat_file))
+            scan_seconds, checksum = best_time(lambda: scan(messages), args.repeat)
+            summary_seconds, _ = best_time(lambda: summarize(messages), args.repeat)
+            results[kind] = (parse_seconds, memory, checksum, messages)
+            print(f"{kind:<16}{parse_seconds:>10.2f}{memory:>12.1f}{scan_seconds:>13.2f}{summary_seconds:>11.3f}")
+
+        (list_parse, list_memory, list_checksum, models), (table_parse, table_memory, table_checksum, table) = (
+            results['lista'], results['tabla'])
+        export_seconds, exported = best_time(lambda: table.to_models(0, 1000), args.repeat)
+        same = list_checksum == table_checksum and exported == models[:1000]
+        print(f"\nExportar 1000 filas a WhatsAppMessage: {export_seconds * 1000:.1f} ms")
+        print(f"Tabla: {table.nbytes() / 1024 / 1024:.1f} MB en columnas y buffer, {len(table.senders)} remitentes")
+        print(f"Parseo {list_parse / table_parse:.1f}x más rápido, memoria {list_memory / table_memory:.1f}x menor; "
+              + ("mismos mensajes" if same else "¡RESULTADOS DISTINTOS!"))
+
+
+if __name__ == '__main__':
+    main()
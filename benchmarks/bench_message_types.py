@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Precisión y velocidad de la clasificación de tipos de mensaje (message_types).
+
+Evalúa el clasificador actual (un único patrón anclado con los marcadores de
+multimedia y del sistema) y el anterior de WhatsAppProcessor (cinco regex buscadas en
+cualquier parte del mensaje en minúsculas) sobre el corpus etiquetado de
+tests/test_message_types.py: cuerpos de mensaje de iOS y Android en español e inglés,
+incluidos textos normales que mencionan "documento", "archivo" o "video". Luego mide
+el rendimiento de clasificar en lote todos los mensajes de un chat sintético a partir
+de los tokens del tokenizador.
+
+Uso:
+    python benchmarks/bench_message_types.py [--messages 300000] [--repeat 3] [--errors]
+"""
+
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_export import PLATFORMS, ExportSpec, generate_chat
+
+from fastapi_docswhatsapp.services.chat_tokenizer import tokenize_chat
+from fastapi_docswhatsapp.services.message_types import classify_message, classify_tokens
+from tests.test_message_types import LABELED_CORPUS
+
+# Clasificador anterior de WhatsAppProcessor
+LEGACY_PATTERNS = {
+    'image': re.compile(r'<se omitió multimedia>|<Media omitted>|\(archivo adjunto\)'),
+    'document': re.compile(r'documento|document|archivo|file'),
+    'audio': re.compile(r'audio|voice note|nota de voz'),
+    'video': re.compile(r'video|vídeo'),
+    'location': re.compile(r'ubicación compartida|location shared'),
+}
+
+
+def legacy_classify(content: str) -> str:
+    content_lower = content.lower()
+    for msg_type, pattern in LEGACY_PATTERNS.items():
+        if pattern.search(content_lower):
+            return msg_type
+    return 'text'
+
+
+def accuracy(classify, show_errors: bool) -> float:
+    correct = 0
+    for body, expected in LABELED_CORPUS:
+        got = classify(body)
+        correct += got == expected
+        if show_errors and got != expected:
+            print(f"    esperado {expected:<9} obtenido {got:<9} {body[:60]!r}")
+    return correct / len(LABELED_CORPUS)
+
+
+def best_time(func, repeat: int):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=300_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--errors', action='store_true', help="Mostrar los mensajes mal clasificados")
+    args = parser.parse_args()
+
+    print(f"Corpus etiquetado: {len(LABELED_CORPUS)} mensajes")
+    for name, classify in (("anterior", legacy_classify), ("actual", classify_message)):
+        if args.errors:
+            print(f"  {name}:")
+        print(f"  precisión {name}: {accuracy(classify, args.errors):.1%}")
+
+    print(f"\n{'chat':<10}{'método':<11}{'mensajes':>10}{'segundos':>10}{'Mmsg/s':>9}  tipos")
+    for platform in PLATFORMS:
+        text, _ = generate_chat(ExportSpec(messages=args.messages, platform=platform, images=0,
+                                           attachment_density=0.05))
+        tokens = tokenize_chat(text)
+        runs = (
+            ("anterior", lambda: [legacy_classify(token.body(text)) for token in tokens]),
+            ("actual", lambda: classify_tokens(text, tokens)),
+        )
+        for name, func in runs:
+            seconds, types = best_time(func, args.repeat)
+            counts = ", ".join(f"{kind} {count}" for kind, count in Counter(types).most_common())
+            print(f"{platform:<10}{name:<11}{len(types):>10}{seconds:>10.2f}{len(types) / seconds / 1e6:>9.2f}  {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parseo de mensajes de varias líneas en WhatsAppProcessor._parse_chat_file.
+
+Genera chats con unos pocos mensajes muy largos (logs o reportes pegados en el chat)
+y duplica la cantidad de líneas en cada paso. Compara el parseo actual, que junta las
+líneas del mensaje y lo crea una sola vez, con el anterior, que concatenaba cada línea
+de continuación al contenido del mensaje (copiando todo el texto en cada línea).
+Si el parseo es lineal, el tiempo por línea se mantiene constante entre pasos.
+
+Uso:
+    python benchmarks/bench_multiline_parse.py [--max-lines 256000] [--messages 4] [--repeat 3]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi_docswhatsapp.models import WhatsAppMessage
+from fastapi_docswhatsapp.services.chat_dates import ChatDateFormat, ChatDateParser
+from fastapi_docswhatsapp.services.chat_tokenizer import CHAT_FORMATS, detect_chat_format
+from fastapi_docswhatsapp.services.message_types import classify_message
+from fastapi_docswhatsapp.services.whatsapp_processor import WhatsAppProcessor
+
+LOG_LINE = "2024-03-01 07:{minute:02d}:{second:02d} INFO bomba de concreto presión={value} bar, caudal estable"
+
+
+def build_chat(total_lines: int, messages: int) -> str:
+    """Chat de Android con `messages` mensajes largos que suman `total_lines` líneas"""
+    per_message = max(1, total_lines // messages)
+    parts = []
+    for i in range(messages):
+        parts.append(f"1/3/24, 07:{i % 60:02d} - Ana Pérez: Log de la bomba, parte {i + 1}")
+        parts.extend(LOG_LINE.format(minute=j // 60 % 60, second=j % 60, value=100 + j % 50)
+                     for j in range(per_message - 1))
+    return "\n".join(parts) + "\n"
+
+
+class LegacyProcessor(WhatsAppProcessor):
+    """Parseo anterior: cada línea de continuación se concatena al contenido del mensaje"""
+
+    def _parse_chat_file(self, chat_file: Path):
+        messages = []
+        with open(chat_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        message_pattern = CHAT_FORMATS[detect_chat_format(content)]
+        date_parser = ChatDateParser(ChatDateFormat())
+
+        current_message = None
+        for line in content.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            match = message_pattern.match(line)
+            if match and match.group('sender'):
+                if current_message:
+                    messages.append(current_message)
+                date_str, time_str, sender = match.group('date', 'time', 'sender')
+                text = line[match.end():]
+                current_message = WhatsAppMessage(
+                    timestamp=date_parser.parse(date_str, time_str),
+                    sender=sender.strip(),
+                    content=text.strip(),
+                    message_type=classify_message(text)
+                )
+            elif current_message:
+                current_message.content += f"\n{line}"
+        if current_message:
+            messages.append(current_message)
+        return messages
+
+
+def best_time(processor: WhatsAppProcessor, chat_file: Path, repeat: int):
+    """Mejor tiempo de `repeat` parseos y el resultado del último"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = processor._parse_chat_file(chat_file)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-lines', type=int, default=4000)
+    parser.add_argument('--max-lines', type=int, default=256_000)
+    parser.add_argument('--messages', type=int, default=4, help="Mensajes entre los que se reparten las líneas")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy-max-lines', type=int, default=64_000,
+                        help="Máximo de líneas para el parseo anterior (crece de forma cuadrática)")
+    args = parser.parse_args()
+
+    current, legacy = WhatsAppProcessor(), LegacyProcessor()
+    print(f"{'líneas':>9}{'MB':>7}{'actual s':>10}{'µs/línea':>10}{'anterior s':>12}{'µs/línea':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_file = Path(tmp) / "_chat.txt"
+        lines = args.min_lines
+        while lines <= args.max_lines:
+            text = build_chat(lines, args.messages)
+            chat_file.write_text(text, encoding='utf-8')
+            size_mb = len(text.encode('utf-8')) / 1024 / 1024
+
+            seconds, messages = best_time(current, chat_file, args.repeat)
+            row = f"{lines:>9}{size_mb:>7.1f}{seconds:>10.3f}{seconds / lines * 1e6:>10.2f}"
+            if lines <= args.legacy_max_lines:
+                legacy_seconds, legacy_messages = best_time(legacy, chat_file, args.repeat)
+                same = [m.content for m in messages] == [m.content for m in legacy_messages]
+                row += f"{legacy_seconds:>12.3f}{legacy_seconds / lines * 1e6:>10.2f}"
+                row += "" if same else "  ¡CONTENIDO DISTINTO!"
+            print(row)
+            lines *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria de WhatsAppProcessor.iter_messages sobre chats cada vez más grandes.
+
+Crea ZIPs con solo el archivo del chat (comprimido, como los exporta WhatsApp) y
+duplica la cantidad de mensajes en cada paso. Compara la memoria pico (tracemalloc)
+y el tiempo de recorrer todos los mensajes con iter_messages, que lee y decodifica
+el miembro del ZIP por bloques, con la lectura anterior: el archivo completo en un
+solo string antes de parsear. Con la lectura por bloques la memoria pico se mantiene
+constante aunque el chat crezca.
+
+Uso:
+    python benchmarks/bench_stream_messages.py [--messages 50000] [--steps 3] [--platform android]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_export import PLATFORMS, ExportSpec, chat_filename, generate_chat
+
+from fastapi_docswhatsapp.services.whatsapp_processor import WhatsAppProcessor
+
+
+def streamed(processor: WhatsAppProcessor, zip_path: Path) -> int:
+    """Recorre los mensajes con iter_messages sin guardarlos"""
+    return sum(1 for _ in processor.iter_messages(zip_path))
+
+
+def read_whole(processor: WhatsAppProcessor, zip_path: Path) -> int:
+    """Lectura anterior: todo el chat decodificado en memoria antes de parsear"""
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        member = processor._find_chat_member(zip_ref)
+        data = zip_ref.read(member)
+    try:
+        content = data.decode('utf-8')
+    except UnicodeDecodeError:
+        content = data.decode('latin-1')
+    return sum(1 for _ in processor._iter_parsed_messages([content]))
+
+
+def measure(func, *args):
+    """Tiempo y memoria pico (MB) de func(*args)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=50_000, help="Mensajes del primer paso")
+    parser.add_argument('--steps', type=int, default=3)
+    parser.add_argument('--platform', choices=PLATFORMS, default='android')
+    args = parser.parse_args()
+
+    processor = WhatsAppProcessor()
+    print(f"{'mensajes':>10}{'chat MB':>9}{'pico bloques MB':>17}{'s':>7}{'pico completo MB':>18}{'s':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = Path(tmp) / "chat.zip"
+        messages = args.messages
+        for _ in range(args.steps):
+            spec = ExportSpec(messages=messages, platform=args.platform, images=0)
+            text, _ = generate_chat(spec)
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+                zip_ref.writestr(chat_filename(spec), text)
+            size_mb = len(text.encode('utf-8')) / 1024 / 1024
+            del text
+
+            stream_seconds, stream_peak, stream_count = measure(streamed, processor, zip_path)
+            whole_seconds, whole_peak, whole_count = measure(read_whole, processor, zip_path)
+            same = "" if stream_count == whole_count else "  ¡CANTIDAD DISTINTA!"
+            print(f"{stream_count:>10}{size_mb:>9.1f}{stream_peak:>17.1f}{stream_seconds:>7.1f}"
+                  f"{whole_peak:>18.1f}{whole_seconds:>7.1f}{same}")
+            messages *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Generador de exportaciones sintéticas de WhatsApp (ZIP con el chat y sus adjuntos).
+
+Reproduce los formatos reales de iOS y Android en español e inglés: cabeceras con
+fecha y hora, marcas LRM, avisos del sistema, mensajes de varias líneas, mensajes
+eliminados y referencias a adjuntos. El resultado es determinista para una semilla.
+
+Uso:
+    python benchmarks/synthetic_export.py salida.zip [--messages 2000] [--platform ios]
+        [--locale es] [--images 20] [--image-width 4032] [--image-height 3024]
+        [--attachment-density 0.05] [--seed 0]
+"""
+
+import argparse
+import io
+import random
+import sys
+import zipfile
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+from PIL import Image
+
+PLATFORMS = ('ios', 'android')
+LOCALES = ('es', 'en')
+
+SENDERS = ("Ana Pérez", "Luis Gómez", "María Fernández", "Carlos Ruiz", "Ana Torres", "+51 987 654 321")
+
+PHRASES = {
+    'es': (
+        "Buenos días equipo", "Ya llegó el material a obra", "Avance del vaciado de la losa al 60%",
+        "Mañana revisamos los planos con el supervisor", "Se instaló la tubería del segundo piso",
+        "Falta confirmar la entrega del cemento", "Reunión a las 3 pm en la caseta",
+        "El inspector aprobó el encofrado 👍", "Hay que reforzar la señalización en el acceso",
+        "Listo el muro perimétrico", "Se retrasó la grúa por la lluvia", "Ok, gracias",
+    ),
+    'en': (
+        "Good morning team", "Materials arrived on site", "Slab pour is 60% done",
+        "Tomorrow we review the drawings with the supervisor", "Second floor piping installed",
+        "Still waiting to confirm the cement delivery", "Meeting at 3 pm in the site office",
+        "Inspector approved the formwork 👍", "We need better signage at the entrance",
+        "Perimeter wall finished", "Crane delayed because of the rain", "Ok, thanks",
+    ),
+}
+
+SYSTEM_MESSAGES = {
+    'es': ("Los mensajes y las llamadas están cifrados de extremo a extremo.", "{sender} añadió a Pedro"),
+    'en': ("Messages and calls are end-to-end encrypted.", "{sender} added Pedro"),
+}
+
+# Marca de izquierda a derecha que iOS antepone a adjuntos y avisos del sistema
+LRM = '\u200e'
+
+DELETED = {'es': "Se eliminó este mensaje.", 'en': "This message was deleted."}
+
+# Adjuntos que no son imágenes: (tipo iOS, prefijo Android, extensión)
+OTHER_ATTACHMENTS = (("AUDIO", "PTT", "opus"), ("VIDEO", "VID", "mp4"), ("DOCUMENT", "DOC", "pdf"))
+
+
+@dataclass
+class ExportSpec:
+    """Parámetros de una exportación sintética"""
+    messages: int = 2000
+    platform: str = 'ios'
+    locale: str = 'es'
+    images: int = 20
+    image_width: int = 4032
+    image_height: int = 3024
+    attachment_density: float = 0.05
+    seed: int = 0
+
+
+def chat_filename(spec: ExportSpec) -> str:
+    """Nombre del archivo de chat que usa cada plataforma"""
+    if spec.platform == 'ios':
+        return "_chat.txt"
+    return "Chat de WhatsApp con Obra.txt" if spec.locale == 'es' else "WhatsApp Chat with Obra.txt"
+
+
+def format_header(spec: ExportSpec, when: datetime) -> str:
+    """Cabecera de mensaje con fecha y hora en el formato de la plataforma y el idioma"""
+    day, month, year = when.day, when.month, when.strftime('%y')
+    date = f"{day}/{month}/{year}" if spec.locale == 'es' else f"{month}/{day}/{year}"
+    hour12 = when.hour % 12 or 12
+    if spec.platform == 'ios':
+        if spec.locale == 'es':
+            suffix = "a. m." if when.hour < 12 else "p. m."
+            return f"[{date}, {hour12}:{when:%M:%S} {suffix}]"
+        return f"[{date}, {hour12}:{when:%M:%S} {'AM' if when.hour < 12 else 'PM'}]"
+    if spec.locale == 'es':
+        return f"{date}, {when:%H:%M} -"
+    return f"{date}, {hour12}:{when:%M} {'AM' if when.hour < 12 else 'PM'} -"
+
+
+def attachment_reference(spec: ExportSpec, filename: str) -> str:
+    """Texto del mensaje que referencia un adjunto"""
+    if spec.platform == 'ios':
+        return f"{LRM}<{'adjunto' if spec.locale == 'es' else 'attached'}: {filename}>"
+    return f"{filename} ({'archivo adjunto' if spec.locale == 'es' else 'file attached'})"
+
+
+def system_prefix(spec: ExportSpec) -> str:
+    """iOS escribe los avisos del sistema a nombre del grupo, con una marca LRM"""
+    return f"Obra: {LRM}" if spec.platform == 'ios' else ""
+
+
+def attachment_filename(spec: ExportSpec, index: int, when: datetime, kind: Tuple[str, str, str]) -> str:
+    ios_kind, android_prefix, ext = kind
+    if spec.platform == 'ios':
+        return f"{index:08d}-{ios_kind}-{when:%Y-%m-%d-%H-%M-%S}.{ext}"
+    return f"{android_prefix}-{when:%Y%m%d}-WA{index:04d}.{ext}"
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    """JPEG con ruido (se comprime como una foto real) de la resolución pedida"""
+    noise = Image.effect_noise((max(1, width // 8), max(1, height // 8)), 30 + seed % 40).convert('RGB')
+    img = noise.resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def generate_chat(spec: ExportSpec) -> Tuple[str, List[Tuple[str, bool]]]:
+    """
+    Genera el texto del chat y la lista de adjuntos referenciados (nombre, es_imagen).
+    Las `images` fotos se reparten entre los mensajes con adjunto; el resto de los
+    adjuntos (según attachment_density) son audios, videos o documentos.
+    """
+    rng = random.Random(spec.seed)
+    phrases = PHRASES[spec.locale]
+    when = datetime(2024, 3, 1, 7, 30)
+    attachment_count = max(spec.images, round(spec.messages * spec.attachment_density))
+    attachment_slots = set(rng.sample(range(spec.messages), min(attachment_count, spec.messages)))
+    image_slots = set(rng.sample(sorted(attachment_slots), min(spec.images, len(attachment_slots))))
+
+    lines = [f"{format_header(spec, when)} {system_prefix(spec)}{SYSTEM_MESSAGES[spec.locale][0]}"]
+    attachments: List[Tuple[str, bool]] = []
+    for i in range(spec.messages):
+        when += timedelta(minutes=rng.choice((1, 2, 5, 15, 45)))
+        if when.hour >= 19:
+            when = (when + timedelta(days=1)).replace(hour=7, minute=rng.randint(0, 59))
+        sender = rng.choice(SENDERS)
+        header = format_header(spec, when)
+
+        if i in attachment_slots:
+            is_image = i in image_slots
+            kind = ("PHOTO", "IMG", "jpg") if is_image else rng.choice(OTHER_ATTACHMENTS)
+            name = attachment_filename(spec, len(attachments) + 1, when, kind)
+            attachments.append((name, is_image))
+            lines.append(f"{header} {sender}: {attachment_reference(spec, name)}")
+            continue
+
+        roll = rng.random()
+        if roll < 0.01:
+            system = SYSTEM_MESSAGES[spec.locale][1].format(sender=sender)
+            lines.append(f"{header} {system_prefix(spec)}{system}")
+        elif roll < 0.02:
+            prefix = LRM if spec.platform == 'ios' else ""
+            lines.append(f"{header} {sender}: {prefix}{DELETED[spec.locale]}")
+        elif roll < 0.07:
+            # Mensaje de varias líneas
+            body = "\n".join(rng.choice(phrases) for _ in range(rng.randint(2, 5)))
+            lines.append(f"{header} {sender}: {body}")
+        else:
+            lines.append(f"{header} {sender}: {rng.choice(phrases)}")
+    return "\n".join(lines) + "\n", attachments
+
+
+def build_export(spec: ExportSpec) -> bytes:
+    """ZIP completo de la exportación: chat, fotos y demás adjuntos"""
+    chat_text, attachments = generate_chat(spec)
+    rng = random.Random(spec.seed)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(chat_filename(spec), chat_text)
+        for i, (name, is_image) in enumerate(attachments):
+            if is_image:
+                # WhatsApp guarda las fotos sin comprimir dentro del ZIP
+                zf.writestr(zipfile.ZipInfo(name), make_photo(spec.image_width, spec.image_height, spec.seed + i),
+                            compress_type=zipfile.ZIP_STORED)
+            else:
+                zf.writestr(name, rng.randbytes(rng.randint(4_000, 40_000)), compress_type=zipfile.ZIP_STORED)
+    return buf.getvalue()
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser):
+    """Argumentos de línea de comandos de ExportSpec, compartidos con los benchmarks"""
+    defaults = ExportSpec()
+    parser.add_argument('--messages', type=int, default=defaults.messages)
+    parser.add_argument('--platform', choices=PLATFORMS, default=defaults.platform)
+    parser.add_argument('--locale', choices=LOCALES, default=defaults.locale)
+    parser.add_argument('--images', type=int, default=defaults.images)
+    parser.add_argument('--image-width', type=int, default=defaults.image_width)
+    parser.add_argument('--image-height', type=int, default=defaults.image_height)
+    parser.add_argument('--attachment-density', type=float, default=defaults.attachment_density,
+                        help="Fracción de mensajes con adjunto")
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def spec_from_args(args: argparse.Namespace) -> ExportSpec:
+    return ExportSpec(**{name: getattr(args, name) for name in asdict(ExportSpec())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', type=Path)
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    spec = spec_from_args(args)
+    data = build_export(spec)
+    args.output.write_bytes(data)
+    print(f"{args.output}: {len(data) / 1024 / 1024:.1f} MB ({spec.messages} mensajes, {spec.images} imágenes, "
+          f"{spec.platform}/{spec.locale})", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
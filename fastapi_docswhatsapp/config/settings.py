@@ -9,6 +9,19 @@ class Settings(BaseSettings):
     # Gemini
     gemini_api_key: str = Field(..., description="API Key de Google Gemini")
     gemini_model: str = Field(default="gemini-2.5-flash-lite", description="Modelo de Gemini a usar")
+    gemini_transport: Optional[str] = Field(default=None, description="Transporte del cliente de Gemini: grpc (por defecto) o rest")
+    gemini_warmup: bool = Field(default=True, description="Precalentar la conexión con Gemini al iniciar la app")
+    gemini_streaming: bool = Field(default=True, description="Generar el informe con streaming y publicar cada sección al completarse (/informes/{id}/eventos)")
+    gemini_max_concurrency: int = Field(default=4, description="Llamadas simultáneas a Gemini en toda la app")
+    gemini_requests_per_minute: int = Field(default=60, gt=0, description="Límite de solicitudes por minuto (RPM) a Gemini")
+    gemini_tokens_per_minute: int = Field(default=1_000_000, gt=0, description="Límite de tokens de entrada por minuto (TPM) a Gemini")
+    gemini_max_retries: int = Field(default=4, description="Reintentos ante errores 429/5xx de Gemini")
+    gemini_retry_base_delay: float = Field(default=1.0, description="Espera base (segundos) del reintento exponencial")
+    gemini_retry_max_delay: float = Field(default=30.0, description="Espera máxima (segundos) entre reintentos")
+    analyzer_backend: str = Field(default="gemini", description="Backend del análisis: 'gemini' o 'fake' (simulado, sin red, para pruebas de carga)")
+    fake_analyzer_latency_ms: float = Field(default=1500.0, description="Latencia mediana (ms) de cada llamada del backend simulado")
+    fake_analyzer_latency_sigma: float = Field(default=0.3, description="Dispersión log-normal de la latencia del backend simulado")
+    fake_analyzer_seed: Optional[int] = Field(default=None, description="Semilla de las latencias del backend simulado (None: aleatoria)")
     
     # Supabase
     supabase_url: str = Field(..., description="URL de Supabase")
@@ -21,12 +34,41 @@ class Settings(BaseSettings):
     debug: bool = Field(default=False, description="Modo debug")
     
     # Configuración de archivos
-    max_file_size: int = Field(default=50 * 1024 * 1024, description="Tamaño máximo de archivo (50MB)")
+    max_file_size: int = Field(default=500 * 1024 * 1024, description="Tamaño máximo de archivo (500MB)")
     allowed_extensions: list = Field(default=[".zip"], description="Extensiones permitidas")
+    zip_extraction_mode: str = Field(default="selective", description="Extracción del ZIP: 'selective' (solo chat e imágenes referenciadas) o 'full'")
+    fallback_images_limit: int = Field(default=3, description="Imágenes a incluir si el chat no referencia ninguna")
     
     # Configuración de procesamiento
-    max_messages_to_analyze: int = Field(default=1000, description="Máximo número de mensajes a analizar")
-    max_analysis_tokens: int = Field(default=8000, description="Máximo de tokens para análisis de Gemini")
+    max_messages_to_analyze: int = Field(default=2000, description="Máximo número de mensajes por llamada a Gemini")
+    max_analysis_tokens: int = Field(default=30000, description="Presupuesto de tokens de entrada por llamada a Gemini; los chats más largos se analizan por fragmentos")
+    chat_compaction_enabled: bool = Field(default=True, description="Compactar el chat (sin avisos del sistema, fechas por día, remitentes abreviados) antes de enviarlo a Gemini")
+    gemini_count_tokens: bool = Field(default=False, description="Contar los tokens de cada prompt con el modelo (una llamada extra a la API) en vez de solo estimarlos")
+    render_workers: int = Field(default=2, description="Procesos del pool de render (HTML y WeasyPrint)")
+    image_workers: int = Field(default=0, description="Procesos para optimizar imágenes (0: uno por núcleo)")
+    render_max_tasks_per_child: int = Field(default=50, description="Tareas por proceso de render antes de reciclarlo")
+    
+    # Optimización de imágenes
+    image_max_width: int = Field(default=800, description="Ancho máximo de las imágenes del informe")
+    image_max_height: int = Field(default=1200, description="Alto máximo de las imágenes del informe")
+    image_quality: int = Field(default=85, description="Calidad JPEG de las imágenes optimizadas")
+    image_engine: str = Field(default="draft", description="Motor de imágenes: 'draft' (decodificación JPEG reducida) o 'full'")
+    image_cache_dir: Optional[str] = Field(default=None, description="Directorio del cache de imágenes optimizadas (None: directorio temporal)")
+    image_cache_max_mb: int = Field(default=512, description="Tamaño máximo del cache de imágenes en MB (0 desactiva el cache)")
+    
+    # Cache de respuestas de Gemini
+    gemini_cache_enabled: bool = Field(default=True, description="Reutilizar informes de Gemini para chats ya analizados")
+    gemini_cache_path: Optional[str] = Field(default=None, description="Ruta de la base SQLite del cache (None: directorio temporal)")
+    gemini_cache_ttl: int = Field(default=7 * 24 * 3600, description="Segundos de vigencia de un informe cacheado")
+    gemini_cache_max_entries: int = Field(default=500, description="Máximo de informes en el cache (LRU)")
+    incremental_analysis_enabled: bool = Field(default=True, description="Enviar solo los mensajes nuevos cuando el chat extiende uno ya analizado")
+    incremental_snapshot_ttl: int = Field(default=30 * 24 * 3600, description="Segundos que se conserva el análisis de un chat para actualizarlo")
+    gemini_chunk_concurrency: int = Field(default=4, description="Fragmentos de un chat largo analizados en paralelo")
+    
+    # Trabajos asíncronos de informes (/informes)
+    job_workers: int = Field(default=2, description="Informes procesados en paralelo por la cola de trabajos")
+    job_queue_size: int = Field(default=20, description="Máximo de trabajos en espera")
+    job_result_ttl: int = Field(default=3600, description="Segundos que se conserva el PDF de un trabajo terminado")
     
     # CORS
     # cors_origins: list = Field(default=["*"], description="Orígenes permitidos para CORS")
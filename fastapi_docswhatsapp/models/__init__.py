@@ -29,6 +29,24 @@ class ProjectAnalysis(BaseModel):
     timeline_analysis: Dict[str, Any]
     participant_contributions: Dict[str, Any]
     
+class ActividadBitacora(BaseModel):
+    """Modelo para una actividad del informe de bitácora"""
+    fecha: str  # DD/MM/YYYY
+    descripcion: str
+    responsable: str
+
+class InformeBitacora(BaseModel):
+    """Modelo del informe de bitácora que genera Gemini (define el esquema de su respuesta)"""
+    titulo_proyecto: str
+    resumen_ejecutivo: str
+    objetivos: List[str]
+    actividades_realizadas: List[ActividadBitacora]
+    resultados_logros: List[str]
+    desafios_obstaculos: List[str]
+    lecciones_aprendidas: List[str]
+    conclusiones: str
+    recomendaciones: List[str]
+    
 class ProjectExtract(BaseModel):
     """Modelo para extractos de avances guardados en Supabase"""
     id: Optional[str] = None
@@ -38,4 +56,17 @@ class ProjectExtract(BaseModel):
     milestones: List[str]
     progress_percentage: float
     key_insights: List[str]
-    created_at: Optional[datetime] = None
\ No newline at end of file
+    created_at: Optional[datetime] = None
+
+class InformeJob(BaseModel):
+    """Modelo para un trabajo asíncrono de generación de informe"""
+    id: str
+    filename: str
+    status: str = "en_cola"  # 'en_cola', 'procesando', 'completado', 'error'
+    stage: str = "en_cola"
+    progress: int = 0
+    error: Optional[str] = None
+    content_hash: Optional[str] = None
+    total_images: int = 0
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi_docswhatsapp.services.prompt_budget import estimate_tokens
+
+# Backends disponibles para Settings.analyzer_backend
+ANALYZER_BACKENDS = ('gemini', 'fake')
+
+# Fechas que aparecen en el chat (completo o compactado), para las actividades simuladas
+CHAT_DATE_PATTERN = re.compile(r'(?:^\[?|^== )(\d{1,2})/(\d{1,2})/(\d{2,4})', re.MULTILINE)
+
+# Tamaño de los fragmentos de texto en el streaming simulado
+FAKE_STREAM_CHUNK_CHARS = 200
+
+
+class AnalyzerBackend(ABC):
+    """
+    Interfaz del modelo que usa GeminiAnalyzer.
+
+    generation_config es un dict con las claves de GenerationConfig (temperature,
+    max_output_tokens, response_mime_type, response_schema...). Las respuestas
+    exponen .text y, si el backend lo reporta, .usage_metadata; con stream=True se
+    devuelve un iterador de fragmentos con .text.
+    """
+
+    model_name: str
+
+    @abstractmethod
+    def generate(self, prompt: str, generation_config: Dict[str, Any], stream: bool = False) -> Any:
+        """Genera una respuesta (bloqueante; el planificador la ejecuta en un hilo)"""
+
+    @abstractmethod
+    def count_tokens(self, prompt: str) -> int:
+        """Tokens del prompt según el modelo"""
+
+    async def warm_up(self, timeout: float = 10.0) -> bool:
+        """Prepara conexiones antes de la primera solicitud; por defecto no hace nada"""
+        return True
+
+
+class FakeAnalyzerBackend(AnalyzerBackend):
+    """
+    Backend local sin red para pruebas de carga y benchmarks.
+
+    Devuelve JSON válido según el response_schema pedido, con contenido determinista
+    derivado del prompt (el mismo chat produce el mismo informe), y simula la latencia
+    del modelo con una distribución log-normal de mediana latency_ms.
+    """
+
+    def __init__(self, latency_ms: float = 1500.0, latency_sigma: float = 0.3,
+                 seed: Optional[int] = None, model_name: str = "fake"):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def generate(self, prompt: str, generation_config: Dict[str, Any], stream: bool = False) -> Any:
+        schema = generation_config.get("response_schema")
+        if schema is not None:
+            text = json.dumps(self._fake_report(prompt, schema), ensure_ascii=False)
+        else:
+            text = f"Respuesta simulada para un prompt de {len(prompt)} caracteres."
+        usage = SimpleNamespace(
+            prompt_token_count=estimate_tokens(prompt),
+            candidates_token_count=estimate_tokens(text),
+            total_token_count=estimate_tokens(prompt) + estimate_tokens(text),
+        )
+        latency = self.sample_latency()
+        if not stream:
+            time.sleep(latency)
+            return SimpleNamespace(text=text, usage_metadata=usage)
+        return self._stream(text, latency, usage)
+
+    def count_tokens(self, prompt: str) -> int:
+        return estimate_tokens(prompt)
+
+    def sample_latency(self) -> float:
+        """Latencia simulada en segundos"""
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._rng_lock:
+            return self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms / 1000
+
+    def _stream(self, text: str, latency: float, usage: SimpleNamespace) -> Iterator[SimpleNamespace]:
+        pieces = [text[i:i + FAKE_STREAM_CHUNK_CHARS] for i in range(0, len(text), FAKE_STREAM_CHUNK_CHARS)]
+        for i, piece in enumerate(pieces):
+            time.sleep(latency / len(pieces))
+            last = i == len(pieces) - 1
+            yield SimpleNamespace(text=piece, usage_metadata=usage if last else None)
+
+    def _fake_report(self, prompt: str, schema: Dict[str, Any]) -> Any:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'big')
+        rng = random.Random(seed)
+        dates = [f"{int(d):02d}/{int(m):02d}/{y if len(y) == 4 else '20' + y}"
+                 for d, m, y in CHAT_DATE_PATTERN.findall(prompt)]
+        return _fake_value(schema, rng, "informe", dates or ["01/01/2024"])
+
+
+def _fake_value(schema: Dict[str, Any], rng: random.Random, name: str, dates: List[str]) -> Any:
+    """Valor determinista que cumple el esquema (subconjunto de JSON Schema de Gemini)"""
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: _fake_value(prop, rng, key, dates) for key, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), rng, name, dates) for _ in range(rng.randint(2, 5))]
+    if kind == "integer":
+        return rng.randint(0, 100)
+    if kind == "number":
+        return round(rng.uniform(0, 100), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if name == "fecha":
+        return rng.choice(dates)
+    return f"{name.replace('_', ' ').capitalize()} simulado {rng.randint(1, 999)}"
@@ -0,0 +1,116 @@
+import re
+from typing import Callable, List, Optional
+
+# Inicio de mensaje en exportaciones de iOS ("[dd/mm/yy, hh:mm:ss] ...") y Android ("dd/mm/yy, hh:mm - ...")
+MESSAGE_START_PATTERN = re.compile(r'^\[?(\d{1,2}/\d{1,2}/\d{2,4}),?\s+\d{1,2}:\d{2}', re.MULTILINE)
+
+# Formato compacto (ver chat_compactor): una cabecera por día y mensajes "hh:mm Remitente: texto"
+COMPACT_DAY_HEADER = "== {} =="
+COMPACT_DAY_PATTERN = re.compile(r'^== (\d{1,2}/\d{1,2}/\d{2,4}) ==$', re.MULTILINE)
+COMPACT_MESSAGE_START_PATTERN = re.compile(r'^(?:== \d{1,2}/\d{1,2}/\d{2,4} ==$|\d{1,2}:\d{2} )', re.MULTILINE)
+
+
+def is_compact_chat(chat_text: str) -> bool:
+    """Indica si el texto está en el formato compacto (empieza con cabecera de día o mensaje)"""
+    return COMPACT_MESSAGE_START_PATTERN.match(chat_text) is not None
+
+
+def split_chat_messages(chat_text: str) -> List[str]:
+    """
+    Divide el chat en mensajes completos, incluidas sus líneas de continuación.
+    En el formato compacto las cabeceras de día cuentan como mensajes.
+    """
+    pattern = COMPACT_MESSAGE_START_PATTERN if is_compact_chat(chat_text) else MESSAGE_START_PATTERN
+    starts = [m.start() for m in pattern.finditer(chat_text)]
+    if not starts:
+        return [chat_text] if chat_text else []
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    ends = starts[1:] + [len(chat_text)]
+    return [chat_text[s:e].rstrip('\n') for s, e in zip(starts, ends)]
+
+
+def message_date(message: str) -> Optional[str]:
+    """Fecha (tal como aparece en el chat) con la que empieza un mensaje o cabecera de día"""
+    match = MESSAGE_START_PATTERN.match(message) or COMPACT_DAY_PATTERN.match(message)
+    return match.group(1) if match else None
+
+
+def chunk_chat(chat_text: str, max_size: int, measure: Callable[[str], int] = len,
+               max_messages: Optional[int] = None, total_size: Optional[int] = None) -> List[str]:
+    """
+    Divide el chat en fragmentos de hasta max_size respetando los límites de mensaje
+    y, siempre que sea posible, de día: un día solo se parte si por sí solo excede
+    el tamaño, y un mensaje solo se corta si él mismo lo excede.
+    measure define la unidad del tamaño (caracteres por defecto, o tokens) y
+    max_messages limita además la cantidad de mensajes por fragmento y total_size es
+    el tamaño del chat completo si ya se midió.
+    """
+    messages = split_chat_messages(chat_text)
+    if total_size is None:
+        total_size = measure(chat_text)
+    if total_size <= max_size and (max_messages is None or len(messages) <= max_messages):
+        return [chat_text]
+
+    # Agrupar mensajes consecutivos del mismo día
+    days: List[List[str]] = []
+    current_date = None
+    for message in messages:
+        date = message_date(message)
+        if not days or (date is not None and date != current_date):
+            days.append([])
+            current_date = date
+        days[-1].append(message)
+
+    message_limit = max_messages or len(messages)
+    chunks: List[str] = []
+    buffer: List[str] = []
+    size = 0
+
+    def flush():
+        nonlocal buffer, size
+        if buffer:
+            chunks.append('\n'.join(buffer))
+        buffer = []
+        size = 0
+
+    for day in days:
+        sizes = [measure(m) + 1 for m in day]
+        day_size = sum(sizes)
+        if size + day_size <= max_size and len(buffer) + len(day) <= message_limit:
+            buffer.extend(day)
+            size += day_size
+            continue
+
+        flush()
+        if day_size <= max_size and len(day) <= message_limit:
+            buffer.extend(day)
+            size = day_size
+            continue
+
+        # El día no entra en un fragmento: partir por mensajes. En el formato compacto
+        # cada fragmento repite la cabecera del día para no perder la fecha
+        header = day[0] if COMPACT_DAY_PATTERN.match(day[0]) else None
+        for message, message_size in zip(day, sizes):
+            pieces = [message] if message_size <= max_size else _split_long_message(message, max_size, measure)
+            for piece in pieces:
+                piece_size = message_size if len(pieces) == 1 else measure(piece) + 1
+                if size + piece_size > max_size or len(buffer) >= message_limit:
+                    flush()
+                    if header is not None and piece is not header:
+                        buffer.append(header)
+                        size += sizes[0]
+                buffer.append(piece)
+                size += piece_size
+    flush()
+    return chunks
+
+
+def _split_long_message(message: str, max_size: int, measure: Callable[[str], int] = len) -> List[str]:
+    """Corta un mensaje más grande que max_size (p. ej. logs pegados) en piezas"""
+    total = measure(message)
+    if total <= max_size:
+        return [message]
+    # Longitud en caracteres proporcional al tamaño medido, con margen
+    step = max(1, int(len(message) * max_size / total * 0.9))
+    return [message[i:i + step] for i in range(0, len(message), step)]
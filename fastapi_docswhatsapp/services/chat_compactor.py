@@ -0,0 +1,214 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from fastapi_docswhatsapp.services.chat_chunker import COMPACT_DAY_HEADER
+from fastapi_docswhatsapp.services.chat_tokenizer import iter_chat_tokens
+from fastapi_docswhatsapp.services.prompt_budget import estimate_tokens
+
+# Marcas de dirección de texto que WhatsApp inserta (LRM, RLM, incrustaciones)
+DIRECTION_MARKS = re.compile('[\u200e\u200f\u202a-\u202e\u2066-\u2069]')
+
+# Adjuntos: "<attached: 00000012-PHOTO-....jpg>" (iOS) y "IMG-2024...jpg (archivo adjunto)" (Android)
+ATTACHMENT_PATTERN = re.compile(
+    r'^(?:<(?:attached|adjunto): (?P<ios>[^>]+)>|(?P<android>\S+\.\w{2,4}) \((?:archivo adjunto|file attached)\))$',
+    re.IGNORECASE
+)
+
+# Tipo de adjunto según el nombre del archivo
+ATTACHMENT_KINDS = (
+    (re.compile(r'PHOTO|IMG|\.(?:jpe?g|png|webp|heic)$', re.IGNORECASE), 'foto'),
+    (re.compile(r'VIDEO|VID|\.(?:mp4|mov|3gp)$', re.IGNORECASE), 'video'),
+    (re.compile(r'AUDIO|PTT|AUD|\.(?:opus|m4a|mp3|ogg)$', re.IGNORECASE), 'audio'),
+    (re.compile(r'STICKER|STK|\.webp$', re.IGNORECASE), 'sticker'),
+    (re.compile(r'\.(?:pdf|docx?|xlsx?|pptx?|txt|zip)$', re.IGNORECASE), 'documento'),
+)
+
+# Contenido que no aporta al informe y se descarta
+NOISE_PATTERN = re.compile(
+    r'^(?:<?(?:Media omitted|Multimedia omitido|se omitió multimedia)>?'
+    r'|(?:image|video|audio|sticker|GIF|document|Contact card) omitted'
+    r'|(?:imagen|video|audio|sticker|GIF|documento|tarjeta de contacto) omitid[oa]'
+    r'|This message was deleted\.?|You deleted this message\.?'
+    r'|Se eliminó este mensaje\.?|Eliminaste este mensaje\.?'
+    r'|(?:Missed )?(?:voice|video) call|Llamada (?:de voz|de video|perdida).*'
+    r'|null)$',
+    re.IGNORECASE
+)
+
+# Avisos del sistema de Android con ": " en el texto, que se confundirían con un remitente
+SYSTEM_PATTERN = re.compile(
+    r'\b(?:added|removed|left|joined using|created group|changed the|changed this group|'
+    r'añadió|agregó|eliminó a|salió|se unió|creó el grupo|cambió (?:el|la|tu|su))\b',
+    re.IGNORECASE
+)
+
+# Marcas de edición que se quitan del final del mensaje
+EDITED_SUFFIX = re.compile(r'\s*<(?:This message was edited|Se editó este mensaje\.?)>$', re.IGNORECASE)
+
+
+class CompactedChat:
+    """Resultado de compactar un chat, con el ahorro de tokens estimado"""
+
+    def __init__(self, text: str, original_tokens: int, compact_tokens: int,
+                 dropped_lines: int, aliases: Dict[str, str]):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.compact_tokens = compact_tokens
+        self.dropped_lines = dropped_lines
+        self.aliases = aliases
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compact_tokens
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.saved_tokens / self.original_tokens if self.original_tokens else 0.0
+
+
+def compact_chat(chat_text: str) -> CompactedChat:
+    """
+    Compacta el chat antes de enviarlo a Gemini:
+    - descarta avisos del sistema, multimedia omitida y mensajes eliminados;
+    - escribe la fecha una sola vez por día ("== d/m/aa ==") y la hora como hh:mm (24 h);
+    - abrevia los remitentes a su nombre de pila (o nombre e inicial si hay ambigüedad);
+    - resume las rachas de adjuntos del mismo remitente ("[3 fotos]").
+    El resultado es determinista y estable por prefijo, para el cache y el análisis
+    incremental: los alias se asignan en orden de aparición y no cambian, y la racha de
+    adjuntos con la que termina el chat se escribe un adjunto por línea, porque una
+    exportación posterior podría extenderla.
+    """
+    text = chat_text.replace('\r\n', '\n').replace('\r', '\n')
+    messages = []
+    dropped = 0
+    for date, time, sender, body in _parse_messages(text):
+        # Android: los avisos del sistema no tienen remitente
+        if sender is None or SYSTEM_PATTERN.search(sender):
+            dropped += 1
+            continue
+        clean = EDITED_SUFFIX.sub('', DIRECTION_MARKS.sub('', body).strip())
+        attachment = ATTACHMENT_PATTERN.match(clean)
+        # iOS: avisos del sistema y multimedia omitida empiezan con una marca LRM
+        if (body.startswith('\u200e') and not attachment) or not clean or NOISE_PATTERN.match(clean):
+            dropped += 1
+            continue
+        messages.append((date, time, sender, clean, attachment))
+
+    aliases = sender_aliases([sender for _, _, sender, _, _ in messages])
+
+    lines: List[str] = []
+    current_date = None
+    # Racha de adjuntos pendiente: (alias, [(hora, tipo), ...])
+    pending: Optional[Tuple[str, List[Tuple[str, str]]]] = None
+
+    def flush_attachments(collapse: bool = True):
+        nonlocal pending
+        if pending:
+            alias, attachments = pending
+            if collapse:
+                kinds = Counter(kind for _, kind in attachments)
+                summary = ', '.join(_plural(count, kind) for kind, count in kinds.items())
+                lines.append(f"{attachments[0][0]} {alias}: [{summary}]")
+            else:
+                lines.extend(f"{time} {alias}: [{kind}]" for time, kind in attachments)
+        pending = None
+
+    for date, time, sender, body, attachment in messages:
+        if date != current_date:
+            flush_attachments()
+            lines.append(COMPACT_DAY_HEADER.format(date))
+            current_date = date
+
+        alias = aliases[sender]
+        if attachment:
+            kind = _attachment_kind(attachment.group('ios') or attachment.group('android'))
+            if pending and pending[0] == alias:
+                pending[1].append((time, kind))
+            else:
+                flush_attachments()
+                pending = (alias, [(time, kind)])
+            continue
+
+        flush_attachments()
+        lines.append(f"{time} {alias}: {body}")
+    flush_attachments(collapse=False)
+
+    compact_text = '\n'.join(lines)
+    return CompactedChat(
+        compact_text,
+        original_tokens=estimate_tokens(chat_text),
+        compact_tokens=estimate_tokens(compact_text),
+        dropped_lines=dropped,
+        aliases=aliases,
+    )
+
+
+def sender_aliases(senders: List[str]) -> Dict[str, str]:
+    """
+    Alias corto por remitente, asignado en orden de aparición: el nombre de pila; si ya
+    lo usa un remitente anterior, nombre e inicial del apellido; si también está usado,
+    el nombre completo. Un alias emitido no se cambia aunque aparezcan remitentes
+    posteriores con el mismo nombre. Los teléfonos se escriben sin espacios.
+    """
+    aliases: Dict[str, str] = {}
+    used = set()
+    for sender in dict.fromkeys(senders):
+        if _is_phone(sender):
+            alias = re.sub(r'[\s\-()]', '', sender)
+        else:
+            candidates = (_first_name(sender), _short_name(sender), sender)
+            alias = next((name for name in candidates if name not in used), None)
+            # El nombre completo solo choca con un alias de otro remitente: se numera
+            suffix = 2
+            while alias is None or alias in used:
+                alias = f"{sender} ({suffix})"
+                suffix += 1
+        used.add(alias)
+        aliases[sender] = alias
+    return aliases
+
+
+def _parse_messages(text: str) -> List[Tuple[str, str, Optional[str], str]]:
+    """Lista de (fecha, hh:mm, remitente o None si es aviso del sistema, texto)"""
+    messages = []
+    for token in iter_chat_tokens(text):
+        hour, minute = token.time.split(':')[:2]
+        hour = int(hour)
+        ampm = token.ampm[:1].lower() if token.ampm else ''
+        if ampm == 'p' and hour < 12:
+            hour += 12
+        elif ampm == 'a' and hour == 12:
+            hour = 0
+        body = token.body(text)
+        # iOS antepone una marca LRM a algunos avisos del sistema; se conserva en el texto
+        if token.marked:
+            body = '\u200e' + body
+        messages.append((token.date, f"{hour:02d}:{minute}", token.sender, body))
+    return messages
+
+
+def _first_name(sender: str) -> str:
+    return sender.split()[0] if sender.split() else sender
+
+
+def _short_name(sender: str) -> str:
+    parts = sender.split()
+    return f"{parts[0]} {parts[1][0]}." if len(parts) > 1 else sender
+
+
+def _is_phone(sender: str) -> bool:
+    return re.fullmatch(r'\+?[\d\s\-()]{7,}', sender) is not None
+
+
+def _attachment_kind(filename: str) -> str:
+    for pattern, kind in ATTACHMENT_KINDS:
+        if pattern.search(filename):
+            return kind
+    return 'archivo'
+
+
+def _plural(count: int, kind: str) -> str:
+    if count == 1:
+        return kind
+    return f"{count} {kind}s"
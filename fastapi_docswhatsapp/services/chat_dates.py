@@ -0,0 +1,122 @@
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+# Cabeceras que se revisan para inferir el formato de fecha y hora del chat
+DATE_SAMPLE_HEADERS = 1000
+
+_DATE_PARTS = re.compile(r'(\d{1,2})[/.](\d{1,2})[/.](\d{2,4})$')
+
+
+class ChatDateFormat:
+    """
+    Formato de fecha y hora de un chat, inferido una vez por exportación.
+    day_first: dd/mm (True) o mm/dd (False); twelve_hour: la hora lleva sufijo AM/PM
+    ("AM", "p. m.", ...).
+    """
+
+    __slots__ = ('day_first', 'twelve_hour')
+
+    def __init__(self, day_first: bool = True, twelve_hour: bool = False):
+        self.day_first = day_first
+        self.twelve_hour = twelve_hour
+
+    def __repr__(self) -> str:
+        return (f"ChatDateFormat({'dd/mm' if self.day_first else 'mm/dd'}, "
+                f"{'12 h' if self.twelve_hour else '24 h'})")
+
+
+def _split_date(date_str: str) -> Tuple[int, int, int]:
+    match = _DATE_PARTS.match(date_str)
+    if not match:
+        raise ValueError(f"Fecha no reconocida: {date_str!r}")
+    first, second, year = (int(part) for part in match.groups())
+    # Igual que %y de strptime: 69-99 son del siglo XX
+    if year < 100:
+        year += 1900 if year >= 69 else 2000
+    return first, second, year
+
+
+def _ordinal(first: int, second: int, year: int, day_first: bool) -> Optional[int]:
+    day, month = (first, second) if day_first else (second, first)
+    try:
+        return datetime(year, month, day).toordinal()
+    except ValueError:
+        return None
+
+
+def detect_date_format(headers: Iterable[Tuple[str, Optional[str]]]) -> ChatDateFormat:
+    """
+    Infiere el formato a partir de una muestra de cabeceras (fecha, sufijo AM/PM).
+    Una fecha con un componente mayor a 12 decide el orden día/mes. Si todas son
+    ambiguas gana el orden en que las fechas no retroceden; si ambos sirven, el idioma
+    del sufijo: AM/PM en inglés sugiere mm/dd, "a. m."/"p. m." o 24 h sugieren dd/mm.
+    """
+    dates = []
+    seen = set()
+    twelve_hour = False
+    english_suffix = False
+    for date_str, ampm in headers:
+        if ampm:
+            twelve_hour = True
+            english_suffix = english_suffix or '.' not in ampm
+        if date_str not in seen:
+            seen.add(date_str)
+            try:
+                dates.append(_split_date(date_str))
+            except ValueError:
+                continue
+
+    if any(first > 12 for first, _, _ in dates):
+        return ChatDateFormat(day_first=True, twelve_hour=twelve_hour)
+    if any(second > 12 for _, second, _ in dates):
+        return ChatDateFormat(day_first=False, twelve_hour=twelve_hour)
+
+    backwards = {}
+    for day_first in (True, False):
+        ordinals = [_ordinal(*parts, day_first) for parts in dates]
+        ordinals = [value for value in ordinals if value is not None]
+        backwards[day_first] = sum(1 for a, b in zip(ordinals, ordinals[1:]) if b < a)
+    if backwards[True] != backwards[False]:
+        return ChatDateFormat(day_first=backwards[True] < backwards[False], twelve_hour=twelve_hour)
+    return ChatDateFormat(day_first=not english_suffix, twelve_hour=twelve_hour)
+
+
+class ChatDateParser:
+    """
+    Convierte fecha y hora de las cabeceras del chat en datetime con un formato fijo.
+    Las fechas y horas ya vistas se resuelven con tablas de memoización (un chat
+    repite la misma fecha en todos los mensajes del día). Los valores inválidos
+    lanzan ValueError en vez de reemplazarse por la fecha actual.
+    """
+
+    def __init__(self, date_format: ChatDateFormat):
+        self.date_format = date_format
+        self._dates: Dict[str, datetime] = {}
+        self._times: Dict[Tuple[str, Optional[str]], timedelta] = {}
+
+    def parse(self, date_str: str, time_str: str, ampm: Optional[str] = None) -> datetime:
+        date = self._dates.get(date_str)
+        if date is None:
+            date = self._dates[date_str] = self._parse_date(date_str)
+        time = self._times.get((time_str, ampm))
+        if time is None:
+            time = self._times[(time_str, ampm)] = self._parse_time(time_str, ampm)
+        return date + time
+
+    def _parse_date(self, date_str: str) -> datetime:
+        first, second, year = _split_date(date_str)
+        day, month = (first, second) if self.date_format.day_first else (second, first)
+        return datetime(year, month, day)
+
+    def _parse_time(self, time_str: str, ampm: Optional[str]) -> timedelta:
+        parts = [int(part) for part in time_str.split(':')]
+        hour, minute = parts[0], parts[1]
+        second = parts[2] if len(parts) > 2 else 0
+        if ampm:
+            if not 1 <= hour <= 12:
+                raise ValueError(f"Hora de 12 h inválida: {time_str} {ampm}")
+            hour = hour % 12 + (12 if ampm[0] in 'pP' else 0)
+        if hour > 23 or minute > 59 or second > 59:
+            raise ValueError(f"Hora inválida: {time_str}")
+        return timedelta(hours=hour, minutes=minute, seconds=second)
@@ -0,0 +1,150 @@
+import re
+from typing import Iterator, List, Optional
+
+# Hora con segundos opcionales y sufijo AM/PM en inglés o español ("p. m.", con espacio fino opcional)
+_TIME = r'(?P<time>\d{1,2}:\d{2}(?::\d{2})?)(?:[ \u00a0\u202f]?(?P<ampm>[aApP]\.?[ \u00a0\u202f]?[mM]\.?))?'
+
+# Remitente: hasta el primer ": " de la línea; los avisos del sistema de Android no lo tienen
+_SENDER = r'(?:(?P<sender>[^:\n]+): )?'
+
+# Referencia a un adjunto al inicio del texto del mensaje (iOS en inglés/español y Android)
+_ATTACHMENT = (
+    r'[\u200e\u200f]?(?:<(?i:attached|adjunto): (?P<ios_ref>[^>\n]+)>'
+    r'|(?P<android_ref>[^\s<>/\\:]+\.\w{2,5}) \((?i:archivo adjunto|file attached)\))'
+)
+
+# El adjunto se reconoce con una búsqueda hacia adelante en la misma expresión de la
+# cabecera, de modo que el final del match sigue siendo el inicio del texto del mensaje
+_ATTACHMENT_LOOKAHEAD = r'(?=' + _ATTACHMENT + r')?'
+
+# Cabecera de mensaje de iOS: "[d/m/aa, h:mm:ss p. m.] Nombre: " (a veces precedida por LRM)
+_IOS_HEADER = (
+    r'(?P<mark>[\u200e\u200f])?\[(?P<date>\d{1,2}[/.]\d{1,2}[/.]\d{2,4}),? ' + _TIME + r'\] '
+    + _SENDER + _ATTACHMENT_LOOKAHEAD
+)
+
+# Cabecera de mensaje de Android: "d/m/aa, hh:mm - Nombre: "
+_ANDROID_HEADER = (
+    r'(?P<mark>[\u200e\u200f])?(?P<date>\d{1,2}[/.]\d{1,2}[/.]\d{2,4}),? ' + _TIME + r' [-–] '
+    + _SENDER + _ATTACHMENT_LOOKAHEAD
+)
+
+# Cabecera al inicio de una línea cualquiera
+IOS_HEADER = re.compile(r'^' + _IOS_HEADER, re.MULTILINE)
+ANDROID_HEADER = re.compile(r'^' + _ANDROID_HEADER, re.MULTILINE)
+
+CHAT_FORMATS = {'ios': IOS_HEADER, 'android': ANDROID_HEADER}
+
+# Para recorrer el texto se busca "\n" + cabecera: con un literal al inicio el motor de
+# regex salta de salto de línea en salto de línea en vez de intentar en cada carácter
+_SCAN_PATTERNS = {
+    'ios': re.compile(r'\n' + _IOS_HEADER),
+    'android': re.compile(r'\n' + _ANDROID_HEADER),
+}
+
+# Primera cabecera del texto: algunas exportaciones empiezan con una marca BOM (U+FEFF)
+_FIRST_PATTERNS = {
+    'ios': re.compile(r'\ufeff?' + _IOS_HEADER),
+    'android': re.compile(r'\ufeff?' + _ANDROID_HEADER),
+}
+
+ATTACHMENT_REF = re.compile(_ATTACHMENT)
+
+# Líneas que se revisan para detectar el formato
+DETECTION_SAMPLE_LINES = 50
+
+
+class ChatToken:
+    """
+    Un mensaje del chat como posiciones dentro del texto original (sin copiar el cuerpo).
+    text[start:end] es el mensaje completo y text[body_start:end] su contenido,
+    incluidas las líneas de continuación. sender es None en los avisos del sistema
+    de Android; marked indica que la línea empezaba con una marca LRM/RLM.
+    """
+
+    __slots__ = ('start', 'body_start', 'end', 'date', 'time', 'ampm', 'sender', 'marked', 'attachment')
+
+    def __init__(self, start: int, body_start: int, end: int, date: str, time: str,
+                 ampm: Optional[str], sender: Optional[str], marked: bool, attachment: Optional[str]):
+        self.start = start
+        self.body_start = body_start
+        self.end = end
+        self.date = date
+        self.time = time
+        self.ampm = ampm
+        self.sender = sender
+        self.marked = marked
+        self.attachment = attachment
+
+    def body(self, text: str) -> str:
+        return text[self.body_start:self.end]
+
+    def __repr__(self) -> str:
+        return (f"ChatToken({self.start}:{self.end}, {self.date} {self.time}{' ' + self.ampm if self.ampm else ''}, "
+                f"sender={self.sender!r}, attachment={self.attachment!r})")
+
+
+def detect_chat_format(text: str, sample_lines: int = DETECTION_SAMPLE_LINES) -> Optional[str]:
+    """
+    Detecta el formato de exportación ('ios' o 'android') con las primeras líneas del chat.
+    Si ninguna línea de la muestra es una cabecera (p. ej. un primer mensaje muy largo)
+    gana el formato cuya primera cabecera aparece antes. Retorna None si no hay ninguna.
+    """
+    end = 0
+    for _ in range(sample_lines):
+        end = text.find('\n', end + 1)
+        if end < 0:
+            end = len(text)
+            break
+    sample = text[:end]
+    counts = {name: sum(1 for _ in pattern.finditer(sample)) for name, pattern in CHAT_FORMATS.items()}
+    best = max(counts, key=counts.get)
+    if counts[best]:
+        return best
+
+    first = {}
+    for name, pattern in CHAT_FORMATS.items():
+        match = _FIRST_PATTERNS[name].match(text) or pattern.search(text)
+        if match:
+            first[name] = match.start()
+    return min(first, key=first.get) if first else None
+
+
+def iter_chat_tokens(text: str, chat_format: Optional[str] = None) -> Iterator[ChatToken]:
+    """
+    Recorre el chat en una sola pasada y produce un ChatToken por mensaje.
+    El texto previo a la primera cabecera se ignora, salvo una marca BOM inicial, que
+    queda dentro del primer mensaje. chat_format se detecta si no se indica.
+    """
+    chat_format = chat_format or detect_chat_format(text)
+    if chat_format is None:
+        return
+
+    # Cada cabecera cierra el mensaje anterior. El match de la búsqueda incluye el "\n"
+    # previo; el cuerpo del mensaje anterior termina justo antes de él.
+    previous = _FIRST_PATTERNS[chat_format].match(text)
+    start = 0
+    for match in _SCAN_PATTERNS[chat_format].finditer(text):
+        if previous is not None:
+            yield _make_token(previous, start, match.start())
+        previous = match
+        start = match.start() + 1
+    if previous is not None:
+        end = len(text)
+        while end > previous.end() and text[end - 1] in '\r\n':
+            end -= 1
+        yield _make_token(previous, start, end)
+
+
+def tokenize_chat(text: str, chat_format: Optional[str] = None) -> List[ChatToken]:
+    """Lista de mensajes del chat (ver iter_chat_tokens)"""
+    return list(iter_chat_tokens(text, chat_format))
+
+
+def _make_token(match: re.Match, start: int, end: int) -> ChatToken:
+    body_start = match.end()
+    if end > body_start and match.string[end - 1] == '\r':
+        end -= 1
+    mark, date, time, ampm, sender, ios_ref, android_ref = match.groups()
+    return ChatToken(start, body_start, max(end, body_start), date, time, ampm,
+                     sender, mark is not None, ios_ref or android_ref)
@@ -1,19 +1,85 @@
-import google.generativeai as genai
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 import json
-import re
 from datetime import datetime
 import asyncio
 
-from fastapi_docswhatsapp.models import ProjectAnalysis
+from fastapi_docswhatsapp.models import InformeBitacora, ProjectAnalysis
+from fastapi_docswhatsapp.services.analyzer_backends import AnalyzerBackend
+from fastapi_docswhatsapp.services.gemini_cache import GeminiResponseCache
+from fastapi_docswhatsapp.services.gemini_client import GeminiClient
+from fastapi_docswhatsapp.services.gemini_scheduler import GeminiScheduler
+from fastapi_docswhatsapp.services.incremental_analysis import (
+    ChatFingerprint,
+    ChatSnapshotStore,
+    merge_informe_data,
+)
+from fastapi_docswhatsapp.services.pipeline_metrics import record_gemini_usage, stage_span
+from fastapi_docswhatsapp.services.prompt_budget import PromptBudget
+from fastapi_docswhatsapp.services.report_json import gemini_response_schema, parse_report_json
+from fastapi_docswhatsapp.services.report_stream import ReportSectionParser
+
+# Firma del callback de secciones del informe: (nombre_sección, valor)
+SectionCallback = Callable[[str, Any], None]
+
+# Versión de la plantilla del prompt de generate_project_report.
+# Incrementar al modificar el prompt para invalidar el cache de respuestas.
+REPORT_PROMPT_VERSION = "2"
+
+# Configuración de generación del informe de bitácora
+REPORT_GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "max_output_tokens": 40000,
+    "response_mime_type": "application/json",
+}
+
+# Esquema de la respuesta, derivado del modelo del informe: Gemini solo puede devolver JSON válido
+REPORT_RESPONSE_SCHEMA = gemini_response_schema(InformeBitacora)
+
+# Secciones del informe, en el orden del modelo
+REPORT_SECTIONS = list(InformeBitacora.model_fields)
+
+# Estructura JSON que se pide a Gemini para el informe de bitácora
+REPORT_JSON_FORMAT = """{
+            "titulo_proyecto": "Nombre del proyecto basado en el contexto del chat",
+            "resumen_ejecutivo": "Resumen detallado del proyecto de 2-3 párrafos basado en la conversación",
+            "objetivos": ["Objetivo principal 1", "Objetivo principal 2", "Objetivo principal 3"],
+            "actividades_realizadas": [
+                {
+                    "fecha": "DD/MM/YYYY",
+                    "descripcion": "Descripción detallada de la actividad realizada",
+                    "responsable": "Nombre de la persona responsable"
+                }
+            ],
+            "resultados_logros": ["Logro específico 1", "Logro específico 2", "Logro específico 3"],
+            "desafios_obstaculos": ["Desafío 1", "Desafío 2"],
+            "lecciones_aprendidas": ["Lección importante 1", "Lección importante 2"],
+            "conclusiones": "Conclusiones detalladas del proyecto basadas en la conversación",
+            "recomendaciones": ["Recomendación práctica 1", "Recomendación práctica 2"]
+        }"""
 
 class GeminiAnalyzer:
     """Clase para analizar chats de WhatsApp con Google Gemini y extraer información de proyectos"""
     
-    def __init__(self, api_key: str, model_name: str = "gemini-1.5-flash"):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
-        self.model_name = model_name
+    def __init__(self, api_key: str, model_name: str = "gemini-1.5-flash",
+                 cache: Optional[GeminiResponseCache] = None,
+                 snapshots: Optional[ChatSnapshotStore] = None,
+                 budget: Optional[PromptBudget] = None, chunk_concurrency: int = 4,
+                 count_tokens: bool = False, client: Optional[AnalyzerBackend] = None,
+                 scheduler: Optional[GeminiScheduler] = None, streaming: bool = True):
+        # Con un cliente compartido no se reconfigura genai (eso cerraría sus conexiones).
+        # client puede ser cualquier AnalyzerBackend, p. ej. el simulado para pruebas de carga.
+        self.client = client or GeminiClient(api_key, model_name)
+        self.model_name = self.client.model_name
+        self.cache = cache
+        self.snapshots = snapshots
+        # Los chats que no caben en el presupuesto se analizan por fragmentos (map-reduce)
+        self.budget = budget or PromptBudget(max_tokens=30000, max_messages=2000)
+        if count_tokens and self.budget.token_counter is None:
+            self.budget.token_counter = self._count_tokens
+        self.chunk_concurrency = chunk_concurrency
+        self.scheduler = scheduler or GeminiScheduler()
+        # Con streaming las secciones del informe se emiten a medida que se generan
+        self.streaming = streaming
         
     async def analyze_project_progress(self, chat_data: Dict[str, Any]) -> ProjectAnalysis:
         """
@@ -83,13 +149,12 @@ class GeminiAnalyzer:
             full_prompt = f"{system_instruction}\n\n{user_prompt}"
             
             # Generar respuesta con Gemini de forma asíncrona
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await self._generate(
                 full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=4000,
-                )
+                {
+                    "temperature": 0.7,
+                    "max_output_tokens": 4000,
+                }
             )
             
             # Parsear respuesta JSON
@@ -210,13 +275,12 @@ class GeminiAnalyzer:
         """
         
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await self._generate(
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.5,
-                    max_output_tokens=1000,
-                )
+                {
+                    "temperature": 0.5,
+                    "max_output_tokens": 1000,
+                }
             )
             
             return response.text.strip()
@@ -224,101 +288,74 @@ class GeminiAnalyzer:
         except Exception as e:
             return f"Resumen del chat con {len(messages)} mensajes. Error en generación automática: {str(e)}"
     
-    async def generate_project_report(self, chat_text: str) -> Dict[str, Any]:
+    async def generate_project_report(self, chat_text: str,
+                                      on_section: Optional[SectionCallback] = None) -> Dict[str, Any]:
         """
-        Genera un informe de bitácora estructurado a partir del texto del chat de WhatsApp
-        """
-        system_instruction = """
-        Eres un analista de proyectos experto que convierte conversaciones de WhatsApp 
-        en informes de bitácora profesionales tipo informe final de proyecto.
-        
-        Tu tarea es analizar el chat y crear un informe estructurado que incluya:
-        1. Título del proyecto (inferido del contexto)
-        2. Resumen ejecutivo
-        3. Objetivos identificados
-        4. Actividades realizadas (cronológico)
-        5. Resultados y logros
-        6. Desafíos y obstáculos
-        7. Lecciones aprendidas
-        8. Conclusiones y recomendaciones
-        
-        Responde SIEMPRE en formato JSON válido.
+        Genera un informe de bitácora estructurado a partir del texto del chat de WhatsApp.
+        Si hay cache configurado, las respuestas válidas se reutilizan para el mismo chat.
+        Un informe al que le faltan secciones se devuelve, pero no se guarda en el cache
+        ni como snapshot. Si hay un almacén de snapshots y el chat extiende uno ya analizado, solo se
+        envían a Gemini los mensajes nuevos junto con el informe previo.
+        on_section(nombre, valor) se invoca una vez por sección del informe; con streaming
+        activo, en cuanto Gemini termina de generarla.
         """
+        emit = _SectionEmitter(on_section)
+        cache_key = None
+        if self.cache is not None:
+            # Normalizar y hashear el chat completo es trabajo de CPU: va en el mismo hilo que la lectura
+            cache_key, cached = await asyncio.to_thread(self._cache_lookup, chat_text)
+            if cached is not None:
+                print("Informe obtenido del cache de Gemini")
+                emit.all(cached)
+                return cached
         
-        user_prompt = f"""
-        Analiza el siguiente chat de WhatsApp y transforma la información en un informe 
-        de bitácora de proyecto profesional. 
-        
-        IMPORTANTE: Responde ÚNICAMENTE con un JSON válido, sin texto adicional, sin markdown, sin explicaciones.
-
-        CHAT:
-        {chat_text[:100000]}
-        
-        Devuelve EXACTAMENTE este formato JSON (sin ```json ni otros marcadores):
-        {{
-            "titulo_proyecto": "Nombre del proyecto basado en el contexto del chat",
-            "resumen_ejecutivo": "Resumen detallado del proyecto de 2-3 párrafos basado en la conversación",
-            "objetivos": ["Objetivo principal 1", "Objetivo principal 2", "Objetivo principal 3"],
-            "actividades_realizadas": [
-                {{
-                    "fecha": "DD/MM/YYYY",
-                    "descripcion": "Descripción detallada de la actividad realizada",
-                    "responsable": "Nombre de la persona responsable"
-                }}
-            ],
-            "resultados_logros": ["Logro específico 1", "Logro específico 2", "Logro específico 3"],
-            "desafios_obstaculos": ["Desafío 1", "Desafío 2"],
-            "lecciones_aprendidas": ["Lección importante 1", "Lección importante 2"],
-            "conclusiones": "Conclusiones detalladas del proyecto basadas en la conversación",
-            "recomendaciones": ["Recomendación práctica 1", "Recomendación práctica 2"]
-        }}
-        
-        Asegúrate de que cada sección tenga contenido relevante extraído del chat."""
-        
+        fingerprint = None
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                user_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.3,
-                    max_output_tokens=40000,
-                )
-            )
+            result = None
+            if self.snapshots is not None:
+                fingerprint = await asyncio.to_thread(ChatFingerprint, chat_text)
+                result = await self._generate_incremental_report(fingerprint)
             
-            # Intentar parsear como JSON
-            try:
-                # Limpiar respuesta de markdown code blocks si los tiene
-                response_text = response.text.strip()
-                
-                # Buscar JSON entre ```json y ``` o ```
-                json_pattern = r'```(?:json)?\s*([\s\S]*?)```'
-                json_match = re.search(json_pattern, response_text)
-                
-                if json_match:
-                    json_text = json_match.group(1).strip()
+            if result is None:
+                # El chat se mide una sola vez, fuera del event loop
+                overhead = self._report_overhead()
+                chat_tokens, fits = await asyncio.to_thread(self._measure_chat, chat_text, overhead)
+                if not fits:
+                    result = await self._generate_chunked_report(chat_text, chat_tokens)
                 else:
-                    json_text = response_text
-                
-                # Parsear JSON
-                informe_data = json.loads(json_text)
-                return informe_data
-                
-            except (json.JSONDecodeError, AttributeError) as e:
-                print(f"Error parsing JSON: {e}")
-                print(f"Raw response: {response.text[:500]}...")
-                
-                # Si falla el JSON, crear estructura básica
-                return {
-                    "titulo_proyecto": "Informe de Proyecto WhatsApp",
-                    "resumen_ejecutivo": "No se pudo procesar automáticamente el análisis del chat. Revise el contenido original.",
-                    "objetivos": ["Analizar contenido del chat de WhatsApp"],
-                    "actividades_realizadas": [],
-                    "resultados_logros": [],
-                    "desafios_obstaculos": [],
-                    "lecciones_aprendidas": [],
-                    "conclusiones": "Análisis requiere revisión manual",
-                    "recomendaciones": ["Revisar el chat original para obtener más detalles"]
-                }
+                    result = await self._request_report(
+                        self._build_report_prompt(chat_text), on_section=emit if on_section else None,
+                        tokens=overhead + chat_tokens
+                    )
+            informe_data, missing = result
+            
+            if missing:
+                # Un informe dañado no se reutiliza ni sirve de base para actualizaciones
+                print(f"⚠️ Informe incompleto (faltan: {', '.join(missing)}); no se guarda en cache ni como snapshot")
+            else:
+                if cache_key is not None:
+                    await asyncio.to_thread(self.cache.set, cache_key, informe_data)
+                if fingerprint is not None:
+                    await asyncio.to_thread(self.snapshots.save, fingerprint, self._analysis_version(), informe_data)
+            # Las secciones no emitidas durante el streaming (u otras rutas) se emiten ahora
+            emit.all(informe_data)
+            return informe_data
+        
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"Error parsing JSON: {e}")
+            
+            # Si falla el JSON, crear estructura básica
+            return {
+                "titulo_proyecto": "Informe de Proyecto WhatsApp",
+                "resumen_ejecutivo": "No se pudo procesar automáticamente el análisis del chat. Revise el contenido original.",
+                "objetivos": ["Analizar contenido del chat de WhatsApp"],
+                "actividades_realizadas": [],
+                "resultados_logros": [],
+                "desafios_obstaculos": [],
+                "lecciones_aprendidas": [],
+                "conclusiones": "Análisis requiere revisión manual",
+                "recomendaciones": ["Revisar el chat original para obtener más detalles"]
+            }
             
         except Exception as e:
             # Fallback en caso de error
@@ -332,4 +369,353 @@ class GeminiAnalyzer:
                 "lecciones_aprendidas": [],
                 "conclusiones": "No se pudo completar el análisis",
                 "recomendaciones": []
-            }
\ No newline at end of file
+            }
+    
+    def _cache_lookup(self, chat_text: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Clave del cache para el chat y el informe guardado con ella (o None)"""
+        cache_key = self.cache.make_key(
+            chat_text, self.model_name, REPORT_GENERATION_CONFIG, REPORT_PROMPT_VERSION
+        )
+        return cache_key, self.cache.get(cache_key)
+    
+    def _analysis_version(self) -> str:
+        """Identifica modelo y prompt con los que se generó un informe"""
+        return f"{self.model_name}|{REPORT_PROMPT_VERSION}"
+    
+    async def _generate_incremental_report(
+            self, fingerprint: ChatFingerprint) -> Optional[Tuple[Dict[str, Any], List[str]]]:
+        """
+        Si el chat extiende uno ya analizado, actualiza el informe previo enviando solo
+        los mensajes nuevos. Retorna (informe, secciones_faltantes de la actualización)
+        o None si no hay un análisis previo aplicable.
+        """
+        base = await asyncio.to_thread(self.snapshots.find_base, fingerprint, self._analysis_version())
+        if base is None:
+            return None
+        
+        analyzed_count, previous_informe = base
+        if analyzed_count == fingerprint.message_count:
+            print("Chat sin mensajes nuevos respecto al análisis previo")
+            return previous_informe, []
+        
+        new_messages = fingerprint.messages_after(analyzed_count)
+        overhead = self.budget.measure(self._build_update_prompt(previous_informe, ""))
+        new_tokens, fits = await asyncio.to_thread(self._measure_chat, new_messages, overhead)
+        if not fits:
+            # Demasiado texto nuevo para una sola llamada: se reanaliza por fragmentos
+            return None
+        print(f"Análisis incremental: {fingerprint.message_count - analyzed_count} mensajes nuevos "
+              f"({len(new_messages)} caracteres) sobre {analyzed_count} ya analizados")
+        update, missing = await self._request_report(
+            self._build_update_prompt(previous_informe, new_messages), tokens=overhead + new_tokens
+        )
+        return merge_informe_data(previous_informe, update), missing
+    
+    async def _generate_chunked_report(self, chat_text: str,
+                                       chat_tokens: Optional[int] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Map-reduce para chats que no caben en el presupuesto de tokens: divide el chat
+        por límites de mensaje y de día, analiza los fragmentos en paralelo (acotado por
+        un semáforo) y combina los informes parciales con una llamada final.
+        chat_tokens es la medición del chat ya hecha, para no repetirla al dividirlo.
+        Retorna (informe, secciones_faltantes en algún parcial o en la combinación).
+        """
+        overhead = self._report_overhead(part=True)
+        chunks = await asyncio.to_thread(self.budget.split, chat_text, overhead, chat_tokens)
+        print(f"Chat de {len(chat_text)} caracteres: análisis en {len(chunks)} fragmentos "
+              f"({self.chunk_concurrency} en paralelo)")
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        
+        async def analyze_chunk(index: int, chunk: str) -> Tuple[Dict[str, Any], List[str]]:
+            async with semaphore:
+                chunk_tokens = await asyncio.to_thread(self.budget.measure, chunk)
+                return await self._request_report(
+                    self._build_report_prompt(chunk, part=(index + 1, len(chunks))),
+                    tokens=overhead + chunk_tokens
+                )
+        
+        results = await asyncio.gather(
+            *(analyze_chunk(i, chunk) for i, chunk in enumerate(chunks)), return_exceptions=True
+        )
+        partials = [r[0] for r in results if not isinstance(r, Exception)]
+        missing = _union(r[1] for r in results if not isinstance(r, Exception))
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            print(f"⚠️ {len(failed)} de {len(chunks)} fragmentos fallaron: {failed[0]}")
+        if not partials:
+            raise failed[0]
+        if len(partials) == 1:
+            return partials[0], missing
+        
+        informe_data, reduce_missing = await self._reduce_partial_reports(partials)
+        return informe_data, _union([missing, reduce_missing])
+    
+    async def _reduce_partial_reports(
+            self, partials: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Combina informes parciales en uno; si la llamada falla, los combina localmente.
+        Si el prompt de combinación excede el presupuesto, los parciales se combinan
+        por grupos que sí caben y luego se combinan los resultados (reducción jerárquica).
+        Retorna (informe, secciones_faltantes).
+        """
+        prompt = self._build_reduce_prompt(partials)
+        tokens = await asyncio.to_thread(self.budget.measure, prompt)
+        groups = []
+        if tokens > self.budget.max_tokens and len(partials) > 2:
+            groups = await asyncio.to_thread(self._group_partials, partials)
+        if len(groups) > 1:
+            print(f"Combinación de {len(partials)} informes parciales ({tokens} tokens) en "
+                  f"{len(groups)} grupos")
+            reduced = await asyncio.gather(*(self._reduce_partial_reports(group) for group in groups))
+            informe_data, missing = await self._reduce_partial_reports([data for data, _ in reduced])
+            return informe_data, _union([*(group_missing for _, group_missing in reduced), missing])
+        
+        try:
+            return await self._request_report(prompt, tokens=tokens)
+        except Exception as e:
+            print(f"⚠️ Error combinando informes parciales con Gemini, se combinan localmente: {e}")
+            merged = partials[0]
+            for partial in partials[1:]:
+                merged = merge_informe_data(merged, partial)
+            return merged, [name for name in REPORT_SECTIONS if name not in merged]
+    
+    def _group_partials(self, partials: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Agrupa informes parciales consecutivos para que cada prompt de combinación quepa
+        en el presupuesto. Cada grupo tiene al menos dos parciales, así cada nivel de la
+        reducción tiene menos informes que el anterior.
+        """
+        budget = self.budget.chat_budget(self.budget.measure(self._build_reduce_prompt([])))
+        groups: List[List[Dict[str, Any]]] = []
+        size = 0
+        for partial in partials:
+            # Encabezado "INFORME PARCIAL i de n" incluido
+            partial_size = self.budget.measure(json.dumps(partial, ensure_ascii=False)) + 10
+            if groups and (len(groups[-1]) < 2 or size + partial_size <= budget):
+                groups[-1].append(partial)
+                size += partial_size
+            else:
+                groups.append([partial])
+                size = partial_size
+        if len(groups) > 1 and len(groups[-1]) < 2:
+            groups[-2].extend(groups.pop())
+        return groups
+    
+    def _measure_chat(self, chat_text: str, overhead_tokens: int) -> Tuple[int, bool]:
+        """Tokens del chat y si cabe en un solo prompt; se ejecuta en un hilo"""
+        chat_tokens = self.budget.measure(chat_text)
+        return chat_tokens, self.budget.fits(chat_text, overhead_tokens, chat_tokens)
+    
+    def _report_overhead(self, part: bool = False) -> int:
+        """Tokens de la plantilla del prompt del informe, sin el chat"""
+        return self.budget.measure(self._build_report_prompt("", part=(1, 1) if part else None))
+    
+    async def _count_tokens(self, prompt: str) -> int:
+        """Conteo real de tokens con el modelo (llamada a la API, por el planificador)"""
+        return await self.scheduler.run(self.client.count_tokens, prompt)
+    
+    async def _request_report(self, prompt: str, on_section: Optional[SectionCallback] = None,
+                              tokens: Optional[int] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Pide un informe a Gemini y lo parsea. Si la salida llegó truncada se repara y solo
+        se vuelven a pedir las secciones faltantes, sin repetir la llamada completa.
+        tokens es la medición del prompt si ya se conoce (se mide en un hilo si no).
+        Retorna (informe, secciones que siguen faltando tras el segundo pedido).
+        """
+        if on_section is not None and self.streaming:
+            response_text = await self._generate_report_streaming(prompt, on_section, tokens)
+        else:
+            response_text = (await self._generate_report_response(prompt, tokens)).text
+        
+        informe_data, missing = parse_report_json(response_text, REPORT_SECTIONS)
+        if missing:
+            print(f"⚠️ Respuesta de Gemini incompleta; se piden solo las secciones: {', '.join(missing)}")
+            sections = await self._request_sections(prompt, missing)
+            if informe_data is None and not sections:
+                print(f"Raw response: {response_text[:500]}...")
+                raise json.JSONDecodeError("La respuesta de Gemini no contiene JSON válido", response_text, 0)
+            informe_data = {**(informe_data or {}), **sections}
+            if on_section is not None:
+                for name, value in sections.items():
+                    on_section(name, value)
+            missing = [name for name in missing if name not in sections]
+        return informe_data, missing
+    
+    async def _request_sections(self, prompt: str, sections: List[str]) -> Dict[str, Any]:
+        """Pide solo algunas secciones del informe, con el esquema restringido a ellas"""
+        section_prompt = (
+            f"{prompt}\n\n        IMPORTANTE: Devuelve ÚNICAMENTE estas secciones del JSON: {', '.join(sections)}"
+        )
+        generation_config = {
+            **REPORT_GENERATION_CONFIG,
+            "response_schema": gemini_response_schema(InformeBitacora, only=sections),
+        }
+        try:
+            tokens = await self._log_budget_usage(section_prompt)
+            response = await self._generate(section_prompt, generation_config, tokens=tokens)
+            data, _ = parse_report_json(response.text, sections)
+        except Exception as e:
+            print(f"⚠️ No se pudieron completar las secciones faltantes: {e}")
+            return {}
+        return {name: value for name, value in (data or {}).items() if name in sections}
+    
+    async def _generate_report_response(self, prompt: str, tokens: Optional[int] = None):
+        """Llama a Gemini con la configuración del informe de bitácora"""
+        tokens = await self._log_budget_usage(prompt, tokens)
+        return await self._generate(prompt, self._report_generation_config(), tokens=tokens)
+    
+    async def _generate_report_streaming(self, prompt: str, on_section: SectionCallback,
+                                         tokens: Optional[int] = None) -> str:
+        """
+        Genera el informe con streaming: cada sección se parsea y se emite en el event
+        loop apenas se cierra su valor. Retorna el texto completo de la respuesta.
+        """
+        tokens = await self._log_budget_usage(prompt, tokens)
+        loop = asyncio.get_running_loop()
+        
+        usage = []
+        
+        def consume_stream() -> str:
+            # Se ejecuta en un hilo; si el planificador reintenta, se empieza de cero
+            parser = ReportSectionParser()
+            parts = []
+            usage.clear()
+            response = self.client.generate(prompt, self._report_generation_config(), stream=True)
+            for chunk in response:
+                # El último fragmento trae el uso de tokens de toda la respuesta
+                if getattr(chunk, "usage_metadata", None):
+                    usage[:] = [chunk.usage_metadata]
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Fragmento sin partes de texto (p. ej. solo el motivo de término)
+                    continue
+                parts.append(text)
+                for name, value in parser.feed(text):
+                    loop.call_soon_threadsafe(on_section, name, value)
+            return "".join(parts)
+        
+        with stage_span("gemini"):
+            text = await self.scheduler.run(consume_stream, tokens=tokens)
+        record_gemini_usage(usage[0] if usage else None, mode="streaming")
+        return text
+    
+    async def _log_budget_usage(self, prompt: str, tokens: Optional[int] = None) -> int:
+        """Reporta el uso del presupuesto y retorna los tokens del prompt para el planificador"""
+        usage = await self.budget.usage(prompt, measured=tokens)
+        print(f"Prompt de {usage['tokens']} tokens ({usage['metodo']}) de un presupuesto de "
+              f"{usage['max_tokens']} ({usage['uso']:.0%})")
+        if usage['tokens'] > usage['max_tokens']:
+            print("⚠️ El prompt excede el presupuesto de tokens configurado")
+        return usage['tokens']
+    
+    async def _generate(self, prompt: str, generation_config: Dict[str, Any], tokens: Optional[int] = None):
+        """Toda llamada de generación pasa por el planificador (concurrencia, RPM/TPM, reintentos)"""
+        if tokens is None:
+            tokens = await asyncio.to_thread(self.budget.measure, prompt)
+        with stage_span("gemini"):
+            response = await self.scheduler.run(
+                self.client.generate, prompt, generation_config, tokens=tokens,
+            )
+        record_gemini_usage(getattr(response, "usage_metadata", None))
+        return response
+    
+    @staticmethod
+    def _report_generation_config() -> Dict[str, Any]:
+        """Configuración de generación del informe con salida JSON restringida por el esquema"""
+        return {**REPORT_GENERATION_CONFIG, "response_schema": REPORT_RESPONSE_SCHEMA}
+    
+    def _build_report_prompt(self, chat_text: str, part: Optional[Tuple[int, int]] = None) -> str:
+        """
+        Prompt para generar el informe a partir del chat.
+        part=(i, n) indica que chat_text es el fragmento i de n de un chat más largo.
+        """
+        part_note = ""
+        if part is not None:
+            part_note = (
+                f"\n        NOTA: Este es el fragmento {part[0]} de {part[1]} del chat, en orden cronológico. "
+                "Informa solo lo que aparece en este fragmento; luego se combinará con los demás.\n"
+            )
+        return f"""
+        Analiza el siguiente chat de WhatsApp y transforma la información en un informe 
+        de bitácora de proyecto profesional. 
+        {part_note}
+        IMPORTANTE: Responde ÚNICAMENTE con un JSON válido, sin texto adicional, sin markdown, sin explicaciones.
+
+        CHAT:
+        {chat_text}
+        
+        Devuelve EXACTAMENTE este formato JSON (sin ```json ni otros marcadores):
+        {REPORT_JSON_FORMAT}
+        
+        Asegúrate de que cada sección tenga contenido relevante extraído del chat."""
+    
+    def _build_reduce_prompt(self, partials: List[Dict[str, Any]]) -> str:
+        """Prompt para combinar informes parciales (uno por fragmento) en el informe final"""
+        partials_text = "\n\n".join(
+            f"INFORME PARCIAL {i} de {len(partials)}:\n{json.dumps(p, ensure_ascii=False)}"
+            for i, p in enumerate(partials, start=1)
+        )
+        return f"""
+        Los siguientes son informes de bitácora parciales de un mismo proyecto, generados a
+        partir de fragmentos consecutivos (en orden cronológico) de un chat de WhatsApp.
+        Combínalos en un único informe final coherente.
+        
+        IMPORTANTE: Responde ÚNICAMENTE con un JSON válido, sin texto adicional, sin markdown, sin explicaciones.
+        
+        {partials_text}
+        
+        Reglas:
+        - Un solo título y un resumen ejecutivo y conclusiones que cubran todo el período.
+        - Listas sin duplicados; "actividades_realizadas" en orden cronológico.
+        
+        Devuelve EXACTAMENTE este formato JSON:
+        {REPORT_JSON_FORMAT}"""
+    
+    def _build_update_prompt(self, previous_informe: Dict[str, Any], new_messages: str) -> str:
+        """Prompt para actualizar un informe existente con los mensajes nuevos del chat"""
+        return f"""
+        Tienes el informe de bitácora de un proyecto generado a partir de un chat de WhatsApp.
+        El chat continuó y a continuación están SOLO los mensajes nuevos.
+        
+        IMPORTANTE: Responde ÚNICAMENTE con un JSON válido, sin texto adicional, sin markdown, sin explicaciones.
+        
+        INFORME ACTUAL:
+        {json.dumps(previous_informe, ensure_ascii=False)}
+        
+        MENSAJES NUEVOS:
+        {new_messages}
+        
+        Devuelve el mismo formato JSON con estas reglas:
+        - "titulo_proyecto", "resumen_ejecutivo" y "conclusiones": versión actualizada completa,
+          integrando lo que aportan los mensajes nuevos.
+        - Las listas ("objetivos", "actividades_realizadas", "resultados_logros", "desafios_obstaculos",
+          "lecciones_aprendidas", "recomendaciones"): SOLO los elementos nuevos que no estén ya en el informe.
+        
+        Formato:
+        {REPORT_JSON_FORMAT}"""
+
+
+class _SectionEmitter:
+    """Envía cada sección al callback una vez por valor, venga del streaming o del informe final"""
+    
+    def __init__(self, on_section: Optional[SectionCallback]):
+        self.on_section = on_section
+        self.sent: Dict[str, Any] = {}
+    
+    def __call__(self, name: str, value: Any):
+        # Se reenvía si cambió (p. ej. una sección truncada que luego se completó)
+        if self.on_section is None or (name in self.sent and self.sent[name] == value):
+            return
+        self.sent[name] = value
+        self.on_section(name, value)
+    
+    def all(self, informe_data: Dict[str, Any]):
+        for name, value in informe_data.items():
+            self(name, value)
+
+
+def _union(section_lists: Iterable[List[str]]) -> List[str]:
+    """Secciones faltantes de varios informes, sin repetir y en el orden del informe"""
+    names = {name for sections in section_lists for name in sections}
+    return [name for name in REPORT_SECTIONS if name in names]
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def default_gemini_cache_path() -> Path:
+    """Ruta por defecto de la base del cache de respuestas de Gemini"""
+    return Path(tempfile.gettempdir()) / "whatsapp_gemini_cache.sqlite3"
+
+
+def normalize_chat_text(chat_text: str) -> str:
+    """
+    Normaliza el texto del chat para que la misma exportación produzca la misma clave
+    aunque venga de otro dispositivo (fin de línea, marcas LTR, espacios finales, NFC).
+    """
+    text = unicodedata.normalize('NFC', chat_text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\u200e', '')
+    return '\n'.join(line.rstrip() for line in text.split('\n')).strip()
+
+
+class GeminiResponseCache:
+    """
+    Cache persistente (SQLite) de informes generados por Gemini, con expulsión LRU y TTL.
+
+    La clave combina el hash del chat normalizado, el modelo, la configuración de
+    generación y la versión de la plantilla del prompt, de modo que cambiar
+    cualquiera de ellos invalida las entradas anteriores.
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 500):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(chat_text: str, model_name: str, generation_config: Dict[str, Any],
+                 prompt_version: str) -> str:
+        """Clave del cache para un chat y una configuración de análisis"""
+        digest = hashlib.sha256(normalize_chat_text(chat_text).encode('utf-8'))
+        digest.update(b'\0' + model_name.encode('utf-8'))
+        digest.update(b'\0' + json.dumps(generation_config, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0' + prompt_version.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el informe cacheado o None si no existe o expiró"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Guarda un informe y expulsa las entradas expiradas o menos usadas"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos/fallos y tamaño actual del cache"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
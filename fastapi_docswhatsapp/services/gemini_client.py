@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import google.generativeai as genai
+
+from fastapi_docswhatsapp.services.analyzer_backends import AnalyzerBackend
+
+
+class GeminiClient(AnalyzerBackend):
+    """
+    Cliente de Gemini compartido por toda la aplicación.
+
+    genai.configure descarta los clientes (y sus conexiones) creados hasta ese momento,
+    por lo que se llama una sola vez al iniciar la app. El GenerativeModel reutiliza
+    el mismo canal HTTP/2 (gRPC) o sesión HTTP en todas las solicitudes.
+    """
+
+    def __init__(self, api_key: str, model_name: str, transport: Optional[str] = None):
+        genai.configure(api_key=api_key, transport=transport)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.warmed_up = False
+
+    def generate(self, prompt: str, generation_config: Dict[str, Any], stream: bool = False) -> Any:
+        return self.model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(**generation_config),
+            stream=stream,
+        )
+
+    def count_tokens(self, prompt: str) -> int:
+        return self.model.count_tokens(prompt).total_tokens
+
+    async def warm_up(self, timeout: float = 10.0) -> bool:
+        """
+        Llamada mínima (conteo de tokens, sin costo de generación) para crear el cliente
+        y abrir la conexión TLS antes de la primera solicitud de un usuario.
+        Los errores solo se registran: la app arranca aunque Gemini no responda.
+        """
+        try:
+            # Sin reintentos: así la espera queda acotada por timeout
+            await asyncio.to_thread(
+                self.model.count_tokens, "ping", request_options={"timeout": timeout, "retry": None}
+            )
+            self.warmed_up = True
+            print(f"Cliente de Gemini listo ({self.model_name})")
+        except Exception as e:
+            print(f"⚠️ No se pudo precalentar el cliente de Gemini: {e}")
+        return self.warmed_up
@@ -0,0 +1,157 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from fastapi_docswhatsapp.services.pipeline_metrics import (
+    SCHEDULER_CALLS, SCHEDULER_FAILURES, SCHEDULER_RETRIES, SCHEDULER_THROTTLED_SECONDS,
+)
+
+# Errores transitorios de la API que vale la pena reintentar (429, 500, 503, 504)
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens que se recarga de forma continua hasta `per_minute` por minuto.
+    reserve() descuenta de inmediato (puede quedar en deuda) y devuelve cuánto hay que
+    esperar, de modo que las reservas se atienden en orden de llegada.
+    """
+
+    def __init__(self, per_minute: float):
+        if per_minute <= 0:
+            raise ValueError(f"El límite por minuto debe ser mayor que 0: {per_minute}")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Reserva `amount` tokens y retorna los segundos de espera necesarios"""
+        self._refill()
+        # Una solicitud más grande que la cubeta entera espera a tenerla llena
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+
+class GeminiScheduler:
+    """
+    Punto único por el que pasan todas las llamadas a Gemini de la app.
+
+    Limita la concurrencia global, respeta los límites de solicitudes y tokens por
+    minuto (RPM/TPM) con cubetas de tokens y reintenta los errores 429/5xx con
+    espera exponencial con jitter. Expone la profundidad de la cola como métrica.
+    """
+
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: int = 60,
+                 tokens_per_minute: int = 1_000_000, max_retries: int = 4,
+                 retry_base_delay: float = 1.0, retry_max_delay: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Llamadas esperando turno (por concurrencia o por límite de tasa)"""
+        return self.waiting
+
+    async def run(self, fn: Callable[..., Any], *args, tokens: int = 0, **kwargs) -> Any:
+        """
+        Ejecuta una llamada bloqueante al SDK en un hilo, respetando los límites.
+        `tokens` es la estimación de tokens de entrada para la cubeta TPM.
+        """
+        # Se crean aquí para quedar ligados al event loop en uso
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket_lock = asyncio.Lock()
+
+        self.waiting += 1
+        queued = True
+        try:
+            async with self._semaphore:
+                attempt = 0
+                while True:
+                    await self._wait_for_capacity(tokens)
+                    if queued:
+                        self.waiting -= 1
+                        queued = False
+                    self.in_flight += 1
+                    self.calls += 1
+                    SCHEDULER_CALLS.inc()
+                    try:
+                        return await asyncio.to_thread(fn, *args, **kwargs)
+                    except RETRYABLE_ERRORS as e:
+                        if attempt >= self.max_retries:
+                            self.failures += 1
+                            SCHEDULER_FAILURES.inc()
+                            raise
+                        delay = self._backoff_delay(attempt)
+                        attempt += 1
+                        self.retries += 1
+                        SCHEDULER_RETRIES.inc()
+                        print(f"Gemini respondió {type(e).__name__}; reintento {attempt}/{self.max_retries} "
+                              f"en {delay:.1f}s")
+                    except Exception:
+                        self.failures += 1
+                        SCHEDULER_FAILURES.inc()
+                        raise
+                    finally:
+                        self.in_flight -= 1
+                    await asyncio.sleep(delay)
+        finally:
+            if queued:
+                self.waiting -= 1
+
+    async def _wait_for_capacity(self, tokens: int):
+        """Reserva una solicitud y sus tokens; espera si se agotó alguna cubeta"""
+        async with self._bucket_lock:
+            wait = max(self._requests.reserve(1), self._tokens.reserve(tokens))
+        if wait > 0:
+            self.throttled_seconds += wait
+            SCHEDULER_THROTTLED_SECONDS.inc(wait)
+            await asyncio.sleep(wait)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Espera exponencial con jitter completo, acotada por retry_max_delay"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del planificador"""
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "requests_available": int(self._requests.available()),
+            "tokens_available": int(self._tokens.available()),
+        }
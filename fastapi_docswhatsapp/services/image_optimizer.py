@@ -0,0 +1,242 @@
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image
+
+# Se incrementa cuando cambia la forma de codificar, para invalidar el cache
+IMAGE_CACHE_VERSION = 2
+
+# Motores de decodificación disponibles
+#  - 'full': decodifica la imagen completa y luego la reduce con LANCZOS
+#  - 'draft': en JPEG decodifica a escala reducida (1/2, 1/4, 1/8) cerca del tamaño
+#    final, corrige la orientación EXIF y termina con un remuestreo LANCZOS
+IMAGE_ENGINES = ('full', 'draft')
+
+# Etiqueta EXIF de orientación y la transformación que la corrige
+EXIF_ORIENTATION = 0x0112
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def default_image_cache_dir() -> Path:
+    """Directorio de cache por defecto para imágenes optimizadas"""
+    return Path(tempfile.gettempdir()) / "whatsapp_image_cache"
+
+
+def _resizable(img: Image.Image) -> Image.Image:
+    """
+    Convierte a RGB las imágenes con paleta o con transparencia (P, LA, RGBA), como
+    hacía el redimensionado original: LANCZOS no interpola índices de paleta.
+    """
+    if img.mode in ('P', 'LA', 'RGBA'):
+        return img.convert('RGB')
+    return img
+
+
+class ImageOptimizer:
+    """
+    Redimensiona y recomprime imágenes para el PDF decodificándolas una sola vez.
+
+    Opcionalmente usa un cache en disco direccionado por contenido: la clave es el
+    hash de los bytes originales más los parámetros de redimensionado, de modo que
+    al reexportar el mismo chat las imágenes ya procesadas no se vuelven a codificar.
+    Las instancias son serializables y se envían tal cual al pool de render.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_width: int = 800, max_height: int = 1200,
+                 quality: int = 85, min_size: int = 500_000, engine: str = 'full'):
+        if engine not in IMAGE_ENGINES:
+            raise ValueError(f"Motor de imágenes desconocido: {engine}")
+        self.engine = engine
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_width = max_width
+        self.max_height = max_height
+        self.quality = quality
+        self.min_size = min_size
+
+    def cache_key(self, data: bytes) -> str:
+        """Clave del cache: hash del contenido original y de los parámetros"""
+        digest = hashlib.sha256(data)
+        digest.update(
+            f"|v{IMAGE_CACHE_VERSION}|{self.engine}|{self.max_width}x{self.max_height}|q{self.quality}"
+            f"|min{self.min_size}".encode()
+        )
+        return digest.hexdigest()
+
+    def optimize_file(self, img_path: Path) -> Optional[Tuple[int, int, bool]]:
+        """
+        Optimiza la imagen en sitio si es mayor a min_size o excede las dimensiones.
+        Retorna (tamaño_original, tamaño_nuevo, desde_cache) o None si no se modificó.
+        """
+        img_path = Path(img_path)
+        data = img_path.read_bytes()
+        original_size = len(data)
+
+        key = None
+        if self.cache_dir is not None:
+            key = self.cache_key(data)
+            cached = self._cache_get(key)
+            if cached is not None:
+                # Una entrada vacía indica que la imagen no necesitaba cambios
+                if not cached:
+                    return None
+                img_path.write_bytes(cached)
+                return original_size, len(cached), True
+
+        optimized = self.optimize_bytes(data, img_path.suffix)
+        if key is not None:
+            self._cache_put(key, optimized if optimized is not None else b'')
+        if optimized is None:
+            return None
+
+        img_path.write_bytes(optimized)
+        return original_size, len(optimized), False
+
+    def optimize_bytes(self, data: bytes, suffix: str) -> Optional[bytes]:
+        """Redimensiona y recomprime los bytes de una imagen; None si no hace falta"""
+        with Image.open(io.BytesIO(data)) as img:
+            # Image.open solo lee la cabecera: las dimensiones se conocen sin decodificar
+            if self.engine == 'draft':
+                width, height = self._oriented_size(img)
+            else:
+                width, height = img.size
+            too_big = width > self.max_width or height > self.max_height
+            if len(data) <= self.min_size and not too_big:
+                return None
+
+            img_format = 'JPEG' if suffix.lower() in ('.jpg', '.jpeg') else img.format
+            if self.engine == 'draft':
+                img = self._decode_reduced(img, self._target_size(width, height))
+            else:
+                img = self._resize(img)
+            return self._encode(img, img_format)
+
+    def _target_size(self, width: int, height: int) -> Tuple[int, int]:
+        """Tamaño final manteniendo el aspecto dentro de las dimensiones máximas"""
+        if width > self.max_width or height > self.max_height:
+            ratio = min(self.max_width / width, self.max_height / height)
+            return int(width * ratio), int(height * ratio)
+        return width, height
+
+    def _oriented_size(self, img: Image.Image) -> Tuple[int, int]:
+        """Dimensiones tal como se ven, considerando la rotación EXIF"""
+        orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation in (5, 6, 7, 8):
+            return img.height, img.width
+        return img.width, img.height
+
+    def _decode_reduced(self, img: Image.Image, target: Tuple[int, int]) -> Image.Image:
+        """
+        Decodifica cerca del tamaño final y termina con un remuestreo de calidad.
+        En JPEG, draft() hace que el decodificador aplique la reducción por DCT,
+        evitando decodificar los 12 MP de una foto de teléfono.
+        """
+        orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+        # Se trabaja en la orientación almacenada y se rota al final, ya con la imagen pequeña
+        stored_target = (target[1], target[0]) if orientation in (5, 6, 7, 8) else target
+        # Las fotos de cámaras y algunos teléfonos llegan como MPO (JPEG con vistas extra)
+        if img.format in ('JPEG', 'MPO') and img.mode in ('RGB', 'L', 'CMYK'):
+            img.draft(img.mode, stored_target)
+
+        if img.size != stored_target:
+            img = _resizable(img).resize(stored_target, Image.LANCZOS)
+        else:
+            img.load()
+
+        # La imagen resultante se codifica sin EXIF, así que la orientación se aplica aquí
+        transpose = EXIF_TRANSPOSE.get(orientation)
+        if transpose is not None:
+            img = img.transpose(transpose)
+        return img
+
+    def _resize(self, img: Image.Image) -> Image.Image:
+        """Redimensiona manteniendo el aspecto si excede las dimensiones máximas"""
+        if img.width > self.max_width or img.height > self.max_height:
+            ratio = min(self.max_width / img.width, self.max_height / img.height)
+            new_size = (int(img.width * ratio), int(img.height * ratio))
+            img = _resizable(img).resize(new_size, Image.LANCZOS)
+        return img
+
+    def _encode(self, img: Image.Image, img_format: Optional[str]) -> bytes:
+        buf = io.BytesIO()
+        if img_format == 'JPEG':
+            # Convertir a RGB si es necesario (para JPEG)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            # No se pasa exif/icc_profile: el archivo resultante sale sin metadatos
+            img.save(buf, format='JPEG', quality=self.quality, optimize=True)
+        else:
+            img.save(buf, format=img_format or 'PNG', optimize=True)
+        return buf.getvalue()
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        path = self._cache_path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        # Marcar como usado recientemente para la poda por antigüedad
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _cache_put(self, key: str, data: bytes):
+        path = self._cache_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Escritura atómica: varios procesos pueden escribir la misma clave
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"No se pudo guardar imagen en cache: {e}")
+
+
+def prune_image_cache(cache_dir: Path, max_bytes: int) -> int:
+    """
+    Elimina las entradas usadas hace más tiempo hasta que el cache quede bajo max_bytes.
+    Retorna el número de archivos eliminados.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return 0
+
+    entries = []
+    total = 0
+    for path in cache_dir.glob('*/*'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi_docswhatsapp.services.chat_chunker import COMPACT_DAY_PATTERN, split_chat_messages
+from fastapi_docswhatsapp.services.gemini_cache import normalize_chat_text
+
+# Mensajes iniciales que identifican a un chat (su "cabecera")
+HEAD_MESSAGES = 5
+
+# Secciones de lista del informe que se combinan al actualizar
+REPORT_LIST_SECTIONS = (
+    "objetivos", "actividades_realizadas", "resultados_logros",
+    "desafios_obstaculos", "lecciones_aprendidas", "recomendaciones",
+)
+
+
+class ChatFingerprint:
+    """
+    Huella de un chat a nivel de mensajes.
+
+    head_hash identifica la conversación por sus primeros mensajes; el hash
+    acumulado de los primeros N mensajes permite comprobar que una exportación
+    nueva es una extensión de otra ya analizada.
+    """
+
+    def __init__(self, chat_text: str):
+        self.messages = split_chat_messages(normalize_chat_text(chat_text))
+        self.message_count = len(self.messages)
+        self.head_hash = self._hash(self.messages[:HEAD_MESSAGES])
+        self.prefix_hash = self._hash(self.messages)
+
+    @staticmethod
+    def _hash(messages: List[str]) -> str:
+        digest = hashlib.sha256()
+        for message in messages:
+            digest.update(message.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def longest_matching_prefix(self, candidates: List[Tuple[int, str]]) -> Optional[int]:
+        """
+        Dadas tuplas (cantidad_de_mensajes, hash_del_prefijo) de chats anteriores,
+        devuelve la mayor cantidad cuyo prefijo coincide con este chat, en una sola pasada.
+        """
+        wanted = {count: prefix for count, prefix in candidates if count <= self.message_count}
+        if not wanted:
+            return None
+
+        best = None
+        digest = hashlib.sha256()
+        for i, message in enumerate(self.messages, start=1):
+            digest.update(message.encode('utf-8'))
+            digest.update(b'\0')
+            if i in wanted and digest.hexdigest() == wanted[i]:
+                best = i
+            if i >= max(wanted):
+                break
+        return best
+
+    def messages_after(self, count: int) -> str:
+        """
+        Texto de los mensajes posteriores a los primeros `count`. En el formato compacto,
+        si el corte cae dentro de un día se antepone la cabecera de ese día (como hace
+        chat_chunker.chunk_chat al partir un día) para no perder la fecha.
+        """
+        new_messages = self.messages[count:]
+        if new_messages and not COMPACT_DAY_PATTERN.match(new_messages[0]):
+            header = next((m for m in reversed(self.messages[:count]) if COMPACT_DAY_PATTERN.match(m)), None)
+            if header is not None:
+                new_messages = [header] + new_messages
+        return '\n'.join(new_messages)
+
+
+class ChatSnapshotStore:
+    """
+    Guarda, por chat analizado, su huella y el informe resultante (SQLite), para que
+    una exportación posterior del mismo chat solo envíe a Gemini los mensajes nuevos.
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: int = 30 * 24 * 3600, max_entries: int = 500):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_snapshots (
+                prefix_hash TEXT NOT NULL,
+                head_hash TEXT NOT NULL,
+                message_count INTEGER NOT NULL,
+                analysis_version TEXT NOT NULL,
+                informe_data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (prefix_hash, analysis_version)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_snapshots_head ON chat_snapshots(head_hash, analysis_version)"
+        )
+        self._conn.commit()
+
+    def find_base(self, fingerprint: ChatFingerprint,
+                  analysis_version: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Busca el análisis previo más largo del que este chat es una extensión.
+        Retorna (mensajes_ya_analizados, informe_data) o None.
+        """
+        if fingerprint.message_count < HEAD_MESSAGES:
+            return None
+
+        min_created = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT message_count, prefix_hash, informe_data FROM chat_snapshots
+                WHERE head_hash = ? AND analysis_version = ? AND message_count <= ? AND created_at >= ?
+                """,
+                (fingerprint.head_hash, analysis_version, fingerprint.message_count, min_created)
+            ).fetchall()
+        if not rows:
+            return None
+
+        count = fingerprint.longest_matching_prefix([(row[0], row[1]) for row in rows])
+        if count is None:
+            return None
+        informe_json = next(row[2] for row in rows if row[0] == count)
+        return count, json.loads(informe_json)
+
+    def save(self, fingerprint: ChatFingerprint, analysis_version: str, informe_data: Dict[str, Any]):
+        """Registra el informe de un chat completo para futuras actualizaciones"""
+        if fingerprint.message_count < HEAD_MESSAGES:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO chat_snapshots
+                (prefix_hash, head_hash, message_count, analysis_version, informe_data, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (fingerprint.prefix_hash, fingerprint.head_hash, fingerprint.message_count,
+                 analysis_version, json.dumps(informe_data, ensure_ascii=False), now)
+            )
+            self._conn.execute("DELETE FROM chat_snapshots WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """
+                DELETE FROM chat_snapshots WHERE rowid IN (
+                    SELECT rowid FROM chat_snapshots ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def merge_informe_data(previous: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combina el informe previo con el devuelto para los mensajes nuevos.
+    Los textos se reemplazan si la actualización trae contenido; las listas se
+    unen conservando el orden y sin duplicados.
+    """
+    merged = dict(previous)
+    for key, value in update.items():
+        if key in REPORT_LIST_SECTIONS and isinstance(value, list):
+            combined = list(previous.get(key) or [])
+            seen = {json.dumps(item, sort_keys=True, ensure_ascii=False) for item in combined}
+            for item in value:
+                marker = json.dumps(item, sort_keys=True, ensure_ascii=False)
+                if marker not in seen:
+                    seen.add(marker)
+                    combined.append(item)
+            merged[key] = combined
+        elif value not in (None, "", [], {}):
+            merged[key] = value
+    return merged
@@ -0,0 +1,457 @@
+import base64
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from weasyprint import HTML
+
+from fastapi_docswhatsapp.services.chat_tokenizer import iter_chat_tokens
+from fastapi_docswhatsapp.services.zip_extractor import IMAGE_EXTENSIONS, find_attached_images
+
+def escape_html(text):
+    """Escapa texto para insertarlo en HTML"""
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def find_image_evidence(chat_text: str) -> List[Tuple[str, str]]:
+    """
+    Imágenes adjuntas en el chat, en orden y sin duplicados, con el contexto del
+    mensaje donde aparecen: lista de (nombre_de_archivo, contexto).
+    Es lo único del chat que necesita la sección de evidencias.
+    """
+    evidence = []
+    processed_images = set()  # Evitar duplicados
+    for token in iter_chat_tokens(chat_text):
+        image_filename = token.attachment
+        if image_filename and Path(image_filename).suffix.lower() in IMAGE_EXTENSIONS:
+            if image_filename in processed_images:
+                continue
+            processed_images.add(image_filename)
+            
+            # Contexto del mensaje donde aparece la imagen
+            message_context = ""
+            if token.sender:
+                time_part = ':'.join(token.time.split(':')[:2])
+                if token.ampm:
+                    time_part += f" {token.ampm}"
+                message_context = f"Enviada el {token.date} a las {time_part} por {token.sender}"
+            evidence.append((image_filename, message_context))
+    return evidence
+
+def images_section_html(evidence: List[Tuple[str, str]], image_files: Dict[str, Path]) -> str:
+    """HTML de las evidencias fotográficas a partir de find_image_evidence"""
+    images_html = []
+    
+    # Añadir como evidencia las imágenes del chat original
+    for image_filename, message_context in evidence:
+        if image_filename in image_files:
+            try:
+                img_path = image_files[image_filename]
+                # Las imágenes ya están optimizadas, solo leer y codificar
+                with open(img_path, 'rb') as img_file:
+                    img_data = img_file.read()
+                    img_base64 = base64.b64encode(img_data).decode('utf-8')
+                
+                img_ext = img_path.suffix.lower()
+                mime_type = {
+                    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+                    '.png': 'image/png', '.gif': 'image/gif',
+                    '.bmp': 'image/bmp', '.webp': 'image/webp'
+                }.get(img_ext, 'image/jpeg')
+                
+                images_html.append(f'''
+                    <div style="margin-bottom: 30px; text-align: center;">
+                        <img src="data:{mime_type};base64,{img_base64}" 
+                             alt="{escape_html(image_filename)}" class="report-image">
+                        <div class="image-caption">
+                            <strong>📷 {escape_html(image_filename)}</strong><br>
+                            {escape_html(message_context) if message_context else "Imagen del proyecto"}
+                        </div>
+                    </div>
+                ''')
+            except Exception as e:
+                # Si hay error, al menos mostrar referencia
+                images_html.append(f'''
+                    <div class="activity-item" style="text-align: center;">
+                        <p>📷 <strong>{escape_html(image_filename)}</strong></p>
+                        <p><em>Error cargando imagen: {str(e)[:100]}</em></p>
+                    </div>
+                ''')
+    
+    # Si no hay imágenes en el texto pero sí archivos de imagen, incluirlos
+    if not images_html and image_files:
+        # Limitar a 3 imágenes más pequeñas para evitar PDFs muy pesados
+        sorted_images = sorted(image_files.items(), key=lambda x: x[1].stat().st_size)[:3]
+        for filename, img_path in sorted_images:
+            try:
+                # Verificar tamaño antes de procesar
+                if img_path.stat().st_size > 2_000_000:  # Skip images > 2MB
+                    continue
+                with open(img_path, 'rb') as img_file:
+                    img_data = img_file.read()
+                    img_base64 = base64.b64encode(img_data).decode('utf-8')
+                
+                img_ext = img_path.suffix.lower()
+                mime_type = {
+                    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+                    '.png': 'image/png', '.gif': 'image/gif',
+                    '.bmp': 'image/bmp', '.webp': 'image/webp'
+                }.get(img_ext, 'image/jpeg')
+                
+                images_html.append(f'''
+                    <div style="margin-bottom: 30px; text-align: center;">
+                        <img src="data:{mime_type};base64,{img_base64}" 
+                             alt="{escape_html(filename)}" class="report-image">
+                        <div class="image-caption">
+                            <strong>📷 {escape_html(filename)}</strong><br>
+                            <em>Archivo adjunto del proyecto</em>
+                        </div>
+                    </div>
+                ''')
+            except Exception:
+                continue
+    
+    return '\n'.join(images_html)
+
+
+def generate_informe_html(informe_data: Dict[str, Any], chat_text: str, image_files: Dict[str, Path],
+                          images_html: Optional[str] = None) -> str:
+    """
+    Genera HTML del informe de bitácora profesional con imágenes integradas.
+    Si images_html ya fue preparado (ver images_section_html) se reutiliza.
+    """
+    # CSS para el estilo profesional del informe
+    css_style = """
+    <style>
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            line-height: 1.8;
+            margin: 0;
+            padding: 40px;
+            color: #2c3e50;
+            background-color: #fff;
+        }
+        .report-header {
+            text-align: center;
+            margin-bottom: 50px;
+            border-bottom: 3px solid #3498db;
+            padding-bottom: 30px;
+        }
+        .report-title {
+            color: #2c3e50;
+            font-size: 28px;
+            font-weight: bold;
+            margin-bottom: 10px;
+        }
+        .report-subtitle {
+            color: #7f8c8d;
+            font-size: 16px;
+            margin-bottom: 20px;
+        }
+        .section {
+            margin-bottom: 40px;
+            page-break-inside: avoid;
+        }
+        .section-title {
+            color: #2980b9;
+            font-size: 20px;
+            font-weight: bold;
+            margin-bottom: 15px;
+            border-left: 4px solid #3498db;
+            padding-left: 15px;
+            background-color: #f8f9fa;
+            padding: 10px 15px;
+        }
+        .section-content {
+            margin-left: 20px;
+            text-align: justify;
+        }
+        .activity-item {
+            background-color: #f8f9fa;
+            border: 1px solid #e9ecef;
+            border-radius: 8px;
+            padding: 15px;
+            margin-bottom: 15px;
+        }
+        .activity-date {
+            color: #3498db;
+            font-weight: bold;
+            font-size: 14px;
+        }
+        .activity-description {
+            margin: 8px 0;
+        }
+        .activity-responsible {
+            color: #7f8c8d;
+            font-style: italic;
+            font-size: 14px;
+        }
+        .list-item {
+            background-color: #fff;
+            border-left: 3px solid #27ae60;
+            padding: 10px 15px;
+            margin-bottom: 8px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        .report-image {
+            max-width: 400px;
+            height: auto;
+            border: 2px solid #bdc3c7;
+            border-radius: 8px;
+            margin: 20px auto;
+            display: block;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+        }
+        .image-caption {
+            text-align: center;
+            font-style: italic;
+            color: #7f8c8d;
+            margin-top: 10px;
+            font-size: 14px;
+        }
+        .footer {
+            margin-top: 50px;
+            padding-top: 20px;
+            border-top: 2px solid #ecf0f1;
+            text-align: center;
+            color: #7f8c8d;
+            font-size: 12px;
+        }
+        ul {
+            padding-left: 0;
+        }
+        li {
+            list-style: none;
+        }
+        @page {
+            margin: 2cm;
+        }
+    </style>
+    """
+    
+    # Iniciar HTML del informe
+    html_parts = [
+        '<!DOCTYPE html>',
+        '<html lang="es">',
+        '<head>',
+        '<meta charset="utf-8">',
+        f'<title>{informe_data.get("titulo_proyecto", "Informe de Bitácora")}</title>',
+        css_style,
+        '</head>',
+        '<body>',
+        
+        # Header del informe
+        '<div class="report-header">',
+        f'<h1 class="report-title">📋 {escape_html(informe_data.get("titulo_proyecto", "Informe de Bitácora del Proyecto"))}</h1>',
+        f'<div class="report-subtitle">Fecha: {datetime.now().strftime("%d de %B de %Y")}</div>',
+        '</div>',
+        
+        # Resumen Ejecutivo
+        '<div class="section">',
+        '<h2 class="section-title">📊 Resumen Ejecutivo</h2>',
+        '<div class="section-content">',
+        f'<p>{escape_html(informe_data.get("resumen_ejecutivo", "No disponible"))}</p>',
+        '</div>',
+        '</div>'
+    ]
+    
+    # Objetivos
+    objetivos = informe_data.get("objetivos", [])
+    if objetivos:
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">🎯 Objetivos del Proyecto</h2>',
+            '<div class="section-content">',
+            '<ul>'
+        ])
+        for objetivo in objetivos:
+            if objetivo and str(objetivo).strip():  # Asegurar que no esté vacío
+                html_parts.append(f'<li class="list-item">• {escape_html(str(objetivo))}</li>')
+        html_parts.extend(['</ul>', '</div>', '</div>'])
+    else:
+        # Mostrar sección con contenido por defecto si no hay objetivos
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">🎯 Objetivos del Proyecto</h2>',
+            '<div class="section-content">',
+            '<div class="activity-item">',
+            '<p><em>Los objetivos específicos del proyecto se pueden inferir del análisis del chat de WhatsApp adjunto.</em></p>',
+            '</div>',
+            '</div>', '</div>'
+        ])
+    
+    # Actividades Realizadas
+    actividades = informe_data.get("actividades_realizadas", [])
+    if actividades:
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">⚡ Actividades Realizadas</h2>',
+            '<div class="section-content">'
+        ])
+        for actividad in actividades:
+            if isinstance(actividad, dict):
+                fecha = escape_html(actividad.get("fecha", "Fecha no especificada"))
+                descripcion = escape_html(actividad.get("descripcion", "Descripción no disponible"))
+                responsable = escape_html(actividad.get("responsable", "Responsable no especificado"))
+                
+                html_parts.append(f'''
+                    <div class="activity-item">
+                        <div class="activity-date">📅 {fecha}</div>
+                        <div class="activity-description">{descripcion}</div>
+                        <div class="activity-responsible">👤 Responsable: {responsable}</div>
+                    </div>
+                ''')
+            else:
+                actividad_str = str(actividad).strip()
+                if actividad_str:
+                    html_parts.append(f'<div class="activity-item"><div class="activity-description">{escape_html(actividad_str)}</div></div>')
+        html_parts.extend(['</div>', '</div>'])
+    else:
+        # Mostrar mensaje informativo cuando no hay actividades específicas
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">⚡ Actividades Realizadas</h2>',
+            '<div class="section-content">',
+            '<div class="activity-item">',
+            '<p><em>Las actividades específicas del proyecto pueden ser identificadas revisando el chat de WhatsApp completo.</em></p>',
+            '<p>💬 <strong>Resumen del chat:</strong> El archivo contiene la comunicación del equipo durante el desarrollo del proyecto.</p>',
+            '</div>',
+            '</div>', '</div>'
+        ])
+    
+    # Resultados y Logros
+    if informe_data.get("resultados_logros"):
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">🏆 Resultados y Logros</h2>',
+            '<div class="section-content">',
+            '<ul>'
+        ])
+        for resultado in informe_data["resultados_logros"]:
+            html_parts.append(f'<li class="list-item">✅ {escape_html(resultado)}</li>')
+        html_parts.extend(['</ul>', '</div>', '</div>'])
+    
+    # Evidencias Fotográficas (si hay imágenes)
+    if image_files:
+        if images_html is None:
+            images_html = images_section_html(find_image_evidence(chat_text), image_files)
+        if images_html:
+            html_parts.extend([
+                '<div class="section">',
+                '<h2 class="section-title">📸 Evidencias Fotográficas</h2>',
+                '<div class="section-content">',
+                images_html,
+                '</div>',
+                '</div>'
+            ])
+    
+    # Desafíos y Obstáculos
+    if informe_data.get("desafios_obstaculos"):
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">⚠️ Desafíos y Obstáculos</h2>',
+            '<div class="section-content">',
+            '<ul>'
+        ])
+        for desafio in informe_data["desafios_obstaculos"]:
+            html_parts.append(f'<li class="list-item">⚡ {escape_html(desafio)}</li>')
+        html_parts.extend(['</ul>', '</div>', '</div>'])
+    
+    # Lecciones Aprendidas
+    if informe_data.get("lecciones_aprendidas"):
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">💡 Lecciones Aprendidas</h2>',
+            '<div class="section-content">',
+            '<ul>'
+        ])
+        for leccion in informe_data["lecciones_aprendidas"]:
+            html_parts.append(f'<li class="list-item">📚 {escape_html(leccion)}</li>')
+        html_parts.extend(['</ul>', '</div>', '</div>'])
+    
+    # Conclusiones
+    if informe_data.get("conclusiones"):
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">📋 Conclusiones</h2>',
+            '<div class="section-content">',
+            f'<p>{escape_html(informe_data["conclusiones"])}</p>',
+            '</div>',
+            '</div>'
+        ])
+    
+    # Recomendaciones
+    if informe_data.get("recomendaciones"):
+        html_parts.extend([
+            '<div class="section">',
+            '<h2 class="section-title">💼 Recomendaciones</h2>',
+            '<div class="section-content">',
+            '<ul>'
+        ])
+        for recomendacion in informe_data["recomendaciones"]:
+            html_parts.append(f'<li class="list-item">➡️ {escape_html(recomendacion)}</li>')
+        html_parts.extend(['</ul>', '</div>', '</div>'])
+    
+    # Footer
+    html_parts.extend([
+        '<div class="footer">',
+        f'<p>📊 Total de imágenes procesadas: {len(image_files)}</p>',
+        '<p>🤖 Informe generado automáticamente con Inteligencia Artificial (Gemini) + FastAPI + WeasyPrint</p>',
+        f'<p>Fecha de generación: {datetime.now().strftime("%d/%m/%Y a las %H:%M:%S")}</p>',
+        '</div>',
+        '</body>',
+        '</html>'
+    ])
+    
+    return '\n'.join(html_parts)
+
+def get_relevant_images(chat_text: str, image_files: Dict[str, Path]) -> Dict[str, Path]:
+    """Filtra solo las imágenes que están mencionadas en el chat para optimizar procesamiento"""
+    relevant_images = {}
+    
+    # Buscar imágenes mencionadas en el chat
+    for image_filename in find_attached_images(chat_text):
+        if image_filename in image_files:
+            relevant_images[image_filename] = image_files[image_filename]
+    
+    # Si no se encontraron imágenes mencionadas, incluir las 3 más pequeñas
+    if not relevant_images and image_files:
+        sorted_images = sorted(image_files.items(), key=lambda x: x[1].stat().st_size)[:3]
+        relevant_images = dict(sorted_images)
+    
+    return relevant_images
+
+def render_pdf(html_content: str, pdf_path: Path) -> Path:
+    """Convierte HTML a PDF usando WeasyPrint"""
+    HTML(string=html_content).write_pdf(str(pdf_path))
+    return Path(pdf_path)
+
+# Tareas para el pool de procesos de render: reciben y devuelven rutas de archivo,
+# de modo que ni los bytes de las imágenes, ni el HTML, ni el texto del chat cruzan
+# entre procesos.
+
+def worker_ready() -> bool:
+    """Tarea vacía usada para arrancar los procesos del pool (los imports ya están hechos)"""
+    return True
+
+def build_images_section_file(evidence: List[Tuple[str, str]], image_files: Dict[str, Path],
+                              output_path: Path) -> Path:
+    """Genera el HTML de evidencias fotográficas (ver find_image_evidence) y lo guarda en output_path"""
+    Path(output_path).write_text(images_section_html(evidence, image_files), encoding='utf-8')
+    return Path(output_path)
+
+def render_informe_pdf(informe_data: Dict[str, Any], image_files: Dict[str, Path],
+                       images_html_path: Optional[Path], pdf_path: Path) -> Tuple[Path, Dict[str, float]]:
+    """
+    Compone el HTML del informe, con la sección de evidencias ya guardada en
+    images_html_path (o sin ella), y lo convierte a PDF en pdf_path.
+    Retorna (pdf_path, segundos por etapa) para las métricas del proceso principal.
+    """
+    start = time.perf_counter()
+    images_html = ""
+    if images_html_path is not None:
+        images_html = Path(images_html_path).read_text(encoding='utf-8')
+    html_content = generate_informe_html(informe_data, "", image_files, images_html=images_html)
+    html_done = time.perf_counter()
+    path = render_pdf(html_content, pdf_path)
+    return path, {"informe_html": html_done - start, "pdf": time.perf_counter() - html_done}
@@ -0,0 +1,150 @@
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+from fastapi_docswhatsapp.models import WhatsAppMessage
+from fastapi_docswhatsapp.services.message_types import MESSAGE_TYPES
+
+# Los timestamps del chat no tienen zona horaria: se guardan como segundos desde esta fecha
+_EPOCH = datetime(1970, 1, 1)
+
+
+class MessageTable:
+    """
+    Tabla de mensajes del chat en columnas compactas, para exportaciones muy grandes.
+
+    Cada mensaje ocupa una posición en arreglos de tipo fijo: timestamp (segundos
+    int64), id del remitente (los nombres se guardan una sola vez), código del tipo de
+    mensaje y offset de su contenido dentro de un único buffer UTF-8. Las filas se leen
+    como vistas (MessageRow) que decodifican los campos al accederlos; los modelos
+    WhatsAppMessage se crean solo al exportar con to_models().
+    """
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.sender_ids = array('i')
+        self.type_codes = array('b')
+        # offsets[i]:offsets[i + 1] es el contenido del mensaje i dentro de buffer
+        self.offsets = array('q', [0])
+        self.buffer = bytearray()
+        self.senders: List[str] = []
+        self._sender_ids: Dict[str, int] = {}
+        self._type_codes = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+        # media_path casi nunca está presente: se guarda solo para las filas que lo tienen
+        self.media_paths: Dict[int, str] = {}
+
+    def append(self, timestamp: datetime, sender: str, content: str, message_type: str = 'text',
+               media_path: Optional[str] = None):
+        """Agrega un mensaje al final de la tabla"""
+        sender_id = self._sender_ids.get(sender)
+        if sender_id is None:
+            sender_id = self._sender_ids[sender] = len(self.senders)
+            self.senders.append(sender)
+        type_code = self._type_codes.get(message_type)
+        if type_code is None:
+            raise ValueError(f"Tipo de mensaje desconocido: {message_type}")
+
+        if media_path is not None:
+            self.media_paths[len(self.timestamps)] = media_path
+        self.timestamps.append((timestamp - _EPOCH) // timedelta(seconds=1))
+        self.sender_ids.append(sender_id)
+        self.type_codes.append(type_code)
+        self.buffer += content.encode('utf-8')
+        self.offsets.append(len(self.buffer))
+
+    @classmethod
+    def from_messages(cls, messages: Sequence[WhatsAppMessage]) -> 'MessageTable':
+        """Construye la tabla a partir de modelos WhatsAppMessage"""
+        table = cls()
+        for message in messages:
+            table.append(message.timestamp, message.sender, message.content, message.message_type,
+                         message.media_path)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union['MessageRow', List['MessageRow']]:
+        if isinstance(index, slice):
+            return [MessageRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("índice de mensaje fuera de rango")
+        return MessageRow(self, index)
+
+    def __iter__(self) -> Iterator['MessageRow']:
+        for index in range(len(self)):
+            yield MessageRow(self, index)
+
+    def timestamp(self, index: int) -> datetime:
+        return _EPOCH + timedelta(seconds=self.timestamps[index])
+
+    def sender(self, index: int) -> str:
+        return self.senders[self.sender_ids[index]]
+
+    def content(self, index: int) -> str:
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def message_type(self, index: int) -> str:
+        return MESSAGE_TYPES[self.type_codes[index]]
+
+    def date_range(self) -> Dict[str, Optional[datetime]]:
+        """Primer y último timestamp del chat (None si no hay mensajes)"""
+        if not self.timestamps:
+            return {'start': None, 'end': None}
+        return {
+            'start': _EPOCH + timedelta(seconds=min(self.timestamps)),
+            'end': _EPOCH + timedelta(seconds=max(self.timestamps)),
+        }
+
+    def nbytes(self) -> int:
+        """Memoria aproximada de las columnas y el buffer (sin los nombres de remitentes)"""
+        columns = (self.timestamps, self.sender_ids, self.type_codes, self.offsets)
+        return sum(column.itemsize * len(column) for column in columns) + len(self.buffer)
+
+    def to_models(self, start: int = 0, stop: Optional[int] = None) -> List[WhatsAppMessage]:
+        """Exporta las filas [start:stop] como WhatsAppMessage (para respuestas de la API)"""
+        return [row.to_model() for row in self[start:stop]]
+
+
+class MessageRow:
+    """Vista de una fila de MessageTable con los mismos atributos que WhatsAppMessage"""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: MessageTable, index: int):
+        self.table = table
+        self.index = index
+
+    @property
+    def timestamp(self) -> datetime:
+        return self.table.timestamp(self.index)
+
+    @property
+    def sender(self) -> str:
+        return self.table.sender(self.index)
+
+    @property
+    def content(self) -> str:
+        return self.table.content(self.index)
+
+    @property
+    def message_type(self) -> str:
+        return self.table.message_type(self.index)
+
+    @property
+    def media_path(self) -> Optional[str]:
+        return self.table.media_paths.get(self.index)
+
+    def to_model(self) -> WhatsAppMessage:
+        return WhatsAppMessage(
+            timestamp=self.timestamp,
+            sender=self.sender,
+            content=self.content,
+            message_type=self.message_type,
+            media_path=self.media_path
+        )
+
+    def __repr__(self) -> str:
+        return f"MessageRow({self.index}, {self.timestamp:%Y-%m-%d %H:%M}, sender={self.sender!r})"
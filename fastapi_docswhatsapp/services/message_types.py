@@ -0,0 +1,67 @@
+import re
+from typing import Iterable, List, Optional
+
+from fastapi_docswhatsapp.services.chat_tokenizer import ChatToken
+
+# Tipos de mensaje; el código en MessageTable es la posición en la tupla
+MESSAGE_TYPES = ('text', 'image', 'document', 'audio', 'video', 'location', 'deleted', 'system')
+
+# Tipo según la extensión del adjunto referenciado (el resto son documentos)
+EXTENSION_TYPES = {
+    **dict.fromkeys(('jpg', 'jpeg', 'png', 'gif', 'webp', 'heic', 'bmp'), 'image'),
+    **dict.fromkeys(('mp4', 'mov', '3gp', 'avi', 'mkv'), 'video'),
+    **dict.fromkeys(('opus', 'ogg', 'm4a', 'mp3', 'aac', 'wav', 'amr'), 'audio'),
+}
+
+# Marcadores que WhatsApp escribe al inicio del mensaje, en inglés y español. Solo se
+# reconocen al inicio, de modo que "documento" o "video" dentro de un texto no cuentan.
+_MARKERS = {
+    'attachment': (
+        r'<(?:attached|adjunto): [^>\n]*\.(?P<ios_ext>\w+)>'
+        r'|[^\s<>/\\:]+\.(?P<android_ext>\w{2,5}) \((?:archivo adjunto|file attached)\)'
+    ),
+    'image': (
+        r'<(?:media omitted|multimedia omitido|se omitió multimedia)>'
+        r'|(?:image|sticker|gif) omitted|(?:imagen|sticker|gif) omitid[oa]'
+    ),
+    'video': r'video omitted|video omitido',
+    'audio': r'audio omitted|audio omitido',
+    'document': r'document omitted|documento omitido',
+    'location': (
+        r'(?:location|ubicación): https?://'
+        r'|live location shared|ubicación en tiempo real compartida'
+    ),
+    'deleted': (
+        r'(?:this message was deleted|you deleted this message'
+        r'|se eliminó este mensaje|eliminaste este mensaje)\.?$'
+    ),
+}
+
+# Un único autómata con todas las alternativas, anclado al inicio del cuerpo del mensaje.
+# iOS antepone una marca LRM a adjuntos, mensajes eliminados y avisos del sistema: si
+# hay marca pero ningún marcador, el mensaje es un aviso del sistema.
+MESSAGE_TYPE_PATTERN = re.compile(
+    r'(?P<mark>[\u200e\u200f])?(?:'
+    + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in _MARKERS.items())
+    + r')?',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def classify_message(text: str, start: int = 0, end: Optional[int] = None) -> str:
+    """Tipo del mensaje cuyo cuerpo es text[start:end] (sin copiar el texto)"""
+    match = MESSAGE_TYPE_PATTERN.match(text, start, len(text) if end is None else end)
+    kind = match.lastgroup
+    if kind is None:
+        return 'text'
+    if kind == 'mark':
+        return 'system'
+    if kind == 'attachment':
+        extension = (match.group('ios_ext') or match.group('android_ext')).lower()
+        return EXTENSION_TYPES.get(extension, 'document')
+    return kind
+
+
+def classify_tokens(text: str, tokens: Iterable[ChatToken]) -> List[str]:
+    """Tipos de todos los mensajes del chat, a partir de los tokens de chat_tokenizer"""
+    return [classify_message(text, token.body_start, token.end) for token in tokens]
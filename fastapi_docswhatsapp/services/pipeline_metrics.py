@@ -0,0 +1,256 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Content-Type del formato de texto de Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Límites (segundos) de los histogramas de duración de etapas
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Límites del histograma de imágenes por informe
+IMAGE_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class _Metric:
+    """Base de las métricas: nombre, ayuda y valores por combinación de etiquetas"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Contador monótono con etiquetas"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = self._values or ({(): 0.0} if not self.labelnames else {})
+            for key, value in sorted(values.items()):
+                lines.append(f"{self.name}{self._format_labels(key)} {_format_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Valor instantáneo con etiquetas; puede leerse de una función al exportar"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str):
+        """El valor se obtiene llamando a function cada vez que se exportan las métricas"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        function = self._functions.get(key)
+        return function() if function is not None else self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = dict(self._values)
+            values.update((key, function()) for key, function in self._functions.items())
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{self._format_labels(key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo con etiquetas (buckets, suma y cantidad de observaciones)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteos por bucket (+Inf al final), suma]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_number(bound)
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_number(total[0])}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Métricas de la aplicación (proceso del servidor)
+STAGE_SECONDS = Histogram(
+    "informe_stage_seconds", "Duración de cada etapa de la generación del informe", ("stage",)
+)
+INFORMES_TOTAL = Counter("informes_total", "Informes procesados por resultado", ("resultado",))
+IMAGES_PER_INFORME = Histogram(
+    "informe_images", "Imágenes encontradas en el ZIP por informe", buckets=IMAGE_COUNT_BUCKETS
+)
+IMAGES_TOTAL = Counter("informe_images_total", "Imágenes procesadas por tipo", ("tipo",))
+BYTES_PROCESSED = Counter("informe_bytes_processed_total", "Bytes procesados por tipo de entrada", ("tipo",))
+GEMINI_CALLS = Counter("gemini_calls_total", "Llamadas de generación completadas por modo", ("modo",))
+GEMINI_TOKENS = Counter("gemini_tokens_total", "Tokens reportados por Gemini en usage_metadata", ("tipo",))
+
+# Planificador de llamadas a Gemini (ver GeminiScheduler.stats)
+SCHEDULER_QUEUE_DEPTH = Gauge("gemini_scheduler_queue_depth", "Llamadas a Gemini esperando turno en el planificador")
+SCHEDULER_IN_FLIGHT = Gauge("gemini_scheduler_in_flight", "Llamadas a Gemini en curso")
+SCHEDULER_AVAILABLE = Gauge(
+    "gemini_scheduler_available", "Capacidad disponible en las cubetas RPM/TPM", ("tipo",)
+)
+SCHEDULER_CALLS = Counter("gemini_scheduler_calls_total", "Intentos de llamada a Gemini, incluidos los reintentos")
+SCHEDULER_RETRIES = Counter("gemini_scheduler_retries_total", "Reintentos por errores transitorios (429/5xx)")
+SCHEDULER_FAILURES = Counter("gemini_scheduler_failures_total", "Llamadas a Gemini que terminaron con error")
+SCHEDULER_THROTTLED_SECONDS = Counter(
+    "gemini_scheduler_throttled_seconds_total", "Segundos de espera por los límites RPM/TPM"
+)
+
+REGISTRY = (
+    STAGE_SECONDS, INFORMES_TOTAL, IMAGES_PER_INFORME, IMAGES_TOTAL, BYTES_PROCESSED,
+    GEMINI_CALLS, GEMINI_TOKENS,
+    SCHEDULER_QUEUE_DEPTH, SCHEDULER_IN_FLIGHT, SCHEDULER_AVAILABLE,
+    SCHEDULER_CALLS, SCHEDULER_RETRIES, SCHEDULER_FAILURES, SCHEDULER_THROTTLED_SECONDS,
+)
+
+
+class StageTimings:
+    """
+    Duraciones de las etapas de una solicitud, para la cabecera Server-Timing.
+    Las etapas repetidas se suman; las que corren en paralelo se registran por separado.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: bool = True) -> str:
+        """Valor de la cabecera Server-Timing (duraciones en milisegundos)"""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        if total:
+            entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# Tiempos de la solicitud en curso; los hereda cada tarea creada durante la solicitud
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar("current_timings", default=None)
+
+
+def start_request_timings() -> StageTimings:
+    """Crea los tiempos de la solicitud en curso (llamado por el middleware)"""
+    timings = StageTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float):
+    """Registra la duración de una etapa en el histograma y en la solicitud en curso"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.record(stage, seconds)
+
+
+@contextmanager
+def stage_span(stage: str) -> Iterator[None]:
+    """Mide el bloque como una etapa (sirve también alrededor de un await)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_gemini_usage(usage_metadata: Any, mode: str = "completo"):
+    """Suma los tokens de usage_metadata de una respuesta de Gemini (si la trae)"""
+    GEMINI_CALLS.inc(modo=mode)
+    if usage_metadata is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("respuesta", "candidates_token_count"),
+                       ("total", "total_token_count")):
+        value = getattr(usage_metadata, attr, None)
+        if value:
+            GEMINI_TOKENS.inc(value, tipo=kind)
+
+
+def track_scheduler(scheduler: Any):
+    """Exporta el estado del GeminiScheduler compartido (cola, en curso, capacidad) como gauges"""
+    SCHEDULER_QUEUE_DEPTH.set_function(lambda: scheduler.queue_depth)
+    SCHEDULER_IN_FLIGHT.set_function(lambda: scheduler.in_flight)
+    SCHEDULER_AVAILABLE.set_function(lambda: scheduler.stats()["requests_available"], tipo="solicitudes")
+    SCHEDULER_AVAILABLE.set_function(lambda: scheduler.stats()["tokens_available"], tipo="tokens")
+
+
+def render_metrics() -> str:
+    """Todas las métricas en el formato de texto de Prometheus"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,104 @@
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi_docswhatsapp.services.chat_chunker import chunk_chat, split_chat_messages
+
+# Piezas que el tokenizador suele separar: palabras, dígitos sueltos y cualquier otro símbolo
+TOKEN_PIECE_PATTERN = re.compile(r"[^\W\d_]+|\d|\S")
+
+# Caracteres por token en palabras de texto latino (español/inglés)
+CHARS_PER_WORD_TOKEN = 4
+
+# Espacio mínimo para el chat aunque la plantilla del prompt sea grande
+MIN_CHAT_TOKENS = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación local de tokens, sin llamar a la API.
+    Las palabras cuentan ~1 token cada 4 letras, cada dígito y signo cuenta 1 y
+    los emoji (fuera del plano básico) cuentan 2, que es como se comportan los
+    tokenizadores de subpalabras con chats en español.
+    """
+    tokens = 0
+    for piece in TOKEN_PIECE_PATTERN.findall(text):
+        if piece[0].isalpha():
+            tokens += -(-len(piece) // CHARS_PER_WORD_TOKEN)
+        elif ord(piece) > 0xFFFF:
+            tokens += 2
+        else:
+            tokens += 1
+    return tokens
+
+
+class PromptBudget:
+    """
+    Presupuesto de tokens de entrada para los prompts de Gemini.
+
+    Decide si un chat cabe en una sola llamada, lo divide en fragmentos que llenan el
+    presupuesto y reporta los tokens usados por cada prompt. Si se configura un contador
+    asíncrono (p. ej. count_tokens del modelo), el conteo real se usa en el reporte y para
+    calibrar la estimación local de las siguientes mediciones.
+    """
+
+    def __init__(self, max_tokens: int, max_messages: Optional[int] = None,
+                 token_counter: Optional[Callable[[str], Awaitable[int]]] = None):
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.token_counter = token_counter
+        # Relación conteo_real / estimación, actualizada con cada conteo real
+        self.calibration = 1.0
+
+    def measure(self, text: str) -> int:
+        """Tokens estimados de un texto, con la calibración aplicada"""
+        return int(estimate_tokens(text) * self.calibration)
+
+    def chat_budget(self, overhead_tokens: int) -> int:
+        """Tokens disponibles para el chat descontando la plantilla del prompt"""
+        return max(self.max_tokens - overhead_tokens, MIN_CHAT_TOKENS)
+
+    def fits(self, chat_text: str, overhead_tokens: int, chat_tokens: Optional[int] = None) -> bool:
+        """
+        Indica si el chat cabe completo en un prompt junto con la plantilla.
+        chat_tokens es la medición del chat si ya se hizo.
+        """
+        if self.max_messages is not None and len(split_chat_messages(chat_text)) > self.max_messages:
+            return False
+        if chat_tokens is None:
+            chat_tokens = self.measure(chat_text)
+        return chat_tokens <= self.chat_budget(overhead_tokens)
+
+    def split(self, chat_text: str, overhead_tokens: int, chat_tokens: Optional[int] = None) -> List[str]:
+        """Divide el chat en fragmentos que llenan el presupuesto sin excederlo"""
+        return chunk_chat(
+            chat_text, self.chat_budget(overhead_tokens),
+            measure=self.measure, max_messages=self.max_messages, total_size=chat_tokens
+        )
+
+    async def usage(self, prompt: str, measured: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Tokens usados por un prompt respecto al presupuesto.
+        Usa el contador real si está configurado; si falla, la estimación local.
+        measured es la medición del prompt con measure() si ya se hizo; si no, se
+        mide en un hilo para no bloquear el event loop con prompts grandes.
+        """
+        if measured is None:
+            measured = await asyncio.to_thread(self.measure, prompt)
+        tokens = None
+        if self.token_counter is not None:
+            try:
+                tokens = await self.token_counter(prompt)
+            except Exception as e:
+                print(f"No se pudieron contar los tokens con el modelo: {e}")
+        if tokens is not None and measured:
+            estimated = measured / self.calibration
+            self.calibration = 0.8 * self.calibration + 0.2 * (tokens / estimated)
+
+        used = tokens if tokens is not None else measured
+        return {
+            "tokens": used,
+            "max_tokens": self.max_tokens,
+            "uso": round(used / self.max_tokens, 3) if self.max_tokens else 0.0,
+            "metodo": "contado" if tokens is not None else "estimado",
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi_docswhatsapp.services import informe_renderer
+from fastapi_docswhatsapp.services.image_optimizer import ImageOptimizer
+from fastapi_docswhatsapp.services.pipeline_metrics import record_stage
+
+
+class RenderWorkerPool:
+    """
+    Pool de procesos para el trabajo intensivo en CPU del informe: optimización de
+    imágenes, armado del HTML de evidencias y render con WeasyPrint.
+
+    La optimización de imágenes usa su propio pool, de image_workers procesos (uno por
+    núcleo por defecto), para repartirse entre todos los núcleos sin ocupar los
+    procesos que renderizan PDFs.
+
+    Las tareas reciben y devuelven rutas de archivo, por lo que solo viajan entre
+    procesos rutas, la lista de imágenes adjuntas y el JSON del informe, y el event loop queda libre para atender
+    otras peticiones (incluido /health) mientras se genera un PDF.
+    """
+
+    def __init__(self, max_workers: int = 2, max_tasks_per_child: Optional[int] = None,
+                 image_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.image_workers = image_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._image_executor: Optional[ProcessPoolExecutor] = None
+
+    def _create_executor(self, max_workers: int) -> ProcessPoolExecutor:
+        # 'spawn' evita heredar hilos y locks del proceso del servidor
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    def start(self):
+        """Crea los pools de procesos (idempotente); sus procesos arrancan con la primera tarea"""
+        if self._executor is None:
+            self._executor = self._create_executor(self.max_workers)
+            print(f"Pool de render iniciado con {self.max_workers} procesos")
+        if self._image_executor is None:
+            self._image_executor = self._create_executor(self.image_workers)
+            print(f"Pool de imágenes iniciado con {self.image_workers} procesos")
+
+    async def warm_up(self):
+        """Arranca los procesos del pool para que la primera petición no pague su arranque"""
+        await asyncio.gather(*(self._submit(informe_renderer.worker_ready) for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        """Detiene los pools esperando a que terminen las tareas en curso"""
+        for executor in (self._executor, self._image_executor):
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._image_executor = None
+
+    async def _submit(self, func, *args, images: bool = False):
+        if self._executor is None or self._image_executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        executor = self._image_executor if images else self._executor
+        return await loop.run_in_executor(executor, func, *args)
+
+    async def optimize_images(self, image_files: Dict[str, Path], optimizer: ImageOptimizer) -> int:
+        """
+        Optimiza las imágenes en sitio repartiéndolas entre los procesos del pool de
+        imágenes (una tarea por imagen). Retorna cuántas se redimensionaron.
+        """
+        if not image_files:
+            return 0
+
+        workers = min(self.image_workers, len(image_files))
+        print(f"=== Optimizando {len(image_files)} imágenes en {workers} procesos ===")
+        names = list(image_files)
+        results = await asyncio.gather(
+            *(self._submit(optimizer.optimize_file, image_files[name], images=True) for name in names),
+            return_exceptions=True
+        )
+
+        optimized_count = 0
+        cache_hits = 0
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f"  ⚠️ Error optimizando {name}: {result}")
+            elif result:
+                original_size, new_size, from_cache = result
+                optimized_count += 1
+                cache_hits += from_cache
+                origin = " (cache)" if from_cache else ""
+                print(f"  📷 {name}: {original_size//1024}KB → {new_size//1024}KB{origin}")
+        print(f"=== {optimized_count}/{len(image_files)} imágenes optimizadas, {cache_hits} desde cache ===")
+        return optimized_count
+
+    async def build_images_section(self, evidence: List[Tuple[str, str]], image_files: Dict[str, Path],
+                                   output_path: Path) -> Path:
+        """
+        Genera el HTML de evidencias fotográficas en output_path a partir de la lista
+        de informe_renderer.find_image_evidence (no se envía el chat al worker)
+        """
+        return await self._submit(
+            informe_renderer.build_images_section_file, evidence, image_files, output_path
+        )
+
+    async def render_informe_pdf(self, informe_data: Dict[str, Any], image_files: Dict[str, Path],
+                                 images_html_path: Optional[Path], pdf_path: Path) -> Path:
+        """Compone el HTML del informe y lo renderiza a PDF en pdf_path"""
+        path, stage_seconds = await self._submit(
+            informe_renderer.render_informe_pdf,
+            informe_data, image_files, images_html_path, pdf_path
+        )
+        # Los tiempos se miden en el worker, sin la espera por un proceso libre
+        for stage, seconds in stage_seconds.items():
+            record_stage(stage, seconds)
+        return path
@@ -0,0 +1,223 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi_docswhatsapp.models import InformeJob
+from fastapi_docswhatsapp.utils import create_temp_directory, cleanup_temp_directory
+
+# Firma del callback de progreso: (etapa, porcentaje)
+ProgressCallback = Callable[[str, int], None]
+
+# Firma del callback de secciones del informe: (nombre_sección, valor)
+SectionCallback = Callable[[str, Any], None]
+
+# Función que genera el PDF: (zip_path, work_dir, pdf_path, progress, on_section) -> total de imágenes
+InformeProcessor = Callable[[Path, Path, Path, ProgressCallback, SectionCallback], Awaitable[int]]
+
+
+class JobQueueFullError(Exception):
+    """Se lanza cuando la cola de trabajos alcanzó su capacidad máxima"""
+    pass
+
+
+class ReportJobManager:
+    """
+    Cola de trabajos para generar informes en segundo plano.
+
+    Cada trabajo tiene su propio directorio temporal con el ZIP subido y el PDF
+    resultante. Un número fijo de workers consume la cola (concurrencia acotada)
+    y los resultados se eliminan al vencer su TTL. Las subidas repetidas del
+    mismo ZIP reutilizan el trabajo existente en lugar de renderizarlo de nuevo.
+    El progreso y cada sección del informe se registran como eventos que los
+    clientes pueden seguir en vivo (SSE).
+    """
+
+    def __init__(self, processor: InformeProcessor, workers: int = 2, max_queue_size: int = 20,
+                 result_ttl: int = 3600, cleanup_interval: int = 60):
+        self.processor = processor
+        self.workers = workers
+        self.result_ttl = timedelta(seconds=result_ttl)
+        self.cleanup_interval = cleanup_interval
+        self.jobs: Dict[str, InformeJob] = {}
+        self._job_dirs: Dict[str, Path] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._event_signals: Dict[str, asyncio.Event] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Lanza los workers y la tarea de limpieza"""
+        if self._tasks:
+            return
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    async def shutdown(self):
+        """Detiene los workers y elimina los archivos de todos los trabajos"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id in list(self.jobs):
+            self._remove_job(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        """Trabajos en espera de un worker"""
+        return self._queue.qsize()
+
+    def new_job_dir(self) -> Path:
+        """Crea un directorio temporal para recibir el ZIP de un nuevo trabajo"""
+        return create_temp_directory()
+
+    def find_by_hash(self, content_hash: str) -> Optional[InformeJob]:
+        """Busca un trabajo vigente (no fallido) para el mismo contenido"""
+        for job in self.jobs.values():
+            if job.content_hash == content_hash and job.status != "error":
+                return job
+        return None
+
+    def submit(self, job_dir: Path, zip_path: Path, filename: str,
+               content_hash: Optional[str] = None) -> InformeJob:
+        """
+        Encola un trabajo para el ZIP ya guardado en job_dir.
+        Si existe un trabajo vigente con el mismo content_hash, se devuelve ese.
+        """
+        if content_hash:
+            existing = self.find_by_hash(content_hash)
+            if existing:
+                cleanup_temp_directory(job_dir)
+                return existing
+
+        job = InformeJob(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            content_hash=content_hash,
+            created_at=datetime.now()
+        )
+        try:
+            self._queue.put_nowait((job.id, zip_path))
+        except asyncio.QueueFull:
+            cleanup_temp_directory(job_dir)
+            raise JobQueueFullError("La cola de informes está llena, intente más tarde")
+
+        self.jobs[job.id] = job
+        self._job_dirs[job.id] = job_dir
+        self._events[job.id] = []
+        self._event_signals[job.id] = asyncio.Event()
+        self._publish(job.id, "progreso", {"stage": job.stage, "progress": job.progress})
+        return job
+
+    def get(self, job_id: str) -> Optional[InformeJob]:
+        return self.jobs.get(job_id)
+
+    def result_path(self, job_id: str) -> Optional[Path]:
+        """Ruta del PDF si el trabajo terminó correctamente"""
+        job = self.jobs.get(job_id)
+        if not job or job.status != "completado":
+            return None
+        return self._job_dirs[job_id] / "informe.pdf"
+
+    async def stream_events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Eventos del trabajo desde el inicio y luego en vivo, hasta que termine.
+        Cada evento es {"event": tipo, "data": contenido}.
+        """
+        index = 0
+        while True:
+            events = self._events.get(job_id)
+            if events is None:
+                return
+            while index < len(events):
+                yield events[index]
+                index += 1
+            job = self.jobs.get(job_id)
+            if job is None or job.finished_at is not None:
+                return
+            await self._event_signals[job_id].wait()
+    
+    def _publish(self, job_id: str, event: str, data: Any):
+        """Registra un evento y despierta a los clientes que esperan"""
+        events = self._events.get(job_id)
+        if events is None:
+            return
+        events.append({"event": event, "data": data})
+        # Se reemplaza el Event para que los clientes esperen al siguiente
+        signal = self._event_signals[job_id]
+        self._event_signals[job_id] = asyncio.Event()
+        signal.set()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id, zip_path = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    continue
+                await self._run_job(job, zip_path)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: InformeJob, zip_path: Path):
+        job_dir = self._job_dirs[job.id]
+
+        def progress(stage: str, percent: int):
+            job.stage = stage
+            job.progress = percent
+            self._publish(job.id, "progreso", {"stage": stage, "progress": percent})
+
+        def on_section(name: str, value: Any):
+            self._publish(job.id, "seccion", {"nombre": name, "valor": value})
+
+        job.status = "procesando"
+        progress("iniciando", 0)
+        try:
+            job.total_images = await self.processor(
+                zip_path, job_dir, job_dir / "informe.pdf", progress, on_section
+            )
+            job.status = "completado"
+            progress("completado", 100)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error en trabajo de informe {job.id}: {e}")
+            job.status = "error"
+            job.stage = "error"
+            job.error = str(getattr(e, "detail", e))
+        finally:
+            job.finished_at = datetime.now()
+            self._publish(job.id, job.status, {"status": job.status, "error": job.error})
+            # El ZIP ya no se necesita una vez procesado
+            try:
+                zip_path.unlink()
+            except OSError:
+                pass
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            self.cleanup_expired()
+
+    def cleanup_expired(self) -> int:
+        """Elimina los trabajos terminados cuyo TTL venció; retorna cuántos se eliminaron"""
+        now = datetime.now()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            self._remove_job(job_id)
+        return len(expired)
+
+    def _remove_job(self, job_id: str):
+        self.jobs.pop(job_id, None)
+        self._events.pop(job_id, None)
+        signal = self._event_signals.pop(job_id, None)
+        if signal is not None:
+            signal.set()
+        job_dir = self._job_dirs.pop(job_id, None)
+        if job_dir:
+            cleanup_temp_directory(job_dir)
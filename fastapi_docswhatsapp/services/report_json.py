@@ -0,0 +1,143 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: solo acelera el parseo
+    orjson = None
+
+# Intentos máximos de corte al reparar una respuesta truncada
+MAX_REPAIR_ATTEMPTS = 64
+
+# Campos de JSON Schema que se pasan al response_schema de Gemini.
+# Se omite description: Pydantic la llena con el docstring del modelo.
+GEMINI_SCHEMA_FIELDS = ("type", "format", "nullable", "enum", "items", "properties", "required")
+
+
+def loads(text: str) -> Any:
+    """json.loads con orjson si está instalado"""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError as e:
+            # Mismo tipo de error que con json, para los manejadores existentes
+            raise json.JSONDecodeError(str(e), text, 0) from e
+    return json.loads(text)
+
+
+def gemini_response_schema(model: Type[BaseModel], only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Convierte el JSON Schema de un modelo Pydantic al subconjunto que acepta Gemini
+    (sin $ref ni títulos). `only` restringe el esquema a algunas propiedades.
+    """
+    schema = model.model_json_schema()
+    defs = schema.get("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            node = defs[node["$ref"].split("/")[-1]]
+        out = {}
+        for field in GEMINI_SCHEMA_FIELDS:
+            if field not in node:
+                continue
+            value = node[field]
+            if field == "items":
+                value = convert(value)
+            elif field == "properties":
+                value = {name: convert(prop) for name, prop in value.items()}
+            out[field] = value
+        return out
+
+    result = convert(schema)
+    if only is not None:
+        result["properties"] = {k: v for k, v in result["properties"].items() if k in only}
+        result["required"] = [k for k in result.get("required", []) if k in only]
+    return result
+
+
+def extract_json_text(response_text: str) -> str:
+    """Quita bloques de código markdown y texto alrededor del objeto JSON"""
+    text = response_text.strip()
+    if text.startswith("```"):
+        # Primera línea: ``` o ```json; la de cierre puede faltar si la salida se truncó
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    start = text.find("{")
+    return text[start:].strip() if start >= 0 else text
+
+
+def repair_truncated_json(text: str) -> Optional[Any]:
+    """
+    Recupera un objeto JSON cortado (p. ej. por max_output_tokens).
+    Primero cierra el string abierto y las llaves pendientes; si no alcanza, prueba
+    cortar en el último valor completo, luego en el anterior, etc.
+    Retorna el objeto recuperado o None.
+    """
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    # Posiciones donde termina un valor o abre un contenedor, con los cierres pendientes
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                cuts.append((i + 1, tuple(stack)))
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            cuts.append((i + 1, tuple(stack)))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            cuts.append((i + 1, tuple(stack)))
+        elif char.isdigit() or char in "el":
+            # Fin de un número o de true/false/null
+            cuts.append((i + 1, tuple(stack)))
+
+    candidates = []
+    if in_string:
+        open_text = text[:-1] if escape else text
+        candidates.append(open_text + '"' + "".join(reversed(stack)))
+    for pos, pending in reversed(cuts):
+        candidates.append(text[:pos] + "".join(reversed(pending)))
+
+    for candidate in candidates[:MAX_REPAIR_ATTEMPTS]:
+        try:
+            return loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def parse_report_json(response_text: str, sections: List[str]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Parsea la respuesta del informe y retorna (informe, secciones_faltantes).
+    Si la respuesta está truncada la repara: faltan las secciones que no llegaron
+    y la última recibida, que pudo quedar incompleta (se conserva como respaldo).
+    Retorna (None, sections) si no se pudo recuperar nada.
+    """
+    text = extract_json_text(response_text)
+    try:
+        data = loads(text)
+    except json.JSONDecodeError:
+        data = repair_truncated_json(text)
+        if not isinstance(data, dict):
+            return None, list(sections)
+        missing = [name for name in sections if name not in data]
+        if data and list(data)[-1] in sections:
+            missing.append(list(data)[-1])
+        return data, missing
+
+    if not isinstance(data, dict):
+        return None, list(sections)
+    return data, []
@@ -0,0 +1,86 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class ReportSectionParser:
+    """
+    Parser incremental del objeto JSON del informe a medida que llega por streaming.
+
+    Recibe fragmentos de texto arbitrarios y devuelve cada sección de primer nivel
+    (clave, valor) en cuanto su valor termina, sin esperar al resto del objeto.
+    Ignora cualquier texto previo a la primera llave (p. ej. un bloque ```json).
+    Solo conserva en memoria el texto de la sección en curso.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Agrega texto y retorna las secciones completadas con él"""
+        if self.finished or not chunk:
+            return []
+        self._text += chunk
+        sections = []
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = None
+            elif char == '"':
+                self._in_string = True
+                # Un string a nivel 1 sin clave pendiente es el nombre de una sección
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(text[self._value_start:i] if self._value_start is not None else None, sections)
+                    self.finished = True
+                    break
+            elif self._depth == 1:
+                if char == ':' and self._key is not None:
+                    self._value_start = i + 1
+                elif char == ',':
+                    self._emit(text[self._value_start:i] if self._value_start is not None else None, sections)
+            i += 1
+
+        # Descartar el texto ya procesado que no pertenece a la sección en curso
+        keep_from = min(p for p in (self._key_start, self._value_start, i) if p is not None)
+        self._text = text[keep_from:]
+        self._pos = i - keep_from
+        if self._key_start is not None:
+            self._key_start -= keep_from
+        if self._value_start is not None:
+            self._value_start -= keep_from
+        return sections
+
+    def _emit(self, raw_value: Optional[str], sections: List[Tuple[str, Any]]):
+        key = self._key
+        self._key = None
+        self._value_start = None
+        if key is None or raw_value is None:
+            return
+        try:
+            sections.append((key, json.loads(raw_value)))
+        except json.JSONDecodeError:
+            # Valor mal formado: se deja para el parseo final del texto completo
+            pass
@@ -1,31 +1,66 @@
 import zipfile
-import re
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import chain, islice
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple
+import codecs
 import os
 from PIL import Image
 
 from fastapi_docswhatsapp.models import WhatsAppMessage, ChatData
+from fastapi_docswhatsapp.services.chat_dates import DATE_SAMPLE_HEADERS, ChatDateParser, detect_date_format
+from fastapi_docswhatsapp.services.chat_tokenizer import CHAT_FORMATS, detect_chat_format, tokenize_chat
+from fastapi_docswhatsapp.services.message_store import MessageTable
+from fastapi_docswhatsapp.services.message_types import classify_tokens
+
+# Tamaño de los bloques que se leen del archivo del chat
+READ_CHUNK_SIZE = 256 * 1024
+
+
+def iter_decoded_blocks(stream: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Decodifica el archivo del chat por bloques y produce texto cortado en saltos de línea
+    (cada bloque contiene solo líneas completas, con finales de línea "\n").
+    Se decodifica como UTF-8 sin la marca BOM inicial y, si aparece un byte inválido,
+    desde ese punto se sigue como latin-1 sin volver a leer el archivo: lo ya
+    decodificado era UTF-8 válido.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending: List[str] = []
+    first = True
+    final = False
+    while not final:
+        chunk = stream.read(chunk_size)
+        final = not chunk
+        try:
+            text = decoder.decode(chunk, final=final)
+        except UnicodeDecodeError as e:
+            print(f"⚠️ El chat no es UTF-8 válido (byte {e.object[e.start]:#04x}); se continúa como latin-1")
+            valid = e.object[:e.start].decode('utf-8')
+            decoder = codecs.getincrementaldecoder('latin-1')()
+            text = valid + decoder.decode(e.object[e.start:], final=final)
+        if first and text:
+            first = False
+            if text[0] == '\ufeff':
+                text = text[1:]
+        
+        # Lo que sigue al último salto de línea espera al bloque siguiente
+        cut = len(text) if final else text.rfind('\n') + 1
+        if not cut:
+            pending.append(text)
+            continue
+        pending.append(text[:cut])
+        block = ''.join(pending)
+        pending = [text[cut:]]
+        if '\r' in block:
+            block = block.replace('\r\n', '\n')
+        if block:
+            yield block
+
 
 class WhatsAppProcessor:
     """Clase para procesar archivos ZIP exportados de WhatsApp"""
     
-    def __init__(self):
-        # Patrón para mensajes de WhatsApp en español
-        self.message_pattern = re.compile(
-            r'(\d{1,2}/\d{1,2}/\d{2,4}),?\s+(\d{1,2}:\d{2})\s*(?:a\.\s*m\.|p\.\s*m\.)?\s*-\s*([^:]+):\s*(.*)'
-        )
-        
-        # Patrones para detectar tipos de mensajes especiales
-        self.media_patterns = {
-            'image': re.compile(r'<se omitió multimedia>|<Media omitted>|\(archivo adjunto\)'),
-            'document': re.compile(r'documento|document|archivo|file'),
-            'audio': re.compile(r'audio|voice note|nota de voz'),
-            'video': re.compile(r'video|vídeo'),
-            'location': re.compile(r'ubicación compartida|location shared')
-        }
-    
     def process_zip(self, zip_path: Path) -> Dict[str, Any]:
         """
         Procesa el archivo ZIP del chat de WhatsApp
@@ -43,20 +78,20 @@ class WhatsAppProcessor:
             extract_path = zip_path.parent / 'extracted'
             zip_ref.extractall(extract_path)
             
-            # Buscar archivo de chat (usualmente _chat.txt)
-            chat_file = self._find_chat_file(extract_path)
-            if chat_file:
-                chat_data['chat_name'] = chat_file.stem.replace('_chat', '')
-                messages = self._parse_chat_file(chat_file)
+            # Buscar archivo de chat (usualmente _chat.txt) y leerlo desde el ZIP por bloques
+            chat_member = self._find_chat_member(zip_ref)
+            if chat_member:
+                chat_data['chat_name'] = Path(chat_member.filename).stem.replace('_chat', '')
+                with zip_ref.open(chat_member) as stream:
+                    messages = self._parse_chat_stream(stream)
                 chat_data['messages'] = messages
                 
-                # Extraer participantes únicos
-                chat_data['participants'] = list(set(msg.sender for msg in messages))
+                # Participantes únicos (la tabla guarda cada remitente una sola vez)
+                chat_data['participants'] = list(messages.senders)
                 
                 # Determinar rango de fechas
                 if messages:
-                    chat_data['date_range']['start'] = min(msg.timestamp for msg in messages)
-                    chat_data['date_range']['end'] = max(msg.timestamp for msg in messages)
+                    chat_data['date_range'] = messages.date_range()
             
             # Procesar archivos multimedia
             media_files = self._process_media_files(extract_path)
@@ -66,127 +101,137 @@ class WhatsAppProcessor:
         
         return chat_data
     
-    def _find_chat_file(self, extract_path: Path) -> Path:
-        """Busca el archivo principal del chat"""
-        for file in extract_path.rglob('*.txt'):
-            if '_chat' in file.name.lower() or 'whatsapp' in file.name.lower():
-                return file
+    def to_chat_data(self, chat_data: Dict[str, Any]) -> ChatData:
+        """
+        Convierte el resultado de process_zip en el modelo ChatData (para respuestas de la API).
+        Es el único punto donde la tabla de mensajes se exporta a WhatsAppMessage.
+        """
+        messages = chat_data['messages']
+        return ChatData(
+            messages=messages.to_models() if isinstance(messages, MessageTable) else messages,
+            participants=chat_data['participants'],
+            chat_name=chat_data['chat_name'],
+            date_range={key: value for key, value in chat_data['date_range'].items() if value is not None},
+            media_files=chat_data['media_files'],
+            total_messages=chat_data['total_messages']
+        )
+    
+    def iter_messages(self, zip_path: Path) -> Iterator[WhatsAppMessage]:
+        """
+        Recorre los mensajes del chat directamente desde el ZIP, sin extraerlo ni cargar
+        el archivo completo: se decodifica por bloques y cada mensaje se entrega en cuanto
+        termina, de modo que la memoria no depende del tamaño del chat.
+        """
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            member = self._find_chat_member(zip_ref)
+            if member is None:
+                return
+            with zip_ref.open(member) as stream:
+                for timestamp, sender, content, message_type in self._iter_parsed_messages(iter_decoded_blocks(stream)):
+                    yield WhatsAppMessage(
+                        timestamp=timestamp,
+                        sender=sender,
+                        content=content,
+                        message_type=message_type
+                    )
+    
+    def _find_chat_member(self, zip_ref: zipfile.ZipFile) -> Optional[zipfile.ZipInfo]:
+        """Busca el archivo principal del chat dentro del ZIP"""
+        txt_members = [info for info in zip_ref.infolist()
+                       if not info.is_dir() and info.filename.lower().endswith('.txt')]
+        for info in txt_members:
+            name = Path(info.filename).name.lower()
+            if '_chat' in name or 'whatsapp' in name:
+                return info
         
         # Si no encuentra archivo específico, busca el TXT más grande
-        txt_files = list(extract_path.rglob('*.txt'))
-        if txt_files:
-            return max(txt_files, key=lambda f: f.stat().st_size)
+        if txt_members:
+            return max(txt_members, key=lambda info: info.file_size)
         
         return None
     
-    def _parse_chat_file(self, chat_file: Path) -> List[WhatsAppMessage]:
-        """Parsea el archivo de texto del chat"""
-        messages = []
-        
-        try:
-            with open(chat_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # Intentar con otra codificación
-            with open(chat_file, 'r', encoding='latin-1') as f:
-                content = f.read()
-        
-        lines = content.split('\n')
-        current_message = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Verificar si es una nueva línea de mensaje
-            match = self.message_pattern.match(line)
-            if match:
-                # Guardar mensaje anterior si existe
-                if current_message:
-                    messages.append(current_message)
-                
-                # Crear nuevo mensaje
-                date_str, time_str, sender, content = match.groups()
-                
-                # Parsear fecha y hora
-                timestamp = self._parse_datetime(date_str, time_str)
-                
-                # Determinar tipo de mensaje
-                message_type = self._determine_message_type(content)
-                
-                current_message = WhatsAppMessage(
-                    timestamp=timestamp,
-                    sender=sender.strip(),
-                    content=content.strip(),
-                    message_type=message_type
-                )
-            else:
-                # Continuar mensaje anterior (mensaje multilínea)
-                if current_message:
-                    current_message.content += f"\n{line}"
-        
-        # Agregar último mensaje
-        if current_message:
-            messages.append(current_message)
-        
+    def _parse_chat_file(self, chat_file: Path) -> MessageTable:
+        """Parsea el archivo de texto del chat (ver _parse_chat_stream)"""
+        with open(chat_file, 'rb') as stream:
+            return self._parse_chat_stream(stream)
+    
+    def _parse_chat_stream(self, stream: BinaryIO) -> MessageTable:
+        """
+        Parsea el chat en una MessageTable (columnas compactas).
+        Sus filas tienen los atributos de WhatsAppMessage; to_models() crea los modelos.
+        """
+        messages = MessageTable()
+        for timestamp, sender, content, message_type in self._iter_parsed_messages(iter_decoded_blocks(stream)):
+            messages.append(timestamp, sender, content, message_type)
         return messages
     
-    def _parse_datetime(self, date_str: str, time_str: str) -> datetime:
-        """Parsea fecha y hora de WhatsApp"""
-        # Limpiar y normalizar formato de fecha
-        date_str = date_str.replace(',', '').strip()
-        time_str = time_str.strip()
-        
-        # Formatos comunes de fecha de WhatsApp
-        date_formats = [
-            '%d/%m/%Y',
-            '%d/%m/%y', 
-            '%m/%d/%Y',
-            '%m/%d/%y'
-        ]
+    def _iter_parsed_messages(self, blocks: Iterable[str]) -> Iterator[Tuple[datetime, str, str, str]]:
+        """
+        Recorre el chat (en bloques de líneas completas) y produce (timestamp, remitente,
+        contenido, tipo) por mensaje. Cada bloque se recorre con el tokenizador en una sola
+        pasada y el contenido se toma como slice del bloque; solo un mensaje que continúa
+        en el bloque siguiente se arma a partir de varios fragmentos.
+        """
+        blocks = iter(blocks)
+        first_block = next(blocks, None)
+        if first_block is None:
+            return
         
-        # Formatos de hora
-        time_formats = [
-            '%H:%M',
-            '%I:%M'
-        ]
+        # Cabeceras de mensaje según el formato del chat (iOS o Android), detectado una vez
+        chat_format = detect_chat_format(first_block)
+        if chat_format is None:
+            return
         
-        parsed_date = None
-        for date_fmt in date_formats:
-            try:
-                parsed_date = datetime.strptime(date_str, date_fmt).date()
-                break
-            except ValueError:
-                continue
+        # Formato de fecha y hora (dd/mm o mm/dd, 12 h o 24 h) inferido con una muestra de cabeceras
+        headers = islice(CHAT_FORMATS[chat_format].finditer(first_block), DATE_SAMPLE_HEADERS)
+        date_format = detect_date_format(match.group('date', 'ampm') for match in headers)
+        date_parser = ChatDateParser(date_format)
         
-        if not parsed_date:
-            # Fecha por defecto si no se puede parsear
-            parsed_date = datetime.now().date()
+        # Mensaje en curso: (timestamp, remitente, tipo, fragmentos del contenido). Se entrega
+        # al encontrar la cabecera siguiente, porque puede continuar en el próximo bloque
+        current = None
+        invalid_headers = 0
         
-        parsed_time = None
-        for time_fmt in time_formats:
-            try:
-                parsed_time = datetime.strptime(time_str, time_fmt).time()
-                break
-            except ValueError:
-                continue
+        for text in chain((first_block,), blocks):
+            tokens = tokenize_chat(text, chat_format)
+            # Tipos de todos los mensajes del bloque en una pasada sobre los tokens
+            message_types = classify_tokens(text, tokens)
+            
+            # Texto previo a la primera cabecera del bloque: continuación del mensaje en curso
+            prefix_end = tokens[0].start if tokens else len(text)
+            if current and prefix_end:
+                current[3].append(text[:prefix_end].rstrip('\n'))
+            
+            for token, message_type in zip(tokens, message_types):
+                try:
+                    timestamp = date_parser.parse(token.date, token.time, token.ampm)
+                except ValueError:
+                    # Fecha u hora imposible: no es una cabecera real, se trata como texto
+                    invalid_headers += 1
+                    if current:
+                        current[3].append(text[token.start:token.end])
+                    continue
+                
+                if current:
+                    yield self._build_message(current)
+                
+                # Los avisos del sistema de Android no tienen remitente y no son mensajes
+                current = None
+                if token.sender is not None:
+                    current = (timestamp, token.sender, message_type, [token.body(text)])
         
-        if not parsed_time:
-            # Hora por defecto
-            parsed_time = datetime.now().time()
+        if current:
+            yield self._build_message(current)
         
-        return datetime.combine(parsed_date, parsed_time)
+        if invalid_headers:
+            print(f"⚠️ {invalid_headers} cabeceras con fecha u hora inválida para {date_format}; "
+                  f"se tomaron como texto del mensaje anterior")
     
-    def _determine_message_type(self, content: str) -> str:
-        """Determina el tipo de mensaje basado en el contenido"""
-        content_lower = content.lower()
-        
-        for msg_type, pattern in self.media_patterns.items():
-            if pattern.search(content_lower):
-                return msg_type
-        
-        return 'text'
+    def _build_message(self, current: Tuple[datetime, str, str, List[str]]) -> Tuple[datetime, str, str, str]:
+        """Arma el mensaje a partir de su cabecera y los fragmentos de su contenido"""
+        timestamp, sender, message_type, fragments = current
+        content = fragments[0] if len(fragments) == 1 else '\n'.join(fragments)
+        return timestamp, sender.strip(), content.strip(), message_type
     
     def _process_media_files(self, extract_path: Path) -> List[str]:
         """Procesa archivos multimedia del chat"""
@@ -0,0 +1,105 @@
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi_docswhatsapp.services.chat_tokenizer import iter_chat_tokens
+
+# Extensiones de imagen que se incluyen en el informe
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+
+def find_attached_images(chat_text: str) -> List[str]:
+    """Devuelve los nombres de imágenes referenciadas en el chat (iOS o Android), en orden y sin duplicados"""
+    seen = set()
+    names = []
+    for token in iter_chat_tokens(chat_text):
+        name = token.attachment
+        if name and name not in seen and PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def decode_chat_bytes(data: bytes) -> str:
+    """Decodifica el chat en UTF-8 con respaldo a latin-1"""
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+class ZipChatExtractor:
+    """
+    Extrae de un ZIP exportado de WhatsApp solo lo que el informe necesita:
+    el archivo de chat y las imágenes que el chat referencia.
+
+    Trabaja sobre el directorio central del ZIP, de modo que videos, notas de voz
+    y stickers nunca se descomprimen ni se escriben a disco.
+    """
+
+    def __init__(self, zip_path: Path, fallback_images: int = 3, max_fallback_image_size: int = 2_000_000):
+        self.zip_path = Path(zip_path)
+        self.fallback_images = fallback_images
+        self.max_fallback_image_size = max_fallback_image_size
+
+    def extract(self, extract_path: Path) -> Tuple[str, Dict[str, Path]]:
+        """
+        Lee el chat y descomprime únicamente las imágenes referenciadas.
+        Si el chat no referencia imágenes presentes en el ZIP, extrae las
+        `fallback_images` más pequeñas como respaldo.
+        """
+        extract_path = Path(extract_path)
+        extract_path.mkdir(parents=True, exist_ok=True)
+
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            members = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+            chat_info = self._find_chat_member(members)
+            chat_text = decode_chat_bytes(zip_ref.read(chat_info)) if chat_info else ""
+
+            image_members = self._index_images(members)
+            selected = self._select_images(chat_text, image_members)
+
+            image_files = {}
+            for name, info in selected.items():
+                image_files[name] = Path(zip_ref.extract(info, extract_path))
+
+        return chat_text, image_files
+
+    def _find_chat_member(self, members: List[zipfile.ZipInfo]) -> Optional[zipfile.ZipInfo]:
+        """Busca el archivo principal del chat (misma regla que la extracción completa)"""
+        txt_members = [info for info in members if info.filename.lower().endswith('.txt')]
+        for info in txt_members:
+            name = PurePosixPath(info.filename).name.lower()
+            if '_chat.txt' in name or 'whatsapp' in name:
+                return info
+
+        # Si no encuentra archivo específico, usar el TXT más grande
+        if txt_members:
+            return max(txt_members, key=lambda info: info.file_size)
+        return None
+
+    def _index_images(self, members: List[zipfile.ZipInfo]) -> Dict[str, zipfile.ZipInfo]:
+        """Indexa los miembros de imagen por nombre de archivo"""
+        images = {}
+        for info in members:
+            name = PurePosixPath(info.filename).name
+            if PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS:
+                images[name] = info
+        return images
+
+    def _select_images(self, chat_text: str,
+                       image_members: Dict[str, zipfile.ZipInfo]) -> Dict[str, zipfile.ZipInfo]:
+        """Elige las imágenes a descomprimir: las referenciadas o un conjunto acotado de respaldo"""
+        referenced: Set[str] = set(find_attached_images(chat_text))
+        selected = {name: info for name, info in image_members.items() if name in referenced}
+
+        if not selected and image_members:
+            candidates = [
+                (name, info) for name, info in image_members.items()
+                if info.file_size <= self.max_fallback_image_size
+            ]
+            candidates.sort(key=lambda item: item[1].file_size)
+            selected = dict(candidates[:self.fallback_images])
+
+        return selected
@@ -9,6 +9,20 @@ from typing import Optional
 import uuid
 import shutil
 
+# Tamaño de bloque usado al volcar subidas a disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class FileTooLargeError(Exception):
+    """Se lanza cuando un archivo supera el tamaño máximo permitido"""
+
+    def __init__(self, size: int, max_size: int):
+        self.size = size
+        self.max_size = max_size
+        super().__init__(
+            f"Archivo muy grande ({format_file_size(size)}, máximo {format_file_size(max_size)})"
+        )
+
 def create_temp_directory() -> Path:
     """Crea un directorio temporal único"""
     temp_dir = Path(tempfile.gettempdir()) / f"whatsapp_analysis_{uuid.uuid4()}"
@@ -29,6 +43,37 @@ def validate_file_size(file_size: int, max_size: int = 50 * 1024 * 1024) -> bool
     """Valida el tamaño de un archivo"""
     return file_size <= max_size
 
+async def save_upload_file(upload_file, destination: Path, max_size: int,
+                           chunk_size: int = UPLOAD_CHUNK_SIZE, hasher=None) -> int:
+    """
+    Copia un UploadFile a disco por bloques sin cargarlo completo en memoria.
+    Si el total supera max_size lanza FileTooLargeError y elimina la copia parcial.
+    El UploadFile ya está completo (Starlette lo vuelca antes de llamar al endpoint):
+    el límite durante la recepción lo aplica UploadSizeLimitMiddleware en main.py.
+    Si se pasa un hasher (p. ej. hashlib.sha256()) se actualiza con cada bloque.
+    Retorna el número de bytes escritos.
+    """
+    total = 0
+    try:
+        with open(destination, "wb") as f:
+            while True:
+                chunk = await upload_file.read(chunk_size)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_size:
+                    raise FileTooLargeError(total, max_size)
+                if hasher is not None:
+                    hasher.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        try:
+            os.unlink(destination)
+        except OSError:
+            pass
+        raise
+    return total
+
 def sanitize_filename(filename: str) -> str:
     """Sanitiza un nombre de archivo"""
     # Remover caracteres especiales y espacios
@@ -1,29 +1,111 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request
-from fastapi.responses import FileResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from fastapi.responses import FileResponse, PlainTextResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import tempfile
 import os
+import asyncio
+import hashlib
+import json
 import zipfile
-import re
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Tuple, Optional
+from functools import lru_cache
 
-from weasyprint import HTML, CSS
-import base64
-import re 
-from fastapi_docswhatsapp.services.whatsapp_processor import WhatsAppProcessor
 from fastapi_docswhatsapp.services.gemini_analyzer import GeminiAnalyzer
-from fastapi_docswhatsapp.services.report_generator import ReportGenerator
-from fastapi_docswhatsapp.services.supabase_client import SupabaseClient
+from fastapi_docswhatsapp.services.zip_extractor import ZipChatExtractor
+from fastapi_docswhatsapp.services.render_pool import RenderWorkerPool
+from fastapi_docswhatsapp.services.gemini_client import GeminiClient
+from fastapi_docswhatsapp.services.analyzer_backends import ANALYZER_BACKENDS, FakeAnalyzerBackend
+from fastapi_docswhatsapp.services.gemini_scheduler import GeminiScheduler
+from fastapi_docswhatsapp.services.gemini_cache import GeminiResponseCache, default_gemini_cache_path
+from fastapi_docswhatsapp.services.incremental_analysis import ChatSnapshotStore
+from fastapi_docswhatsapp.services.prompt_budget import PromptBudget
+from fastapi_docswhatsapp.services.chat_compactor import compact_chat
+from fastapi_docswhatsapp.services.pipeline_metrics import (
+    BYTES_PROCESSED, IMAGES_PER_INFORME, IMAGES_TOTAL, INFORMES_TOTAL, PROMETHEUS_CONTENT_TYPE,
+    render_metrics, stage_span, start_request_timings, track_scheduler,
+)
+from fastapi_docswhatsapp.services.image_optimizer import ImageOptimizer, default_image_cache_dir, prune_image_cache
+from fastapi_docswhatsapp.services.report_jobs import (
+    ReportJobManager, JobQueueFullError, ProgressCallback, SectionCallback
+)
+from fastapi_docswhatsapp.services.informe_renderer import find_image_evidence, get_relevant_images
 from fastapi_docswhatsapp.config.settings import get_settings
-from PIL import Image
-import io
+from fastapi_docswhatsapp.utils import FileTooLargeError, save_upload_file, format_file_size, cleanup_temp_directory
+
+settings = get_settings()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Crea los recursos compartidos al iniciar y los libera al apagar"""
+    app.state.render_pool = RenderWorkerPool(
+        max_workers=settings.render_workers,
+        max_tasks_per_child=settings.render_max_tasks_per_child,
+        image_workers=settings.image_workers or None,
+    )
+    app.state.render_pool.start()
+    await app.state.render_pool.warm_up()
+    # Un solo cliente y analizador de Gemini para toda la app: conexiones reutilizadas
+    app.state.gemini_client = create_analyzer_backend()
+    app.state.gemini_scheduler = GeminiScheduler(
+        max_concurrency=settings.gemini_max_concurrency,
+        requests_per_minute=settings.gemini_requests_per_minute,
+        tokens_per_minute=settings.gemini_tokens_per_minute,
+        max_retries=settings.gemini_max_retries,
+        retry_base_delay=settings.gemini_retry_base_delay,
+        retry_max_delay=settings.gemini_retry_max_delay,
+    )
+    track_scheduler(app.state.gemini_scheduler)
+    app.state.analyzer = GeminiAnalyzer(
+        settings.gemini_api_key, settings.gemini_model,
+        cache=get_gemini_cache(), snapshots=get_chat_snapshots(),
+        budget=PromptBudget(settings.max_analysis_tokens, settings.max_messages_to_analyze),
+        chunk_concurrency=settings.gemini_chunk_concurrency,
+        count_tokens=settings.gemini_count_tokens,
+        client=app.state.gemini_client,
+        scheduler=app.state.gemini_scheduler,
+        streaming=settings.gemini_streaming,
+    )
+    # El precalentamiento no bloquea el arranque si la red es lenta
+    warm_up_task = None
+    if settings.gemini_warmup:
+        warm_up_task = asyncio.create_task(app.state.gemini_client.warm_up())
+    app.state.job_manager = ReportJobManager(
+        procesar_informe,
+        workers=settings.job_workers,
+        max_queue_size=settings.job_queue_size,
+        result_ttl=settings.job_result_ttl,
+    )
+    app.state.job_manager.start()
+    try:
+        yield
+    finally:
+        if warm_up_task is not None and not warm_up_task.done():
+            warm_up_task.cancel()
+        await app.state.job_manager.shutdown()
+        app.state.render_pool.shutdown()
+
+def create_analyzer_backend():
+    """Backend del análisis según settings.analyzer_backend"""
+    if settings.analyzer_backend == "gemini":
+        return GeminiClient(settings.gemini_api_key, settings.gemini_model, transport=settings.gemini_transport)
+    if settings.analyzer_backend == "fake":
+        print(f"⚠️ Usando el backend de análisis simulado (latencia ~{settings.fake_analyzer_latency_ms:.0f} ms)")
+        return FakeAnalyzerBackend(
+            latency_ms=settings.fake_analyzer_latency_ms,
+            latency_sigma=settings.fake_analyzer_latency_sigma,
+            seed=settings.fake_analyzer_seed,
+        )
+    raise ValueError(
+        f"analyzer_backend desconocido: {settings.analyzer_backend} (opciones: {', '.join(ANALYZER_BACKENDS)})"
+    )
 
 app = FastAPI(
     title="WhatsApp Bitácora Generator",
     description="Genera informes de bitácora profesionales desde chats de WhatsApp usando Gemini AI y WeasyPrint",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS siguiendo documentación oficial FastAPI
@@ -36,7 +118,57 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-settings = get_settings()
+# Endpoints que reciben el ZIP exportado de WhatsApp
+UPLOAD_PATHS = {"/crear-informe-final", "/informes"}
+
+# Margen para las cabeceras multipart que acompañan al archivo en el cuerpo
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """
+    Limita el tamaño de las subidas del ZIP. Rechaza con 413 según Content-Length antes
+    de leer el cuerpo y, si la cabecera falta (transferencia por bloques), cuenta los
+    bytes a medida que llegan y corta la lectura en cuanto superan el límite, antes de
+    que Starlette termine de volcar el multipart a disco.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.max_file_size + MULTIPART_OVERHEAD
+        detail = f"Archivo ZIP muy grande (máximo {format_file_size(settings.max_file_size)})"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Agrega la cabecera Server-Timing con la duración de cada etapa de la solicitud"""
+    timings = start_request_timings()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = timings.server_timing()
+    return response
 
 @app.get("/")
 async def root():
@@ -63,7 +195,7 @@ async def test_cors():
 
 
 @app.post("/crear-informe-final", response_class=FileResponse)
-async def crear_informe_final(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def crear_informe_final(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Genera un informe de bitácora profesional transformando el chat de WhatsApp usando Gemini AI.
     Convierte las conversaciones en un documento estructurado tipo informe final de proyecto.
@@ -80,82 +212,15 @@ async def crear_informe_final(background_tasks: BackgroundTasks, file: UploadFil
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Guardar archivo ZIP subido
+            # Guardar archivo ZIP subido por bloques, sin cargarlo completo en memoria
             zip_path = temp_path / file.filename
-            content = await file.read()
-            
-            # Verificar tamaño del archivo para evitar procesar archivos muy grandes
-            if len(content) > 500 * 1024 * 1024:  # Aumentado a 500MB límite
-                raise HTTPException(status_code=413, detail="Archivo ZIP muy grande (máximo 500MB)")
-            
-            with open(zip_path, "wb") as f:
-                f.write(content)
-            
-            # Extraer todos los archivos del ZIP
-            extract_path = temp_path / "extracted"
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_path)
-            
-            # Obtener texto del chat e imágenes
-            chat_text, image_files = extract_chat_and_images(extract_path)
-            
-            if not chat_text:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No se encontró archivo de chat de WhatsApp en el ZIP"
-                )
-            
-            print(f"Generando informe de bitácora con {len(image_files)} imágenes...")
-            print(f"Longitud del chat: {len(chat_text)} caracteres")
-            
-            # Optimizar imágenes para reducir tamaño del PDF y tiempo de procesamiento
-            if image_files:
-                print(f"=== Optimizando {len(image_files)} imágenes ===")
-                optimized_count = 0
-                for filename, img_path in image_files.items():
-                    try:
-                        original_size = img_path.stat().st_size
-                        # Solo redimensionar si la imagen es mayor a 500KB o muy ancha
-                        if original_size > 500_000 or should_resize_image(img_path):
-                            resized_data = resize_image_optimized(img_path, max_width=800, quality=85)
-                            with open(img_path, "wb") as f:
-                                f.write(resized_data)
-                            new_size = len(resized_data)
-                            optimized_count += 1
-                            print(f"  📷 {filename}: {original_size//1024}KB → {new_size//1024}KB")
-                    except Exception as e:
-                        print(f"  ⚠️ Error optimizando {filename}: {e}")
-                print(f"=== {optimized_count}/{len(image_files)} imágenes optimizadas ===")
-            
-            # Analizar el chat con Gemini para crear informe de bitácora
-            # Limitar el texto del chat para reducir tokens y tiempo de procesamiento
-            max_chat_length = 100000  # Aumentado de 100000 para mejor contexto
-            chat_for_analysis = chat_text[:max_chat_length] if len(chat_text) > max_chat_length else chat_text
-            
-            print(f"Enviando {len(chat_for_analysis)} caracteres a Gemini para análisis...")
-            analyzer = GeminiAnalyzer(settings.gemini_api_key, settings.gemini_model)
-            informe_data = await analyzer.generate_project_report(chat_for_analysis)
-            
-            # Debug: Mostrar qué datos recibimos de Gemini
-            print("=== DEBUG: Datos del informe ===")
-            print(f"Título: {informe_data.get('titulo_proyecto', 'N/A')}")
-            print(f"Resumen (primeros 200 chars): {str(informe_data.get('resumen_ejecutivo', 'N/A'))[:200]}...")
-            print(f"Objetivos: {len(informe_data.get('objetivos', []))} items")
-            print(f"Actividades: {len(informe_data.get('actividades_realizadas', []))} items")
-            print("=== FIN DEBUG ===")
-            
-            # Generar HTML del informe con imágenes
-            print("=== Generando HTML del informe ===")
-            # Pasar solo las imágenes necesarias para evitar procesamiento innecesario
-            relevant_image_files = get_relevant_images(chat_text, image_files)
-            print(f"Usando {len(relevant_image_files)} de {len(image_files)} imágenes en el informe")
+            try:
+                with stage_span("guardar_zip"):
+                    await save_upload_file(file, zip_path, settings.max_file_size)
+            except FileTooLargeError as e:
+                raise HTTPException(status_code=413, detail=f"Archivo ZIP muy grande: {e}")
             
-            html_content = generate_informe_html(informe_data, chat_text, relevant_image_files)
-            print("=== Convirtiendo HTML a PDF ===")
-
-            # Convertir HTML a PDF usando WeasyPrint
-            HTML(string=html_content).write_pdf(temp_pdf_path)
-            print("=== PDF  Finalizado===")
+            total_images = await procesar_informe(zip_path, temp_path, Path(temp_pdf_path))
 
         # Programar limpieza del archivo temporal
         def cleanup_temp_file():
@@ -176,11 +241,18 @@ async def crear_informe_final(background_tasks: BackgroundTasks, file: UploadFil
             filename=f"bitacora_proyecto_{file.filename.replace('.zip', '.pdf')}",
             headers={
                 "Content-Description": "Informe de bitácora del proyecto generado por Gemini AI",
-                "X-Total-Images": str(len(image_files)),
+                "X-Total-Images": str(total_images),
                 "X-AI-Processed": "true"
             }
         )
     
+    except HTTPException:
+        # Errores de validación (400/413) se propagan tal cual
+        try:
+            os.unlink(temp_pdf_path)
+        except OSError:
+            pass
+        raise
     except Exception as e:
         # Limpiar archivo temporal en caso de error
         try:
@@ -189,465 +261,276 @@ async def crear_informe_final(background_tasks: BackgroundTasks, file: UploadFil
             pass
         raise HTTPException(status_code=500, detail=f"Error generando informe de bitácora: {str(e)}")
 
-def generate_informe_html(informe_data: Dict[str, Any], chat_text: str, image_files: Dict[str, Path]) -> str:
-    """
-    Genera HTML del informe de bitácora profesional con imágenes integradas.
+@app.post("/informes", status_code=202)
+async def crear_informe_job(request: Request, file: UploadFile = File(...)):
     """
-    # CSS para el estilo profesional del informe
-    css_style = """
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.8;
-            margin: 0;
-            padding: 40px;
-            color: #2c3e50;
-            background-color: #fff;
-        }
-        .report-header {
-            text-align: center;
-            margin-bottom: 50px;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 30px;
-        }
-        .report-title {
-            color: #2c3e50;
-            font-size: 28px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        }
-        .report-subtitle {
-            color: #7f8c8d;
-            font-size: 16px;
-            margin-bottom: 20px;
-        }
-        .section {
-            margin-bottom: 40px;
-            page-break-inside: avoid;
-        }
-        .section-title {
-            color: #2980b9;
-            font-size: 20px;
-            font-weight: bold;
-            margin-bottom: 15px;
-            border-left: 4px solid #3498db;
-            padding-left: 15px;
-            background-color: #f8f9fa;
-            padding: 10px 15px;
-        }
-        .section-content {
-            margin-left: 20px;
-            text-align: justify;
-        }
-        .activity-item {
-            background-color: #f8f9fa;
-            border: 1px solid #e9ecef;
-            border-radius: 8px;
-            padding: 15px;
-            margin-bottom: 15px;
-        }
-        .activity-date {
-            color: #3498db;
-            font-weight: bold;
-            font-size: 14px;
-        }
-        .activity-description {
-            margin: 8px 0;
-        }
-        .activity-responsible {
-            color: #7f8c8d;
-            font-style: italic;
-            font-size: 14px;
-        }
-        .list-item {
-            background-color: #fff;
-            border-left: 3px solid #27ae60;
-            padding: 10px 15px;
-            margin-bottom: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        .report-image {
-            max-width: 400px;
-            height: auto;
-            border: 2px solid #bdc3c7;
-            border-radius: 8px;
-            margin: 20px auto;
-            display: block;
-            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        }
-        .image-caption {
-            text-align: center;
-            font-style: italic;
-            color: #7f8c8d;
-            margin-top: 10px;
-            font-size: 14px;
-        }
-        .footer {
-            margin-top: 50px;
-            padding-top: 20px;
-            border-top: 2px solid #ecf0f1;
-            text-align: center;
-            color: #7f8c8d;
-            font-size: 12px;
-        }
-        ul {
-            padding-left: 0;
-        }
-        li {
-            list-style: none;
-        }
-        @page {
-            margin: 2cm;
-        }
-    </style>
+    Encola la generación del informe y retorna de inmediato el id del trabajo.
+    El estado se consulta en /informes/{job_id} y el PDF en /informes/{job_id}/resultado.
     """
+    if not file.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="El archivo debe ser un ZIP")
     
-    # Función auxiliar para escapar HTML
-    def escape_html(text):
-        return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-    
-    # Función para insertar imágenes del chat en el informe
-    def insert_images_from_chat():
-        images_html = []
-        processed_images = set()  # Evitar duplicados
-        
-        # Buscar imágenes en el chat original y añadirlas como evidencia
-        lines = chat_text.split('\n')
-        attachment_patterns = [
-            re.compile(r'<attached:\s*([^>]+\.(jpg|jpeg|png|gif|bmp|webp))>', re.IGNORECASE),
-            re.compile(r'‎<attached:\s*([^>]+\.(jpg|jpeg|png|gif|bmp|webp))>', re.IGNORECASE),
-        ]
-        
-        for line in lines:
-            line = line.strip().lstrip('\u200e')
-            for pattern in attachment_patterns:
-                match = pattern.search(line)
-                if match:
-                    image_filename = match.group(1)
-                    
-                    # Evitar duplicados
-                    if image_filename in processed_images:
-                        continue
-                    processed_images.add(image_filename)
-                    
-                    if image_filename in image_files:
-                        try:
-                            img_path = image_files[image_filename]
-                            # Las imágenes ya están optimizadas, solo leer y codificar
-                            with open(img_path, 'rb') as img_file:
-                                img_data = img_file.read()
-                                img_base64 = base64.b64encode(img_data).decode('utf-8')
-                            
-                            img_ext = img_path.suffix.lower()
-                            mime_type = {
-                                '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
-                                '.png': 'image/png', '.gif': 'image/gif',
-                                '.bmp': 'image/bmp', '.webp': 'image/webp'
-                            }.get(img_ext, 'image/jpeg')
-                            
-                            # Extraer contexto del mensaje donde aparece la imagen
-                            message_context = ""
-                            try:
-                                # Buscar el timestamp y usuario de este mensaje
-                                timestamp_match = re.search(r'\[(\d{1,2}/\d{1,2}/\d{2,4}),?\s+(\d{1,2}:\d{2}).*?\]\s*([^:]+):', line)
-                                if timestamp_match:
-                                    date_part, time_part, sender = timestamp_match.groups()
-                                    message_context = f"Enviada el {date_part} a las {time_part} por {sender.strip()}"
-                            except:
-                                pass
-                            
-                            images_html.append(f'''
-                                <div style="margin-bottom: 30px; text-align: center;">
-                                    <img src="data:{mime_type};base64,{img_base64}" 
-                                         alt="{escape_html(image_filename)}" class="report-image">
-                                    <div class="image-caption">
-                                        <strong>📷 {escape_html(image_filename)}</strong><br>
-                                        {escape_html(message_context) if message_context else "Imagen del proyecto"}
-                                    </div>
-                                </div>
-                            ''')
-                        except Exception as e:
-                            # Si hay error, al menos mostrar referencia
-                            images_html.append(f'''
-                                <div class="activity-item" style="text-align: center;">
-                                    <p>📷 <strong>{escape_html(image_filename)}</strong></p>
-                                    <p><em>Error cargando imagen: {str(e)[:100]}</em></p>
-                                </div>
-                            ''')
-        
-        # Si no hay imágenes en el texto pero sí archivos de imagen, incluirlos
-        if not images_html and image_files:
-            # Limitar a 3 imágenes más pequeñas para evitar PDFs muy pesados
-            sorted_images = sorted(image_files.items(), key=lambda x: x[1].stat().st_size)[:3]
-            for filename, img_path in sorted_images:
-                try:
-                    # Verificar tamaño antes de procesar
-                    if img_path.stat().st_size > 2_000_000:  # Skip images > 2MB
-                        continue
-                    with open(img_path, 'rb') as img_file:
-                        img_data = img_file.read()
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-                    
-                    img_ext = img_path.suffix.lower()
-                    mime_type = {
-                        '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
-                        '.png': 'image/png', '.gif': 'image/gif',
-                        '.bmp': 'image/bmp', '.webp': 'image/webp'
-                    }.get(img_ext, 'image/jpeg')
-                    
-                    images_html.append(f'''
-                        <div style="margin-bottom: 30px; text-align: center;">
-                            <img src="data:{mime_type};base64,{img_base64}" 
-                                 alt="{escape_html(filename)}" class="report-image">
-                            <div class="image-caption">
-                                <strong>📷 {escape_html(filename)}</strong><br>
-                                <em>Archivo adjunto del proyecto</em>
-                            </div>
-                        </div>
-                    ''')
-                except Exception:
-                    continue
-        
-        return '\n'.join(images_html)
-    
-    # Iniciar HTML del informe
-    html_parts = [
-        '<!DOCTYPE html>',
-        '<html lang="es">',
-        '<head>',
-        '<meta charset="utf-8">',
-        f'<title>{informe_data.get("titulo_proyecto", "Informe de Bitácora")}</title>',
-        css_style,
-        '</head>',
-        '<body>',
-        
-        # Header del informe
-        '<div class="report-header">',
-        f'<h1 class="report-title">📋 {escape_html(informe_data.get("titulo_proyecto", "Informe de Bitácora del Proyecto"))}</h1>',
-        f'<div class="report-subtitle">Fecha: {datetime.now().strftime("%d de %B de %Y")}</div>',
-        '</div>',
-        
-        # Resumen Ejecutivo
-        '<div class="section">',
-        '<h2 class="section-title">📊 Resumen Ejecutivo</h2>',
-        '<div class="section-content">',
-        f'<p>{escape_html(informe_data.get("resumen_ejecutivo", "No disponible"))}</p>',
-        '</div>',
-        '</div>'
-    ]
-    
-    # Objetivos
-    objetivos = informe_data.get("objetivos", [])
-    if objetivos:
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">🎯 Objetivos del Proyecto</h2>',
-            '<div class="section-content">',
-            '<ul>'
-        ])
-        for objetivo in objetivos:
-            if objetivo and str(objetivo).strip():  # Asegurar que no esté vacío
-                html_parts.append(f'<li class="list-item">• {escape_html(str(objetivo))}</li>')
-        html_parts.extend(['</ul>', '</div>', '</div>'])
-    else:
-        # Mostrar sección con contenido por defecto si no hay objetivos
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">🎯 Objetivos del Proyecto</h2>',
-            '<div class="section-content">',
-            '<div class="activity-item">',
-            '<p><em>Los objetivos específicos del proyecto se pueden inferir del análisis del chat de WhatsApp adjunto.</em></p>',
-            '</div>',
-            '</div>', '</div>'
-        ])
+    job_manager: ReportJobManager = request.app.state.job_manager
+    job_dir = job_manager.new_job_dir()
+    zip_path = job_dir / "chat.zip"
+    hasher = hashlib.sha256()
+    submitted = False
+    try:
+        with stage_span("guardar_zip"):
+            await save_upload_file(file, zip_path, settings.max_file_size, hasher=hasher)
+        job = job_manager.submit(job_dir, zip_path, file.filename, content_hash=hasher.hexdigest())
+        submitted = True
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=f"Archivo ZIP muy grande: {e}")
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    finally:
+        # Cualquier falla antes de encolar (incluida la desconexión del cliente) deja el directorio huérfano
+        if not submitted:
+            cleanup_temp_directory(job_dir)
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/informes/{job.id}",
+        "result_url": f"/informes/{job.id}/resultado"
+    }
+
+@app.get("/informes/{job_id}")
+async def estado_informe_job(job_id: str, request: Request):
+    """Estado, etapa actual y progreso de un trabajo de informe"""
+    job = request.app.state.job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    return job.model_dump(exclude={"content_hash"})
+
+@app.get("/informes/{job_id}/eventos")
+async def eventos_informe_job(job_id: str, request: Request):
+    """
+    Eventos del trabajo (server-sent events): "progreso" en cada etapa, "seccion" cuando
+    Gemini termina cada sección del informe, y "completado" o "error" al final.
+    """
+    job_manager: ReportJobManager = request.app.state.job_manager
+    if not job_manager.get(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
     
-    # Actividades Realizadas
-    actividades = informe_data.get("actividades_realizadas", [])
-    if actividades:
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">⚡ Actividades Realizadas</h2>',
-            '<div class="section-content">'
-        ])
-        for actividad in actividades:
-            if isinstance(actividad, dict):
-                fecha = escape_html(actividad.get("fecha", "Fecha no especificada"))
-                descripcion = escape_html(actividad.get("descripcion", "Descripción no disponible"))
-                responsable = escape_html(actividad.get("responsable", "Responsable no especificado"))
-                
-                html_parts.append(f'''
-                    <div class="activity-item">
-                        <div class="activity-date">📅 {fecha}</div>
-                        <div class="activity-description">{descripcion}</div>
-                        <div class="activity-responsible">👤 Responsable: {responsable}</div>
-                    </div>
-                ''')
-            else:
-                actividad_str = str(actividad).strip()
-                if actividad_str:
-                    html_parts.append(f'<div class="activity-item"><div class="activity-description">{escape_html(actividad_str)}</div></div>')
-        html_parts.extend(['</div>', '</div>'])
-    else:
-        # Mostrar mensaje informativo cuando no hay actividades específicas
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">⚡ Actividades Realizadas</h2>',
-            '<div class="section-content">',
-            '<div class="activity-item">',
-            '<p><em>Las actividades específicas del proyecto pueden ser identificadas revisando el chat de WhatsApp completo.</em></p>',
-            '<p>💬 <strong>Resumen del chat:</strong> El archivo contiene la comunicación del equipo durante el desarrollo del proyecto.</p>',
-            '</div>',
-            '</div>', '</div>'
-        ])
+    async def event_stream():
+        async for event in job_manager.stream_events(job_id):
+            data = json.dumps(event["data"], ensure_ascii=False, default=str)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
     
-    # Resultados y Logros
-    if informe_data.get("resultados_logros"):
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">🏆 Resultados y Logros</h2>',
-            '<div class="section-content">',
-            '<ul>'
-        ])
-        for resultado in informe_data["resultados_logros"]:
-            html_parts.append(f'<li class="list-item">✅ {escape_html(resultado)}</li>')
-        html_parts.extend(['</ul>', '</div>', '</div>'])
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/informes/{job_id}/resultado", response_class=FileResponse)
+async def resultado_informe_job(job_id: str, request: Request):
+    """Descarga el PDF de un trabajo terminado"""
+    job_manager: ReportJobManager = request.app.state.job_manager
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=f"Error generando informe de bitácora: {job.error}")
     
-    # Evidencias Fotográficas (si hay imágenes)
-    if image_files:
-        images_html = insert_images_from_chat()
-        if images_html:
-            html_parts.extend([
-                '<div class="section">',
-                '<h2 class="section-title">📸 Evidencias Fotográficas</h2>',
-                '<div class="section-content">',
-                images_html,
-                '</div>',
-                '</div>'
-            ])
+    pdf_path = job_manager.result_path(job_id)
+    if pdf_path is None:
+        raise HTTPException(status_code=409, detail=f"El informe aún no está listo (etapa: {job.stage}, {job.progress}%)")
     
-    # Desafíos y Obstáculos
-    if informe_data.get("desafios_obstaculos"):
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">⚠️ Desafíos y Obstáculos</h2>',
-            '<div class="section-content">',
-            '<ul>'
-        ])
-        for desafio in informe_data["desafios_obstaculos"]:
-            html_parts.append(f'<li class="list-item">⚡ {escape_html(desafio)}</li>')
-        html_parts.extend(['</ul>', '</div>', '</div>'])
+    return FileResponse(
+        pdf_path,
+        media_type='application/pdf',
+        filename=f"bitacora_proyecto_{job.filename.replace('.zip', '.pdf')}",
+        headers={
+            "Content-Description": "Informe de bitácora del proyecto generado por Gemini AI",
+            "X-Total-Images": str(job.total_images),
+            "X-AI-Processed": "true"
+        }
+    )
+
+async def procesar_informe(zip_path: Path, work_dir: Path, pdf_path: Path,
+                           progress: Optional[ProgressCallback] = None,
+                           on_section: Optional[SectionCallback] = None) -> int:
+    """
+    Genera el PDF del informe a partir del ZIP ya guardado en disco.
+    Usado tanto por /crear-informe-final como por los trabajos de /informes.
+    on_section recibe cada sección del informe a medida que Gemini la genera.
+    Retorna el número de imágenes encontradas.
+    """
+    try:
+        total_images = await _procesar_informe(zip_path, work_dir, pdf_path, progress, on_section)
+    except Exception:
+        INFORMES_TOTAL.inc(resultado="error")
+        raise
+    INFORMES_TOTAL.inc(resultado="ok")
+    return total_images
+
+async def _procesar_informe(zip_path: Path, work_dir: Path, pdf_path: Path,
+                            progress: Optional[ProgressCallback],
+                            on_section: Optional[SectionCallback]) -> int:
+    progress = progress or (lambda stage, percent: None)
     
-    # Lecciones Aprendidas
-    if informe_data.get("lecciones_aprendidas"):
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">💡 Lecciones Aprendidas</h2>',
-            '<div class="section-content">',
-            '<ul>'
-        ])
-        for leccion in informe_data["lecciones_aprendidas"]:
-            html_parts.append(f'<li class="list-item">📚 {escape_html(leccion)}</li>')
-        html_parts.extend(['</ul>', '</div>', '</div>'])
+    # Extraer del ZIP el chat y las imágenes
+    progress("extrayendo", 5)
+    extract_path = work_dir / "extracted"
+    with stage_span("extraer_zip"):
+        chat_text, image_files = await asyncio.to_thread(extract_zip, zip_path, extract_path)
+    BYTES_PROCESSED.inc(zip_path.stat().st_size, tipo="zip")
+    BYTES_PROCESSED.inc(sum(path.stat().st_size for path in image_files.values()), tipo="imagenes")
+    IMAGES_PER_INFORME.observe(len(image_files))
+    IMAGES_TOTAL.inc(len(image_files), tipo="extraidas")
     
-    # Conclusiones
-    if informe_data.get("conclusiones"):
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">📋 Conclusiones</h2>',
-            '<div class="section-content">',
-            f'<p>{escape_html(informe_data["conclusiones"])}</p>',
-            '</div>',
-            '</div>'
-        ])
+    if not chat_text:
+        raise HTTPException(
+            status_code=400,
+            detail="No se encontró archivo de chat de WhatsApp en el ZIP"
+        )
     
-    # Recomendaciones
-    if informe_data.get("recomendaciones"):
-        html_parts.extend([
-            '<div class="section">',
-            '<h2 class="section-title">💼 Recomendaciones</h2>',
-            '<div class="section-content">',
-            '<ul>'
-        ])
-        for recomendacion in informe_data["recomendaciones"]:
-            html_parts.append(f'<li class="list-item">➡️ {escape_html(recomendacion)}</li>')
-        html_parts.extend(['</ul>', '</div>', '</div>'])
+    print(f"Generando informe de bitácora con {len(image_files)} imágenes...")
+    print(f"Longitud del chat: {len(chat_text)} caracteres")
     
-    # Footer
-    html_parts.extend([
-        '<div class="footer">',
-        f'<p>📊 Total de imágenes procesadas: {len(image_files)}</p>',
-        '<p>🤖 Informe generado automáticamente con Inteligencia Artificial (Gemini) + FastAPI + WeasyPrint</p>',
-        f'<p>Fecha de generación: {datetime.now().strftime("%d/%m/%Y a las %H:%M:%S")}</p>',
-        '</div>',
-        '</body>',
-        '</html>'
-    ])
+    # Gemini recibe el chat compactado; las imágenes se relacionan con el chat original
+    analysis_text = chat_text
+    if settings.chat_compaction_enabled:
+        with stage_span("compactar_chat"):
+            compacted = await asyncio.to_thread(compact_chat, chat_text)
+        if compacted.text:
+            analysis_text = compacted.text
+            print(f"Chat compactado: {compacted.original_tokens} → {compacted.compact_tokens} tokens estimados "
+                  f"({compacted.saved_tokens} ahorrados, {compacted.saved_ratio:.0%}; "
+                  f"{compacted.dropped_lines} mensajes sin contenido descartados)")
     
-    return '\n'.join(html_parts)
+    # Gemini y la preparación de imágenes corren en paralelo; el render va al pool de procesos
+    await run_informe_pipeline(
+        chat_text, image_files, app.state.analyzer,
+        app.state.render_pool, work_dir, pdf_path, progress, on_section,
+        analysis_text=analysis_text
+    )
+    return len(image_files)
 
-def get_relevant_images(chat_text: str, image_files: Dict[str, Path]) -> Dict[str, Path]:
-    """Filtra solo las imágenes que están mencionadas en el chat para optimizar procesamiento"""
-    relevant_images = {}
+def extract_zip(zip_path: Path, extract_path: Path) -> Tuple[str, Dict[str, Path]]:
+    """Extrae del ZIP el chat y las imágenes según Settings.zip_extraction_mode"""
+    if settings.zip_extraction_mode == "full":
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(extract_path)
+        return extract_chat_and_images(extract_path)
     
-    # Patrones para buscar referencias a imágenes en el chat
-    attachment_patterns = [
-        re.compile(r'<attached:\s*([^>]+\.(jpg|jpeg|png|gif|bmp|webp))>', re.IGNORECASE),
-        re.compile(r'‎<attached:\s*([^>]+\.(jpg|jpeg|png|gif|bmp|webp))>', re.IGNORECASE),
-    ]
+    # Solo se descomprimen el chat y las imágenes que referencia
+    extractor = ZipChatExtractor(zip_path, fallback_images=settings.fallback_images_limit)
+    return extractor.extract(extract_path)
+
+@lru_cache()
+def get_gemini_cache() -> Optional[GeminiResponseCache]:
+    """Cache persistente de informes de Gemini configurado desde Settings (cached)"""
+    if not settings.gemini_cache_enabled:
+        return None
+    db_path = Path(settings.gemini_cache_path) if settings.gemini_cache_path else default_gemini_cache_path()
+    return GeminiResponseCache(
+        db_path,
+        ttl_seconds=settings.gemini_cache_ttl,
+        max_entries=settings.gemini_cache_max_entries,
+    )
+
+@lru_cache()
+def get_chat_snapshots() -> Optional[ChatSnapshotStore]:
+    """Almacén de análisis previos para el análisis incremental (cached)"""
+    if not settings.incremental_analysis_enabled:
+        return None
+    db_path = Path(settings.gemini_cache_path) if settings.gemini_cache_path else default_gemini_cache_path()
+    return ChatSnapshotStore(
+        db_path,
+        ttl_seconds=settings.incremental_snapshot_ttl,
+        max_entries=settings.gemini_cache_max_entries,
+    )
+
+@lru_cache()
+def get_image_optimizer() -> ImageOptimizer:
+    """Optimizador de imágenes configurado desde Settings (cached)"""
+    cache_dir = None
+    if settings.image_cache_max_mb > 0:
+        cache_dir = Path(settings.image_cache_dir) if settings.image_cache_dir else default_image_cache_dir()
+    return ImageOptimizer(
+        cache_dir=cache_dir,
+        max_width=settings.image_max_width,
+        max_height=settings.image_max_height,
+        quality=settings.image_quality,
+        engine=settings.image_engine,
+    )
+
+async def run_informe_pipeline(chat_text: str, image_files: Dict[str, Path], analyzer: GeminiAnalyzer,
+                               render_pool: RenderWorkerPool, work_dir: Path, pdf_path: Path,
+                               progress: Optional[ProgressCallback] = None,
+                               on_section: Optional[SectionCallback] = None,
+                               analysis_text: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Path]]:
+    """
+    Ejecuta el análisis con Gemini y la preparación de imágenes en paralelo y
+    renderiza el PDF del informe en pdf_path.
+
+    La petición a Gemini (la etapa más larga, limitada por red) se lanza en cuanto
+    el texto del chat está disponible; mientras está pendiente se optimizan las
+    imágenes y se arma el HTML de evidencias. Ambas ramas se unen antes de
+    componer el HTML final, de modo que la latencia total se acerca a la de la
+    etapa más lenta en vez de a la suma de todas. El trabajo de CPU (imágenes y
+    WeasyPrint) se ejecuta en el pool de procesos para no bloquear el event loop.
+
+    analysis_text es el texto que se envía a Gemini (p. ej. el chat compactado);
+    por defecto, el chat completo.
     
-    # Buscar imágenes mencionadas en el chat
-    for line in chat_text.split('\n'):
-        for pattern in attachment_patterns:
-            match = pattern.search(line)
-            if match:
-                image_filename = match.group(1)
-                if image_filename in image_files:
-                    relevant_images[image_filename] = image_files[image_filename]
+    Retorna (informe_data, relevant_image_files).
+    """
+    progress = progress or (lambda stage, percent: None)
     
-    # Si no se encontraron imágenes mencionadas, incluir las 3 más pequeñas
-    if not relevant_images and image_files:
-        sorted_images = sorted(image_files.items(), key=lambda x: x[1].stat().st_size)[:3]
-        relevant_images = dict(sorted_images)
+    # El analizador recibe el chat completo (compactado de forma estable por prefijo)
+    # para poder reconocer exportaciones que extienden un chat ya analizado
+    analysis_text = analysis_text or chat_text
+    print(f"Enviando chat de {len(analysis_text)} caracteres a Gemini para análisis...")
+    analysis_task = asyncio.create_task(analyzer.generate_project_report(analysis_text, on_section=on_section))
     
-    return relevant_images
-
-def should_resize_image(img_path, max_width=800):
-    """Verifica si una imagen necesita ser redimensionada sin cargarla completamente"""
     try:
-        with Image.open(img_path) as img:
-            return img.width > max_width or img.height > 1200
-    except Exception:
-        return False
-
-def resize_image_optimized(img_path, max_width=800, quality=85):
-    """Redimensiona y optimiza imagen con control de calidad"""
-    with Image.open(img_path) as img:
-        # Convertir a RGB si es necesario (para JPEG)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        
-        # Redimensionar si es necesario
-        if img.width > max_width or img.height > 1200:
-            # Calcular nuevas dimensiones manteniendo aspecto
-            ratio = min(max_width / img.width, 1200 / img.height)
-            new_width = int(img.width * ratio)
-            new_height = int(img.height * ratio)
-            img = img.resize((new_width, new_height), Image.LANCZOS)
+        # Rama de imágenes: optimizar y preparar evidencias mientras Gemini responde
+        progress("optimizando_imagenes", 15)
+        with stage_span("optimizar_imagenes"):
+            await render_pool.optimize_images(image_files, get_image_optimizer())
+        if settings.image_cache_max_mb > 0:
+            await asyncio.to_thread(
+                prune_image_cache, get_image_optimizer().cache_dir, settings.image_cache_max_mb * 1024 * 1024
+            )
         
-        # Guardar optimizado
-        buf = io.BytesIO()
-        img_format = 'JPEG' if img_path.suffix.lower() in ['.jpg', '.jpeg'] else img.format
+        # Pasar solo las imágenes necesarias para evitar procesamiento innecesario.
+        # Al worker solo viaja la lista de imágenes del chat, no el texto completo
+        with stage_span("parsear_chat"):
+            relevant_image_files = await asyncio.to_thread(get_relevant_images, chat_text, image_files)
+            evidence = await asyncio.to_thread(find_image_evidence, chat_text)
+        print(f"Usando {len(relevant_image_files)} de {len(image_files)} imágenes en el informe")
+        IMAGES_TOTAL.inc(len(relevant_image_files), tipo="en_informe")
+        with stage_span("evidencias_html"):
+            images_html_path = await render_pool.build_images_section(
+                evidence, relevant_image_files, work_dir / "evidencias.html"
+            )
         
-        if img_format == 'JPEG':
-            img.save(buf, format='JPEG', quality=quality, optimize=True)
-        else:
-            img.save(buf, format=img_format, optimize=True)
-        
-        return buf.getvalue()
-
-# Función de compatibilidad (mantener para no romper código existente)
-def resize_image(img_path, max_width=800):
-    return resize_image_optimized(img_path, max_width)
+        progress("analizando_chat", 40)
+        informe_data = await analysis_task
+    finally:
+        if not analysis_task.done():
+            analysis_task.cancel()
+    
+    # Debug: Mostrar qué datos recibimos de Gemini
+    print("=== DEBUG: Datos del informe ===")
+    print(f"Título: {informe_data.get('titulo_proyecto', 'N/A')}")
+    print(f"Resumen (primeros 200 chars): {str(informe_data.get('resumen_ejecutivo', 'N/A'))[:200]}...")
+    print(f"Objetivos: {len(informe_data.get('objetivos', []))} items")
+    print(f"Actividades: {len(informe_data.get('actividades_realizadas', []))} items")
+    print("=== FIN DEBUG ===")
+    
+    print("=== Generando HTML y PDF del informe ===")
+    progress("renderizando_pdf", 80)
+    await render_pool.render_informe_pdf(
+        informe_data, relevant_image_files, images_html_path, pdf_path
+    )
+    print("=== PDF  Finalizado===")
+    return informe_data, relevant_image_files
 
 def extract_chat_and_images(extract_path: Path) -> Tuple[str, Dict[str, Path]]:
     """
@@ -694,6 +577,27 @@ def extract_chat_and_images(extract_path: Path) -> Tuple[str, Dict[str, Path]]:
 
 
 
+@app.get("/gemini-cache/stats")
+async def gemini_cache_stats():
+    """Aciertos, fallos y tamaño del cache de respuestas de Gemini"""
+    cache = get_gemini_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(cache.stats)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas en formato Prometheus: duración por etapa, imágenes, bytes, tokens de Gemini
+    y estado del planificador de Gemini (cola, llamadas en curso, reintentos)
+    """
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/gemini-scheduler/stats")
+async def gemini_scheduler_stats():
+    """Profundidad de la cola, llamadas en curso y reintentos del planificador de Gemini"""
+    return app.state.gemini_scheduler.stats()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "whatsapp-analyzer"}
\ No newline at end of file
@@ -0,0 +1,86 @@
+import pytest
+
+from fastapi_docswhatsapp.services.chat_chunker import chunk_chat, message_date, split_chat_messages
+
+
+def android_chat(days: int, per_day: int) -> str:
+    lines = []
+    for day in range(1, days + 1):
+        for i in range(per_day):
+            lines.append(f"{day:02d}/03/24, 10:{i:02d} - Ana: mensaje {i} del día {day}")
+            if i % 3 == 0:
+                lines.append("línea de continuación")
+    return "\n".join(lines)
+
+
+def compact_chat_text(days: int, per_day: int) -> str:
+    lines = []
+    for day in range(1, days + 1):
+        lines.append(f"== {day}/03/24 ==")
+        lines.extend(f"10:{i:02d} Ana: mensaje {i}" for i in range(per_day))
+    return "\n".join(lines)
+
+
+def test_split_chat_messages_keeps_continuation_lines():
+    messages = split_chat_messages(android_chat(1, 4))
+    assert len(messages) == 4
+    assert messages[0].endswith("\nlínea de continuación")
+
+
+def test_small_chat_is_a_single_chunk():
+    chat = android_chat(2, 5)
+    assert chunk_chat(chat, len(chat)) == [chat]
+
+
+@pytest.mark.parametrize("max_size", [200, 500, 1000, 3000])
+def test_chunks_respect_size_and_message_boundaries(max_size):
+    chat = android_chat(10, 20)
+    chunks = chunk_chat(chat, max_size)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= max_size for chunk in chunks)
+    # Unir los fragmentos reconstruye el chat y cada uno empieza con un mensaje
+    assert "\n".join(chunks) == chat
+    assert all(message_date(chunk) for chunk in chunks)
+
+
+def test_days_are_not_split_when_they_fit():
+    chat = android_chat(6, 10)
+    day_size = len("\n".join(split_chat_messages(chat)[:10]))
+    for chunk in chunk_chat(chat, day_size * 2 + 1):
+        dates = [message_date(message) for message in split_chat_messages(chunk)]
+        # Cada fragmento tiene días completos: 10 mensajes por día
+        assert len(dates) % 10 == 0
+
+
+def test_max_messages_limits_each_chunk():
+    chat = android_chat(3, 20)
+    chunks = chunk_chat(chat, len(chat), max_messages=7)
+    assert all(len(split_chat_messages(chunk)) <= 7 for chunk in chunks)
+    assert "\n".join(chunks) == chat
+
+
+def test_long_message_is_cut_in_pieces():
+    chat = "01/03/24, 10:00 - Ana: " + "x" * 5000 + "\n01/03/24, 10:01 - Luis: ok"
+    chunks = chunk_chat(chat, 1000)
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == chat.replace("\n", "")
+
+
+def test_compact_chunks_repeat_the_day_header():
+    chat = compact_chat_text(2, 40)
+    chunks = chunk_chat(chat, 300)
+    assert all(chunk.startswith("== ") for chunk in chunks)
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+
+def test_measure_and_total_size():
+    chat = android_chat(4, 10)
+    measured = []
+
+    def measure(text: str) -> int:
+        measured.append(text)
+        return len(text.split())
+
+    chunks = chunk_chat(chat, 60, measure=measure, total_size=len(chat.split()))
+    assert chat not in measured
+    assert all(len(chunk.split()) <= 60 for chunk in chunks)
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+from fastapi_docswhatsapp.services.chat_dates import ChatDateFormat, ChatDateParser, detect_date_format
+
+
+def test_day_greater_than_twelve_decides_day_first():
+    date_format = detect_date_format([("05/03/2024", None), ("25/03/2024", None)])
+    assert date_format.day_first and not date_format.twelve_hour
+
+
+def test_second_component_greater_than_twelve_decides_month_first():
+    date_format = detect_date_format([("3/5/24", "PM"), ("3/25/24", "AM")])
+    assert not date_format.day_first and date_format.twelve_hour
+
+
+def test_ambiguous_dates_use_the_order_that_does_not_go_backwards():
+    # dd/mm: 10 ene, 11 ene, 12 ene, 1 feb; mm/dd retrocedería de 12 oct a 2 ene
+    headers = [(date, None) for date in ("10/01/24", "11/01/24", "12/01/24", "01/02/24")]
+    assert detect_date_format(headers).day_first
+    headers = [(date, None) for date in ("01/10/24", "01/11/24", "01/12/24", "02/01/24")]
+    assert not detect_date_format(headers).day_first
+
+
+@pytest.mark.parametrize("ampm, day_first", [("PM", False), ("p. m.", True), (None, True)])
+def test_fully_ambiguous_dates_use_the_suffix_language(ampm, day_first):
+    date_format = detect_date_format([("01/02/24", ampm), ("01/02/24", ampm)])
+    assert date_format.day_first is day_first
+    assert date_format.twelve_hour is (ampm is not None)
+
+
+def test_unrecognized_dates_are_ignored():
+    assert detect_date_format([("ayer", None), ("2/13/24", None)]).day_first is False
+
+
+@pytest.mark.parametrize("date_str, time_str, ampm, expected", [
+    ("05/03/24", "08:15", None, datetime(2024, 3, 5, 8, 15)),
+    ("5.3.2024", "8:15:30", None, datetime(2024, 3, 5, 8, 15, 30)),
+    ("05/03/99", "23:59", None, datetime(1999, 3, 5, 23, 59)),
+    ("05/03/24", "12:05", "a. m.", datetime(2024, 3, 5, 0, 5)),
+    ("05/03/24", "12:05", "PM", datetime(2024, 3, 5, 12, 5)),
+    ("05/03/24", "7:40:02", "p. m.", datetime(2024, 3, 5, 19, 40, 2)),
+])
+def test_parser_day_first(date_str, time_str, ampm, expected):
+    assert ChatDateParser(ChatDateFormat(day_first=True)).parse(date_str, time_str, ampm) == expected
+
+
+def test_parser_month_first():
+    parser = ChatDateParser(ChatDateFormat(day_first=False, twelve_hour=True))
+    assert parser.parse("3/25/24", "9:00", "AM") == datetime(2024, 3, 25, 9, 0)
+
+
+def test_parser_memoizes_dates_and_times():
+    parser = ChatDateParser(ChatDateFormat())
+    for _ in range(3):
+        parser.parse("05/03/24", "08:15")
+    parser.parse("06/03/24", "08:15")
+    assert len(parser._dates) == 2
+    assert len(parser._times) == 1
+
+
+@pytest.mark.parametrize("date_str, time_str, ampm", [
+    ("31/02/24", "08:15", None),
+    ("05/13/24", "08:15", None),
+    ("ayer", "08:15", None),
+    ("05/03/24", "24:00", None),
+    ("05/03/24", "08:60", None),
+    ("05/03/24", "13:00", "PM"),
+    ("05/03/24", "0:30", "AM"),
+])
+def test_parser_rejects_invalid_values(date_str, time_str, ampm):
+    with pytest.raises(ValueError):
+        ChatDateParser(ChatDateFormat()).parse(date_str, time_str, ampm)
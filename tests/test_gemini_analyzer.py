@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from fastapi_docswhatsapp.services.analyzer_backends import FakeAnalyzerBackend
+from fastapi_docswhatsapp.services.gemini_analyzer import GeminiAnalyzer
+from fastapi_docswhatsapp.services.gemini_cache import GeminiResponseCache
+from fastapi_docswhatsapp.services.incremental_analysis import ChatFingerprint, ChatSnapshotStore
+
+CHAT = "\n".join(f"01/03/24, 10:{i:02d} - Ana: mensaje {i}" for i in range(10))
+
+
+class TruncatingBackend(FakeAnalyzerBackend):
+    """Corta la respuesta completa antes de la última sección y no responde los pedidos de secciones"""
+
+    def __init__(self, complete_sections: bool):
+        super().__init__(latency_ms=0)
+        self.complete_sections = complete_sections
+
+    def generate(self, prompt, generation_config, stream=False):
+        response = super().generate(prompt, generation_config)
+        if "ÚNICAMENTE estas secciones" in prompt:
+            if not self.complete_sections:
+                raise RuntimeError("sin respuesta")
+            return response
+        text = response.text
+        return SimpleNamespace(text=text[:text.index('"recomendaciones"')], usage_metadata=None)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    cache = GeminiResponseCache(tmp_path / "cache.db")
+    snapshots = ChatSnapshotStore(tmp_path / "snapshots.db")
+    yield cache, snapshots
+    cache.close()
+    snapshots.close()
+
+
+def analyzer_for(backend, cache, snapshots):
+    return GeminiAnalyzer("", client=backend, cache=cache, snapshots=snapshots, streaming=False)
+
+
+@pytest.mark.parametrize("complete_sections", [True, False])
+def test_incomplete_report_is_not_cached_nor_saved_as_snapshot(stores, complete_sections):
+    cache, snapshots = stores
+    analyzer = analyzer_for(TruncatingBackend(complete_sections), cache, snapshots)
+    informe = asyncio.run(analyzer.generate_project_report(CHAT))
+
+    assert ("recomendaciones" in informe) is complete_sections
+    saved = snapshots.find_base(ChatFingerprint(CHAT), analyzer._analysis_version()) is not None
+    assert saved is complete_sections
+    assert cache.stats()["entries"] == int(complete_sections)
+
+
+def test_request_report_returns_sections_still_missing(stores):
+    analyzer = analyzer_for(TruncatingBackend(complete_sections=False), *stores)
+    informe, missing = asyncio.run(analyzer._request_report(analyzer._build_report_prompt(CHAT)))
+    # La última sección antes del corte también se considera posiblemente truncada
+    assert set(missing) == {"conclusiones", "recomendaciones"}
+    assert "recomendaciones" not in informe
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from fastapi_docswhatsapp.services import gemini_scheduler
+from fastapi_docswhatsapp.services.gemini_scheduler import GeminiScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(gemini_scheduler.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_starts_full_and_reserves_without_waiting(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(59) == 0.0
+    assert bucket.available() == pytest.approx(1)
+
+
+def test_bucket_debt_is_waited_in_arrival_order(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60)
+    # Un token por segundo: la segunda y tercera reserva esperan 1 y 3 segundos
+    assert bucket.reserve(1) == pytest.approx(1)
+    assert bucket.reserve(2) == pytest.approx(3)
+
+
+def test_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(per_minute=120)
+    bucket.reserve(120)
+    clock.now += 15
+    assert bucket.available() == pytest.approx(30)
+    clock.now += 3600
+    assert bucket.available() == pytest.approx(120)
+
+
+def test_request_larger_than_bucket_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1)
+
+
+@pytest.mark.parametrize("per_minute", [0, -5])
+def test_bucket_rejects_non_positive_limits(per_minute):
+    with pytest.raises(ValueError):
+        TokenBucket(per_minute=per_minute)
+
+
+def test_scheduler_retries_transient_errors():
+    attempts = []
+
+    def flaky(value):
+        attempts.append(value)
+        if len(attempts) < 3:
+            raise google_exceptions.ServiceUnavailable("ocupado")
+        return value * 2
+
+    scheduler = GeminiScheduler(retry_base_delay=0.0)
+    assert asyncio.run(scheduler.run(flaky, 21, tokens=10)) == 42
+    stats = scheduler.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (3, 2, 0)
+    assert (stats["queue_depth"], stats["in_flight"]) == (0, 0)
+
+
+def test_scheduler_gives_up_after_max_retries():
+    def always_busy():
+        raise google_exceptions.ResourceExhausted("429")
+
+    scheduler = GeminiScheduler(max_retries=1, retry_base_delay=0.0)
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        asyncio.run(scheduler.run(always_busy))
+    assert (scheduler.calls, scheduler.retries, scheduler.failures) == (2, 1, 1)
+
+
+def test_scheduler_limits_concurrency():
+    running = []
+    peak = []
+
+    def call():
+        running.append(1)
+        peak.append(len(running))
+        time.sleep(0.01)
+        running.pop()
+
+    async def main():
+        scheduler = GeminiScheduler(max_concurrency=2)
+        await asyncio.gather(*(scheduler.run(call) for _ in range(6)))
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert max(peak) <= 2
+    assert scheduler.calls == 6
@@ -0,0 +1,82 @@
+from fastapi_docswhatsapp.services.incremental_analysis import (
+    ChatFingerprint,
+    ChatSnapshotStore,
+    merge_informe_data,
+)
+
+PREVIOUS = {
+    "titulo_proyecto": "Obra Los Álamos",
+    "resumen_ejecutivo": "Avance inicial",
+    "objetivos": ["Terminar la losa"],
+    "actividades_realizadas": [{"fecha": "01/03/2024", "descripcion": "Vaciado", "responsable": "Ana"}],
+    "conclusiones": "En curso",
+}
+
+
+def chat(messages: int) -> str:
+    return "\n".join(f"01/03/24, 10:{i:02d} - Ana: mensaje {i}" for i in range(messages))
+
+
+def test_merge_replaces_texts_and_appends_new_list_items():
+    update = {
+        "titulo_proyecto": "Obra Los Álamos - fase 2",
+        "objetivos": ["Terminar la losa", "Instalar tuberías"],
+        "actividades_realizadas": [
+            {"responsable": "Ana", "descripcion": "Vaciado", "fecha": "01/03/2024"},
+            {"fecha": "02/03/2024", "descripcion": "Encofrado", "responsable": "Luis"},
+        ],
+    }
+    merged = merge_informe_data(PREVIOUS, update)
+    assert merged["titulo_proyecto"] == "Obra Los Álamos - fase 2"
+    assert merged["objetivos"] == ["Terminar la losa", "Instalar tuberías"]
+    # Los objetos iguales con otro orden de claves no se duplican
+    assert [a["descripcion"] for a in merged["actividades_realizadas"]] == ["Vaciado", "Encofrado"]
+    assert merged["conclusiones"] == "En curso"
+
+
+def test_merge_keeps_previous_values_for_empty_updates():
+    merged = merge_informe_data(PREVIOUS, {"resumen_ejecutivo": "", "conclusiones": None, "objetivos": []})
+    assert merged == PREVIOUS
+
+
+def test_merge_does_not_modify_the_previous_report():
+    merge_informe_data(PREVIOUS, {"objetivos": ["Nuevo"]})
+    assert PREVIOUS["objetivos"] == ["Terminar la losa"]
+
+
+def test_merge_adds_new_sections_and_deduplicates_within_update():
+    merged = merge_informe_data({}, {"recomendaciones": ["a", "a", "b"], "nueva": "valor"})
+    assert merged == {"recomendaciones": ["a", "b"], "nueva": "valor"}
+
+
+def test_fingerprint_matches_the_longest_stored_prefix():
+    fingerprint = ChatFingerprint(chat(20))
+    candidates = [(count, ChatFingerprint(chat(count)).prefix_hash) for count in (6, 12, 25)]
+    assert fingerprint.longest_matching_prefix(candidates) == 12
+    assert fingerprint.messages_after(18) == chat(20).split("\n", 18)[18]
+
+
+def test_compact_delta_repeats_the_day_header_at_the_cut():
+    compact = "\n".join([
+        "== 01/03/24 ==",
+        "10:00 Ana: inicio de obra",
+        "11:00 Luis: avance del muro",
+        "11:30 Luis: nuevo avance del muro",
+        "12:00 Ana: listo",
+        "== 02/03/24 ==",
+        "09:00 Ana: siguiente día",
+    ])
+    fingerprint = ChatFingerprint(compact)
+    assert fingerprint.messages_after(3) == "== 01/03/24 ==\n11:30 Luis: nuevo avance del muro\n12:00 Ana: listo\n" \
+                                            "== 02/03/24 ==\n09:00 Ana: siguiente día"
+    # Si el corte coincide con el inicio de un día no se duplica la cabecera
+    assert fingerprint.messages_after(5) == "== 02/03/24 ==\n09:00 Ana: siguiente día"
+
+
+def test_snapshot_store_finds_the_analyzed_base(tmp_path):
+    store = ChatSnapshotStore(tmp_path / "snapshots.db")
+    store.save(ChatFingerprint(chat(10)), "v1", PREVIOUS)
+    assert store.find_base(ChatFingerprint(chat(15)), "v1") == (10, PREVIOUS)
+    assert store.find_base(ChatFingerprint(chat(15)), "v2") is None
+    assert store.find_base(ChatFingerprint(chat(15).replace("mensaje 3", "otro")), "v1") is None
+    store.close()
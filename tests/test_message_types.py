@@ -0,0 +1,98 @@
+import pytest
+
+from fastapi_docswhatsapp.services.chat_tokenizer import tokenize_chat
+from fastapi_docswhatsapp.services.message_types import MESSAGE_TYPES, classify_message, classify_tokens
+
+# Marca de izquierda a derecha que iOS antepone a adjuntos y avisos del sistema
+LRM = '\u200e'
+
+# Cuerpos de mensaje (lo que sigue a "Remitente: ") con su tipo esperado
+LABELED_CORPUS = (
+    # Adjuntos de iOS
+    (f"{LRM}<attached: 00000012-PHOTO-2024-03-01-08-15-02.jpg>", 'image'),
+    (f"{LRM}<adjunto: 00000013-PHOTO-2024-03-01-08-16-40.jpg>", 'image'),
+    (f"{LRM}<attached: 00000014-STICKER-2024-03-01-08-17-00.webp>", 'image'),
+    (f"{LRM}<attached: 00000015-VIDEO-2024-03-01-09-00-00.mp4>", 'video'),
+    (f"{LRM}<adjunto: 00000016-AUDIO-2024-03-01-09-01-00.opus>", 'audio'),
+    (f"{LRM}<attached: 00000017-Planos estructura.pdf>", 'document'),
+    (f"{LRM}<adjunto: 00000018-Presupuesto obra.xlsx>", 'document'),
+    (f"{LRM}image omitted", 'image'),
+    (f"{LRM}imagen omitida", 'image'),
+    (f"{LRM}video omitted", 'video'),
+    (f"{LRM}video omitido", 'video'),
+    (f"{LRM}audio omitted", 'audio'),
+    (f"{LRM}audio omitido", 'audio'),
+    (f"{LRM}document omitted", 'document'),
+    (f"{LRM}documento omitido", 'document'),
+    (f"{LRM}sticker omitted", 'image'),
+    (f"{LRM}GIF omitido", 'image'),
+    (f"{LRM}Location: https://maps.google.com/?q=-12.0464,-77.0428", 'location'),
+    (f"{LRM}Ubicación: https://maps.google.com/?q=-12.0464,-77.0428", 'location'),
+    (f"{LRM}This message was deleted.", 'deleted'),
+    (f"{LRM}Se eliminó este mensaje.", 'deleted'),
+    (f"{LRM}You deleted this message.", 'deleted'),
+    (f"{LRM}Los mensajes y las llamadas están cifrados de extremo a extremo.", 'system'),
+    (f"{LRM}Messages and calls are end-to-end encrypted.", 'system'),
+    (f"{LRM}Ana Pérez añadió a Pedro", 'system'),
+    (f"{LRM}Luis changed the group description", 'system'),
+    # Adjuntos de Android
+    ("IMG-20240301-WA0001.jpg (archivo adjunto)", 'image'),
+    ("IMG-20240301-WA0002.jpg (file attached)", 'image'),
+    ("VID-20240301-WA0003.mp4 (archivo adjunto)", 'video'),
+    ("PTT-20240301-WA0004.opus (file attached)", 'audio'),
+    ("AUD-20240301-WA0005.m4a (archivo adjunto)", 'audio'),
+    ("DOC-20240301-WA0006.pdf (archivo adjunto)", 'document'),
+    ("STK-20240301-WA0007.webp (file attached)", 'image'),
+    ("<Media omitted>", 'image'),
+    ("<Multimedia omitido>", 'image'),
+    ("<se omitió multimedia>", 'image'),
+    ("ubicación: https://maps.google.com/?q=-12.0464,-77.0428", 'location'),
+    ("location: https://maps.google.com/?q=-12.0464,-77.0428", 'location'),
+    ("Ubicación en tiempo real compartida", 'location'),
+    ("Live location shared", 'location'),
+    ("Se eliminó este mensaje.", 'deleted'),
+    ("Eliminaste este mensaje.", 'deleted'),
+    ("This message was deleted", 'deleted'),
+    # Texto normal que menciona palabras de multimedia
+    ("Mañana envío el documento con las metrazas", 'text'),
+    ("Revisen el archivo que mandó el supervisor", 'text'),
+    ("Subí el video del vaciado al drive", 'text'),
+    ("Please check the document before the meeting", 'text'),
+    ("The file is on the shared drive", 'text'),
+    ("Grabé un audio explicando el problema", 'text'),
+    ("Les mando una nota de voz en un rato", 'text'),
+    ("Ya compartí la ubicación compartida del almacén por correo", 'text'),
+    ("Falta el profile de acero para la escalera", 'text'),
+    ("Avance del vaciado de la losa al 60%", 'text'),
+    ("Ok, gracias", 'text'),
+    ("Inspector approved the formwork 👍", 'text'),
+    ("Se eliminó este mensaje del acta por error, hay que volver a escribirlo", 'text'),
+    ("¿Alguien tiene la foto IMG-20240301-WA0001.jpg (archivo adjunto) del martes?", 'text'),
+    ("Quedó así:\n<Media omitted>", 'text'),
+)
+
+
+@pytest.mark.parametrize("body,expected", LABELED_CORPUS)
+def test_classify_message_corpus(body, expected):
+    assert classify_message(body) == expected
+
+
+def test_corpus_covers_every_type():
+    assert {expected for _, expected in LABELED_CORPUS} == set(MESSAGE_TYPES)
+
+
+def test_classify_message_uses_only_the_given_range():
+    text = "prefijo <Media omitted> sufijo"
+    assert classify_message(text) == 'text'
+    assert classify_message(text, 8, 23) == 'image'
+
+
+def test_classify_tokens_matches_classify_message():
+    chat = "".join(
+        f"1/3/24, 10:{i:02d} - Ana: {body}\n" for i, (body, _) in enumerate(LABELED_CORPUS)
+        if '\n' not in body
+    )
+    tokens = tokenize_chat(chat, 'android')
+    expected = [classify_message(token.body(chat)) for token in tokens]
+    assert classify_tokens(chat, tokens) == expected
+    assert len(tokens) == sum(1 for body, _ in LABELED_CORPUS if '\n' not in body)
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from fastapi_docswhatsapp.services.report_json import extract_json_text, parse_report_json, repair_truncated_json
+
+SECTIONS = ["titulo_proyecto", "resumen_ejecutivo", "objetivos", "actividades_realizadas", "conclusiones"]
+
+# Informe con escapes en los strings: comillas, barras, saltos de línea, unicode y llaves
+REPORT = {
+    "titulo_proyecto": "Obra \"Los Álamos\" {fase 2}",
+    "resumen_ejecutivo": "Línea 1\nLínea 2\tcon tab, ruta C:\\obra\\planos y emoji 😀",
+    "objetivos": ["Terminar la losa [nivel 3]", "Avance al 60%", ""],
+    "actividades_realizadas": [
+        {"fecha": "01/03/2024", "descripcion": "Vaciado, \"parcial\"", "responsable": "Ana"},
+        {"fecha": "02/03/2024", "descripcion": "Revisión \\ control", "responsable": None},
+    ],
+    "conclusiones": "Sin retrasos: 3 de 3 hitos, true",
+}
+
+
+def report_text(**dumps_options) -> str:
+    return json.dumps(REPORT, **dumps_options)
+
+
+@pytest.mark.parametrize("dumps_options", [{}, {"ensure_ascii": False}, {"indent": 2, "ensure_ascii": False}])
+def test_repair_truncated_json_at_every_offset(dumps_options):
+    text = report_text(**dumps_options)
+    keys = list(REPORT)
+    for cut in range(1, len(text) + 1):
+        data = repair_truncated_json(text[:cut])
+        assert isinstance(data, dict), f"corte en {cut}: {text[:cut]!r}"
+        # Las secciones llegan en orden y todas salvo la última están completas
+        assert list(data) == keys[:len(data)]
+        for key in list(data)[:-1]:
+            assert data[key] == REPORT[key], f"corte en {cut}: {key}"
+
+
+def test_repair_truncated_json_complete_text():
+    assert repair_truncated_json(report_text()) == REPORT
+
+
+def test_repair_truncated_json_closes_open_string():
+    assert repair_truncated_json('{"titulo_proyecto": "Obra en cur') == {"titulo_proyecto": "Obra en cur"}
+
+
+def test_repair_truncated_json_drops_dangling_escape():
+    assert repair_truncated_json('{"titulo_proyecto": "Obra \\') == {"titulo_proyecto": "Obra "}
+    # Un escape \\u incompleto no se puede cerrar: se corta en el último valor completo
+    assert repair_truncated_json('{"a": 1, "b": "x\\u00') == {"a": 1}
+
+
+def test_repair_truncated_json_without_object():
+    assert repair_truncated_json("") is None
+    assert repair_truncated_json("sin json") is None
+
+
+@pytest.mark.parametrize("response", [
+    "```json\n{text}\n```",
+    "```\n{text}\n```",
+    "```json\n{text}",
+    "Aquí está el informe:\n{text}",
+    "  \n{text}\n  ",
+])
+def test_extract_json_text_strips_fences(response):
+    text = report_text(ensure_ascii=False)
+    assert extract_json_text(response.format(text=text)) == text
+
+
+def test_parse_report_json_complete():
+    assert parse_report_json(f"```json\n{report_text()}\n```", SECTIONS) == (REPORT, [])
+
+
+def test_parse_report_json_truncated_reports_missing_sections():
+    text = report_text()
+    cut = text.index('"actividades_realizadas"') + len('"actividades_realizadas": [{"fecha": "01/03')
+    data, missing = parse_report_json(f"```json\n{text[:cut]}", SECTIONS)
+    assert data["objetivos"] == REPORT["objetivos"]
+    # La última sección recibida pudo quedar incompleta y se vuelve a pedir
+    assert missing == ["conclusiones", "actividades_realizadas"]
+
+
+def test_parse_report_json_at_every_offset():
+    text = report_text()
+    for cut in range(1, len(text)):
+        data, missing = parse_report_json(text[:cut], SECTIONS)
+        assert set(SECTIONS) - set(data) <= set(missing)
+        if data:
+            assert list(data)[-1] in missing
+
+
+@pytest.mark.parametrize("response", ["", "no hay informe", "[1, 2, 3]"])
+def test_parse_report_json_without_object(response):
+    assert parse_report_json(response, SECTIONS) == (None, SECTIONS)
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from fastapi_docswhatsapp.services.report_stream import ReportSectionParser
+
+REPORT = {
+    "titulo_proyecto": "Obra \"Los Álamos\" {fase 2}, etapa [B]",
+    "resumen_ejecutivo": "Línea 1\nLínea 2 con ruta C:\\obra\\ y emoji 😀",
+    "objetivos": ["Terminar la losa", "Avance: 60%, sin retrasos"],
+    "actividades_realizadas": [{"fecha": "01/03/2024", "descripcion": "Vaciado {parcial}", "responsable": None}],
+    "avance": 0.6,
+    "finalizado": False,
+    "conclusiones": "",
+}
+
+
+def feed_in_chunks(text: str, size: int):
+    parser = ReportSectionParser()
+    sections = []
+    for start in range(0, len(text), size):
+        sections.extend(parser.feed(text[start:start + size]))
+    return parser, sections
+
+
+@pytest.mark.parametrize("dumps_options", [{}, {"ensure_ascii": False, "indent": 2}])
+def test_sections_are_the_same_for_every_chunk_size(dumps_options):
+    text = json.dumps(REPORT, **dumps_options)
+    for size in range(1, len(text) + 1):
+        parser, sections = feed_in_chunks(text, size)
+        assert sections == list(REPORT.items()), f"fragmentos de {size}"
+        assert parser.finished
+
+
+def test_each_section_is_emitted_once_its_value_ends():
+    parser = ReportSectionParser()
+    assert parser.feed('{"titulo_proyecto": "Obra", "objetivos": ["a", ') == [("titulo_proyecto", "Obra")]
+    assert parser.feed('"b"]') == []
+    assert parser.feed(', "conclusiones": "ok"') == [("objetivos", ["a", "b"])]
+    assert parser.feed('}') == [("conclusiones", "ok")]
+
+
+def test_ignores_markdown_fence_and_text_after_the_object():
+    text = "```json\n" + json.dumps(REPORT, ensure_ascii=False) + "\n```\n{\"otro\": 1}"
+    parser, sections = feed_in_chunks(text, 7)
+    assert sections == list(REPORT.items())
+    assert parser.feed('{"extra": 2}') == []
+
+
+def test_skips_malformed_values():
+    parser, sections = feed_in_chunks('{"a": 1, "b": tru, "c": [1, 2]}', 3)
+    assert sections == [("a", 1), ("c", [1, 2])]
+
+
+def test_keeps_only_the_current_section_in_memory():
+    parser = ReportSectionParser()
+    long_value = "x" * 10_000
+    parser.feed(json.dumps({"titulo_proyecto": long_value})[:-1] + ', "objetivos": [')
+    assert len(parser._text) < 100
+
+
+def test_truncated_stream_emits_only_complete_sections():
+    text = json.dumps(REPORT)
+    cut = text.index('"avance"') + 5
+    parser, sections = feed_in_chunks(text[:cut], 11)
+    assert [name for name, _ in sections] == ["titulo_proyecto", "resumen_ejecutivo", "objetivos",
+                                              "actividades_realizadas"]
+    assert not parser.finished